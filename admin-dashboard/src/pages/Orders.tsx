@@ -1,3 +1,4 @@
+import { useEffect } from "react";
 import { useQuery, useQueryClient } from "@tanstack/react-query";
 import { useToast } from "@/hooks/use-toast";
 import {
@@ -31,6 +32,16 @@ const Orders = () => {
         queryFn: fetchOrders,
     });
 
+    // Refresh when the server pushes an order change instead of polling
+    useEffect(() => {
+        const source = new EventSource(`${API_BASE}/api/orders/stream`);
+        const refresh = () => queryClient.invalidateQueries({ queryKey: ["orders"] });
+        source.addEventListener("order_created", refresh);
+        source.addEventListener("order_status", refresh);
+        source.addEventListener("resync", refresh);
+        return () => source.close();
+    }, [queryClient]);
+
     const updateStatus = async (orderId: number, status: string) => {
         try {
             const res = await fetch(`${API_BASE}/api/orders/status`, {
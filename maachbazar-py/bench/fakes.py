@@ -0,0 +1,175 @@
+import re
+import json
+import time
+import threading
+from collections import Counter
+
+import requests
+from requests.adapters import BaseAdapter
+
+class FakeGraphAPI(BaseAdapter):
+    """
+    Stands in for graph.facebook.com on the shared GraphClient: answers
+    every /messages call after `latency` seconds with a new wamid (or
+    {"success": true} for read receipts), and tells `on_reply(to, payload)`
+    about every outbound message.
+    """
+
+    def __init__(self, latency: float = 0.0, on_reply=None):
+        super().__init__()
+        self.latency = latency
+        self.on_reply = on_reply
+        self.calls = Counter()  # message type -> calls
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        payload = json.loads(request.body or b"{}")
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            kind = "read" if payload.get("status") == "read" else payload.get("type", "unknown")
+            self.calls[kind] += 1
+            self._seq += 1
+            wamid = f"wamid.bench.{self._seq}"
+
+        if kind == "read":
+            body = {"success": True}
+        else:
+            body = {"messages": [{"id": wamid}]}
+            if self.on_reply:
+                self.on_reply(payload.get("to"), payload, wamid)
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(body).encode("utf-8")
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+class _FunctionCall:
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+class _Part:
+    def __init__(self, text: str = "", function_call=None):
+        self.text = text
+        self.function_call = function_call
+
+class _Content:
+    def __init__(self, parts):
+        self.parts = parts
+
+class _Candidate:
+    def __init__(self, parts):
+        self.content = _Content(parts)
+
+class _Usage:
+    def __init__(self, tokens: int):
+        self.total_token_count = tokens
+
+class _Response:
+    def __init__(self, parts, tokens: int = 0):
+        self.candidates = [_Candidate(parts)]
+        self.text = "".join(part.text for part in parts)
+        self.usage_metadata = _Usage(tokens)
+
+BILL = "Your bill: 2 kg Rohu x ₹250 = ₹500. We will deliver to your saved address. Do you want to confirm this order?"
+ANSWER = "Rohu and Katla are very fresh today, both great for a jhol. Rohu is ₹250/kg. How much would you like?"
+ORDER_ITEMS = [{"fish_name": "Rohu", "quantity": 2, "price_per_kg": 250}]
+
+class FakeGemini:
+    """
+    Stands in for google.generativeai.GenerativeModel: replies after
+    `latency` seconds, like a blocking Gemini call. "Confirm" turns call
+    place_order, orders with a quantity get a bill that asks for
+    confirmation, anything else gets a short answer. Supports stream=True.
+    """
+
+    def __init__(self, latency: float = 0.0, tokens: int = 600):
+        self.latency = latency
+        self.tokens = tokens
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, **kwargs):
+        # Used as the GenerativeModel class: every "model" shares these counters
+        return self
+
+    def _reply(self, prompt: str):
+        message = prompt.rsplit("User:", 1)[-1].split("Assistant:", 1)[0].strip().lower()
+        if message == "confirm":
+            address = re.search(r"User's Address: (.+)", prompt)
+            args = {"items": ORDER_ITEMS, "address": address.group(1) if address else "Bench Road"}
+            return [_Part(function_call=_FunctionCall("place_order", args))]
+        if re.search(r"\d", message):
+            return [_Part(BILL)]
+        return [_Part(ANSWER)]
+
+    def generate_content(self, prompt: str, tool_config=None, stream: bool = False):
+        with self._lock:
+            self.calls += 1
+        parts = self._reply(prompt)
+        if not stream:
+            if self.latency:
+                time.sleep(self.latency)
+            return _Response(parts, self.tokens)
+        return self._stream(parts)
+
+    def _stream(self, parts):
+        # First chunk after a third of the latency, the rest spread over the remainder
+        text = parts[0].text
+        if not text:
+            time.sleep(self.latency / 3)
+            yield _Response(parts, self.tokens)
+            return
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + 6]) + " " for i in range(0, len(words), 6)]
+        for i, chunk in enumerate(chunks):
+            time.sleep(self.latency / 3 if i == 0 else (2 * self.latency / 3) / max(1, len(chunks) - 1))
+            yield _Response([_Part(chunk)], self.tokens if i == len(chunks) - 1 else 0)
+
+class CountingDB:
+    """
+    Wraps a database client (db.supabase) and counts round trips: every
+    table() query and rpc() call is one request to the database.
+    `latency` adds a network round trip to each.
+    """
+
+    def __init__(self, client, latency: float = 0.0):
+        self.client = client
+        self.latency = latency
+        self.calls = Counter()  # "table:<name>" / "rpc:<name>" -> calls
+        self._lock = threading.Lock()
+
+    def _count(self, target: str):
+        with self._lock:
+            self.calls[target] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def table(self, name: str):
+        self._count(f"table:{name}")
+        return self.client.table(name)
+
+    def rpc(self, name: str, params: dict = None):
+        self._count(f"rpc:{name}")
+        return self.client.rpc(name, params)
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
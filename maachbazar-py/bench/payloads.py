@@ -0,0 +1,71 @@
+import hmac
+import json
+import time
+import random
+import hashlib
+
+PHONE_NUMBER_ID = "100000000000001"
+
+# What customers actually send: greetings and price questions (answered locally),
+# general questions (Gemini, cacheable) and orders (Gemini, per user)
+TEXTS = [
+    ("hi", 8), ("Hello dada", 4), ("aaj ka rate?", 10), ("price list", 6), ("আজকের দাম", 3),
+    ("ilish available?", 6), ("rui er dam koto", 4), ("thank you", 3),
+    ("which fish is best for a jhol", 5), ("is the katla from today's catch", 3),
+    ("2 kg rohu", 10), ("1 kg katla and 500 gm chingri", 6), ("rohu 1.5 kg lagbe", 5),
+    ("can you deliver by 7 pm", 3),
+]
+
+def sign(body: bytes, secret: str) -> str:
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+def envelope(value: dict) -> dict:
+    value = {"messaging_product": "whatsapp", "metadata": {"phone_number_id": PHONE_NUMBER_ID}, **value}
+    return {"object": "whatsapp_business_account", "entry": [{"id": "bench", "changes": [{"field": "messages", "value": value}]}]}
+
+class PayloadFactory:
+    """
+    Builds webhook payloads the way Meta sends them, with unique message ids.
+    """
+
+    def __init__(self, seed: int = None):
+        self.random = random.Random(seed)
+        self._seq = 0
+        self._texts, self._weights = zip(*TEXTS)
+
+    def _message(self, phone: str, kind: str, **fields) -> dict:
+        self._seq += 1
+        message = {"from": phone, "id": f"wamid.in.{self._seq}", "timestamp": str(int(time.time())), "type": kind}
+        message.update(fields)
+        return envelope({"contacts": [{"wa_id": phone, "profile": {"name": "Bench"}}], "messages": [message]})
+
+    def text(self, phone: str, body: str = None) -> dict:
+        body = body or self.random.choices(self._texts, self._weights)[0]
+        return self._message(phone, "text", text={"body": body})
+
+    def confirm_button(self, phone: str, context_wamid: str = None) -> dict:
+        fields = {"interactive": {"type": "button_reply", "button_reply": {"id": "confirm_order", "title": "Confirm Korun ✅"}}}
+        if context_wamid:
+            fields["context"] = {"from": PHONE_NUMBER_ID, "id": context_wamid}
+        return self._message(phone, "interactive", **fields)
+
+    def language_reply(self, phone: str) -> dict:
+        choice = self.random.choice([("lang_en", "English"), ("lang_bn", "বাংলা"), ("lang_hi", "Hinglish")])
+        return self._message(phone, "interactive",
+                             interactive={"type": "list_reply", "list_reply": {"id": choice[0], "title": choice[1]}})
+
+    def statuses(self, deliveries: list) -> dict:
+        """
+        deliveries: [(recipient phone, outbound wamid)]; each gets a random
+        sent/delivered/read status, like the flood after a broadcast.
+        """
+        now = str(int(time.time()))
+        statuses = [
+            {"id": wamid, "recipient_id": phone, "timestamp": now,
+             "status": self.random.choices(["sent", "delivered", "read"], [1, 3, 2])[0]}
+            for phone, wamid in deliveries
+        ]
+        return envelope({"statuses": statuses})
+
+def encode(payload: dict) -> bytes:
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,357 @@
+import os
+import sys
+import json
+import math
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from unittest.mock import patch
+
+# Run from anywhere: python bench/webhook_bench.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+import db
+import main
+import whatsapp_utils
+from services import ai, events, graph_client, intents, inventory, message_log, reply_stream, session_store, \
+    status_ingest, user_context, whatsapp
+from services.debounce import Debouncer
+from services.graph_client import GraphClient
+from services.rate_limit import SlidingWindowLimiter, USER_TURN_LIMIT, USER_TURN_WINDOW
+from services.sqlite_backend import SQLiteClient
+from services.worker import WorkerPool, WEBHOOK_WORKERS
+from bench.fakes import CountingDB, FakeGemini, FakeGraphAPI
+from bench.payloads import PHONE_NUMBER_ID, PayloadFactory, encode, sign
+
+SECRET = "bench-secret"
+INVENTORY = [("Rohu", 250), ("Katla", 300), ("Ilish", 1200), ("Chingri", 650), ("Pabda", 450), ("Bhetki", 700)]
+LANGUAGES = ["English", "Bangla", "Hinglish"]
+
+class BenchConfig:
+    """
+    One benchmark run. Rates are webhooks per second, latencies seconds.
+    mix: share of webhooks that are confirm-button replies, language-menu
+    replies and status batches; the rest are text messages.
+    """
+
+    def __init__(self, rate: float = 50, duration: float = 10, users: int = 200, new_users: float = 0.05,
+                 mix: dict = None, status_batch: int = 20, gemini_latency: float = 0.8, graph_latency: float = 0.05,
+                 db_latency: float = 0.0, workers: int = WEBHOOK_WORKERS, debounce: str = "0",
+                 streaming: bool = False, intent_router: bool = True, cache_size: int = ai.AI_CACHE_SIZE,
+                 db_path: str = None, seed: int = 1):
+        self.rate = rate
+        self.duration = duration
+        self.users = users
+        self.new_users = new_users
+        self.mix = {"button": 0.1, "list": 0.03, "status": 0.2, **(mix or {})}
+        self.status_batch = status_batch
+        self.gemini_latency = gemini_latency
+        self.graph_latency = graph_latency
+        self.db_latency = db_latency
+        self.workers = workers
+        self.debounce = debounce
+        self.streaming = streaming
+        self.intent_router = intent_router
+        self.cache_size = cache_size
+        self.db_path = db_path
+        self.seed = seed
+
+    @property
+    def webhooks(self) -> int:
+        return max(1, int(self.rate * self.duration))
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def summarize(values: list) -> dict:
+    # milliseconds
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50) * 1000, 1),
+        "p95": round(percentile(values, 95) * 1000, 1),
+        "p99": round(percentile(values, 99) * 1000, 1),
+        "max": round(max(values) * 1000, 1) if values else 0.0,
+    }
+
+class ReplyTracker:
+    """
+    Matches outbound messages to the inbound message that caused them:
+    the first reply to a user after they wrote answers their oldest
+    unanswered message (a user's turns are processed in order).
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.pending = {}  # phone -> deque of send times
+        self.bills = {}  # phone -> wamid of the last message with confirm buttons
+        self.menus = set()  # users who were sent the language menu
+        self.deliveries = deque(maxlen=5000)  # (phone, wamid) of recent outbound messages
+        self._lock = threading.Lock()
+
+    def expect(self, phone: str, sent_at: float):
+        with self._lock:
+            self.pending.setdefault(phone, deque()).append(sent_at)
+
+    def on_reply(self, phone: str, payload: dict, wamid: str):
+        now = time.monotonic()
+        with self._lock:
+            self.deliveries.append((phone, wamid))
+            interactive = payload.get("interactive") or {}
+            if interactive.get("type") == "button":
+                self.bills[phone] = wamid
+            elif interactive.get("type") == "list":
+                self.menus.add(phone)
+            waiting = self.pending.get(phone)
+            if waiting:
+                self.latencies.append(now - waiting.popleft())
+
+    def sample_deliveries(self, rng: random.Random, size: int) -> list:
+        with self._lock:
+            return rng.sample(list(self.deliveries), min(size, len(self.deliveries)))
+
+    def take_bill(self, rng: random.Random):
+        # (phone, wamid) of a bill waiting for confirmation, or None
+        with self._lock:
+            if not self.bills:
+                return None
+            phone = rng.choice(list(self.bills))
+            return phone, self.bills.pop(phone)
+
+    def take_menu(self):
+        with self._lock:
+            return self.menus.pop() if self.menus else None
+
+    def unanswered(self) -> int:
+        with self._lock:
+            return sum(len(waiting) for waiting in self.pending.values())
+
+def seed_database(client: SQLiteClient, config: BenchConfig, rng: random.Random) -> list:
+    phones = [f"9190000{i:05d}" for i in range(config.users)]
+    conn = client._conn
+    conn.executemany("INSERT OR IGNORE INTO inventory (name, price, is_available) VALUES (?, ?, 1)", INVENTORY)
+    returning = [phone for phone in phones if rng.random() >= config.new_users]
+    conn.executemany(
+        "INSERT OR IGNORE INTO users (phone, language, address, opt_in) VALUES (?, ?, ?, 1)",
+        [(phone, rng.choice(LANGUAGES), f"{rng.randint(1, 200)} Gariahat Road" if rng.random() < 0.5 else None)
+         for phone in returning],
+    )
+    return phones
+
+async def _drive(config: BenchConfig, factory: PayloadFactory, tracker: ReplyTracker, phones: list, rng: random.Random):
+    acks, codes = [], Counter()
+    counts = Counter()
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def post(payload: dict, phone: str = None):
+            body = encode(payload)
+            started = time.monotonic()
+            if phone:
+                tracker.expect(phone, started)
+            response = await client.post("/webhook", content=body, headers={
+                "Content-Type": "application/json",
+                "X-Hub-Signature-256": sign(body, SECRET),
+            })
+            acks.append(time.monotonic() - started)
+            codes[response.status_code] += 1
+
+        mix = config.mix
+        kinds = {"status": mix["status"], "button": mix["button"], "list": mix["list"],
+                 "text": max(0.0, 1 - mix["status"] - mix["button"] - mix["list"])}
+        tasks = []
+        start = time.monotonic()
+        for i in range(config.webhooks):
+            delay = start + i / config.rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            kind = rng.choices(list(kinds), list(kinds.values()))[0]
+            if kind == "status":
+                sample = tracker.sample_deliveries(rng, config.status_batch)
+                if sample:
+                    counts["statuses"] += len(sample)
+                    counts["status_webhooks"] += 1
+                    tasks.append(asyncio.create_task(post(factory.statuses(sample))))
+                    continue
+                kind = "text"
+
+            bill = tracker.take_bill(rng) if kind == "button" else None
+            menu = tracker.take_menu() if kind == "list" else None
+            if bill:
+                phone, payload = bill[0], factory.confirm_button(*bill)
+                counts["buttons"] += 1
+            elif menu:
+                phone, payload = menu, factory.language_reply(menu)
+                counts["language_replies"] += 1
+            else:
+                phone = rng.choice(phones)
+                payload = factory.text(phone)
+                counts["texts"] += 1
+            counts["messages"] += 1
+            tasks.append(asyncio.create_task(post(payload, phone)))
+
+        await asyncio.gather(*tasks)
+        acked_at = time.monotonic()
+
+    # Let every accepted message finish: held texts, the worker queues, then the write-behind buffers
+    main.debouncer.flush_all()
+    await main.webhook_pool.join()
+    drained_at = time.monotonic()
+    return start, acked_at, drained_at, acks, codes, counts
+
+async def run(config: BenchConfig) -> dict:
+    """
+    Replays a generated webhook load against main.app with fake Graph API,
+    Gemini and database, and returns the report.
+    """
+    rng = random.Random(config.seed)
+    factory = PayloadFactory(seed=config.seed)
+    tracker = ReplyTracker()
+
+    with ExitStack() as stack, tempfile.TemporaryDirectory() as tmp:
+        sqlite = SQLiteClient(config.db_path or os.path.join(tmp, "bench.db"))
+        stack.callback(sqlite.close)
+        phones = seed_database(sqlite, config, rng)
+        database = CountingDB(sqlite, latency=config.db_latency)
+
+        graph = FakeGraphAPI(latency=config.graph_latency, on_reply=tracker.on_reply)
+        graph_client.set_client(GraphClient(token="bench", phone_number_id=PHONE_NUMBER_ID,
+                                            base_url="http://fake-graph/v19.0", adapter=graph))
+        stack.callback(graph_client.set_client, None)
+        gemini = FakeGemini(latency=config.gemini_latency)
+
+        pool = WorkerPool(main.handle_webhook_event, workers=config.workers)
+        patches = [
+            patch.object(db, "supabase", database),
+            patch.object(main, "APP_SECRET", SECRET),
+            patch.object(whatsapp, "WHATSAPP_TOKEN", "bench"), patch.object(whatsapp, "PHONE_NUMBER_ID", PHONE_NUMBER_ID),
+            patch.object(whatsapp_utils, "WHATSAPP_TOKEN", "bench"), patch.object(whatsapp_utils, "PHONE_NUMBER_ID", PHONE_NUMBER_ID),
+            patch.object(ai, "GEMINI_API_KEY", "bench"),
+            patch.object(ai.genai, "GenerativeModel", gemini),
+            patch.object(ai, "model_registry", ai.ModelRegistry()),
+            patch.object(ai, "response_cache", ai.ResponseCache(max_size=config.cache_size)),
+            patch.object(intents, "INTENT_ROUTER", config.intent_router),
+            patch.object(intents, "router", intents.IntentRouter()),
+            patch.object(reply_stream, "AI_STREAMING", config.streaming),
+            patch.object(main, "sessions", session_store.MemorySessionStore()),
+            patch.object(main, "turn_limiter", SlidingWindowLimiter(USER_TURN_LIMIT, USER_TURN_WINDOW)),
+            patch.object(main, "webhook_pool", pool),
+            patch.object(main, "debouncer", Debouncer(pool.submit_many, spec=config.debounce, state_of=main._conversation_state)),
+            patch.object(message_log, "writer", message_log.MessageLogWriter()),
+            patch.object(status_ingest, "aggregator", status_ingest.StatusAggregator()),
+            patch.object(events, "hub", events.EventHub()),
+        ]
+        for p in patches:
+            stack.enter_context(p)
+        user_context.clear()
+        inventory.invalidate()
+        stack.callback(user_context.clear)
+        stack.callback(inventory.invalidate)
+
+        await pool.start()
+        await events.hub.start()
+        try:
+            start, acked_at, drained_at, acks, codes, counts = await _drive(config, factory, tracker, phones, rng)
+        finally:
+            await pool.stop()
+            await events.hub.stop()
+            message_log.writer.close()
+            status_ingest.aggregator.close()
+
+        messages = max(1, counts["messages"])
+        return {
+            "config": {k: v for k, v in vars(config).items() if k != "db_path"},
+            "webhooks": sum(codes.values()),
+            "status_codes": dict(codes),
+            "messages": dict(counts),
+            "seconds": round(drained_at - start, 2),
+            "throughput": {
+                "webhooks_acked_per_s": round(sum(codes.values()) / max(acked_at - start, 1e-9), 1),
+                "messages_processed_per_s": round(counts["messages"] / max(drained_at - start, 1e-9), 1),
+            },
+            "ack_ms": summarize(acks),
+            "reply_ms": summarize(tracker.latencies),
+            "unanswered": tracker.unanswered(),
+            "per_message": {
+                "db_calls": round(database.total() / messages, 2),
+                "graph_calls": round(graph.total() / messages, 2),
+                "gemini_calls": round(gemini.calls / messages, 2),
+            },
+            "db_calls": dict(database.calls.most_common()),
+            "graph_calls": dict(graph.calls.most_common()),
+            "gemini_calls": gemini.calls,
+            "intent_router": intents.router.stats(),
+            "ai_cache": ai.response_cache.stats(),
+        }
+
+def format_report(report: dict) -> str:
+    ack, reply, per = report["ack_ms"], report["reply_ms"], report["per_message"]
+    counts = report["messages"]
+    lines = [
+        f"Webhooks     {report['webhooks']} in {report['seconds']} s "
+        f"(offered {report['config']['rate']}/s), status codes {report['status_codes']}",
+        f"Inbound      {counts.get('messages', 0)} messages ({counts.get('texts', 0)} text, {counts.get('buttons', 0)} confirm, "
+        f"{counts.get('language_replies', 0)} language), {counts.get('statuses', 0)} statuses in "
+        f"{counts.get('status_webhooks', 0)} webhooks",
+        f"Throughput   {report['throughput']['webhooks_acked_per_s']} webhooks/s acked, "
+        f"{report['throughput']['messages_processed_per_s']} messages/s processed",
+        f"Ack          p50 {ack['p50']} ms  p95 {ack['p95']} ms  p99 {ack['p99']} ms  max {ack['max']} ms",
+        f"Reply        p50 {reply['p50']} ms  p95 {reply['p95']} ms  p99 {reply['p99']} ms  max {reply['max']} ms"
+        f"  ({reply['count']} replies, {report['unanswered']} unanswered)",
+        f"Per message  {per['db_calls']} DB calls, {per['graph_calls']} Graph API calls, {per['gemini_calls']} Gemini calls",
+        f"DB calls     " + ", ".join(f"{k} {v}" for k, v in report["db_calls"].items()),
+        f"Graph calls  " + ", ".join(f"{k} {v}" for k, v in report["graph_calls"].items()),
+        f"Local turns  {report['intent_router']['handled']} intent router, {report['ai_cache']['hits']} AI cache hits",
+    ]
+    return "\n".join(lines)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replays signed webhook traffic against main.app with fake Meta, Gemini "
+                                                 "and database. Numbers are for one worker process.")
+    parser.add_argument("--rate", type=float, default=50, help="webhooks per second (default 50)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of traffic (default 10)")
+    parser.add_argument("--users", type=int, default=200, help="distinct customers (default 200)")
+    parser.add_argument("--new-users", type=float, default=0.05, help="share of customers writing for the first time")
+    parser.add_argument("--buttons", type=float, default=0.1, help="share of webhooks that confirm a bill")
+    parser.add_argument("--language-replies", type=float, default=0.03, help="share answering the language menu")
+    parser.add_argument("--statuses", type=float, default=0.2, help="share of webhooks that are status batches")
+    parser.add_argument("--status-batch", type=int, default=20, help="statuses per status webhook")
+    parser.add_argument("--gemini-latency", type=float, default=0.8, help="seconds per Gemini call")
+    parser.add_argument("--graph-latency", type=float, default=0.05, help="seconds per Graph API call")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds added to each database call")
+    parser.add_argument("--workers", type=int, default=WEBHOOK_WORKERS, help="webhook worker threads")
+    parser.add_argument("--debounce", default="0", help="MESSAGE_DEBOUNCE spec, e.g. 600")
+    parser.add_argument("--streaming", action="store_true", help="stream Gemini replies (AI_STREAMING)")
+    parser.add_argument("--no-intent-router", action="store_true", help="send every text to Gemini")
+    parser.add_argument("--cache-size", type=int, default=ai.AI_CACHE_SIZE, help="AI response cache size (0 = off)")
+    parser.add_argument("--db-path", help="SQLite file to use (default: a temporary one)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--log-level", default="WARNING", help="app log level during the run (default WARNING)")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(args.log_level.upper())
+    config = BenchConfig(
+        rate=args.rate, duration=args.duration, users=args.users, new_users=args.new_users,
+        mix={"button": args.buttons, "list": args.language_replies, "status": args.statuses},
+        status_batch=args.status_batch, gemini_latency=args.gemini_latency, graph_latency=args.graph_latency,
+        db_latency=args.db_latency, workers=args.workers, debounce=args.debounce, streaming=args.streaming,
+        intent_router=not args.no_intent_router, cache_size=args.cache_size, db_path=args.db_path, seed=args.seed,
+    )
+    return config, args.json
+
+if __name__ == "__main__":
+    config, as_json = parse_args()
+    report = asyncio.run(run(config))
+    print(json.dumps(report, indent=2, ensure_ascii=False) if as_json else format_report(report))
@@ -1,31 +1,51 @@
 import logging
-import db
 import whatsapp_utils
 from services import ai
+from services import user_context
+from services import intents
+from services.metrics import metrics
+from services.user_context import UserContext
 
 logger = logging.getLogger(__name__)
 
-def generate_response(sender_id: str, message_text: str, message_id: int = None) -> str:
+@metrics.timed("brain")
+def generate_response(sender_id: str, message_text: str, message_id: int = None, context: UserContext = None,
+                      stream=None) -> str:
     """
     Generates a response using Gemini, incorporating chat history and user context.
+    context: the caller's already loaded UserContext, to avoid re-fetching the user.
+    stream: optional ReplyStream; the returned text is then only what it hasn't sent yet.
     """
     try:
-        # 1. Fetch User Context (Language)
-        user, _ = db.get_or_create_user(sender_id)
-        language = user.get("language", "English") if user else "English"
+        # 1. Fetch User Context (Language, History, Address) - one query at most
+        ctx = context or user_context.load(sender_id)
+        language = ctx.language
 
-        # 2. Fetch Chat History
-        history = db.get_chat_history(sender_id, limit=5)
-        
-        # Format history for the prompt
+        # 1.1 Common intents (price list, greetings, ...) are answered locally without the LLM
+        route = intents.route(message_text, language)
+        if route:
+            logger.info(f"Answered '{route.intent}' locally for {sender_id}")
+            if route.language:
+                ctx.set("language", route.language)
+            return route.reply
+
+        # 1.2 General questions from users with no address, no order in progress and no
+        # recent conversation get a shared, cacheable reply, so they are asked without the
+        # user's history. Once the bot has replied, a short message may be an answer to its
+        # question ("no", "upi", an address), so the history is kept and nothing is shared.
+        shareable = (ai.response_cache.enabled and not ctx.address and not ctx.state
+                     and not any(msg["role"] == "assistant" for msg in ctx.history)
+                     and intents.is_standalone(message_text))
+
+        # 2. Format Chat History for the prompt
         history_text = ""
-        for msg in history:
+        for msg in ([] if shareable else ctx.history):
             role = "User" if msg["role"] == "user" else "Assistant"
             content = msg["content"]
             history_text += f"{role}: {content}\n"
 
-        # 3. Fetch User Address
-        user_address = db.get_user_address(sender_id)
+        # 3. User Address
+        user_address = ctx.address
 
         # 4. Construct Prompt
         # We wrap the user's message with context
@@ -39,10 +59,16 @@ User: {message_text}
 Assistant:
 """
         # 5. Call AI Service
-        response = ai.generate_response(full_prompt, user_phone=sender_id, user_address=user_address, message_id=message_id)
+        response = ai.generate_response(full_prompt, user_phone=sender_id, user_address=user_address, message_id=message_id,
+                                        cache_text=message_text if shareable else None, language=language,
+                                        stream=stream)
+        if stream is not None:
+            response = stream.unsent(response)
+            if not response:
+                return None # Everything was sent while streaming
         
         # Check if response asks for confirmation
-        if "confirm" in response.lower() and "?" in response:
+        if intents.asks_for_confirmation(response):
              # Send interactive button
              buttons = [
                  {"id": "confirm_order", "title": "Confirm Korun ✅"},
@@ -50,7 +76,7 @@ Assistant:
              ]
              wamid = whatsapp_utils.send_interactive_button(sender_id, response, buttons)
              # Log assistant message with wamid
-             db.log_message(sender_id, "assistant", response, whatsapp_message_id=wamid)
+             ctx.log_message("assistant", response, whatsapp_message_id=wamid)
              return None # Signal that message is already sent
 
         return response
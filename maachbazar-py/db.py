@@ -1,7 +1,10 @@
 import os
+import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
 import logging
+from services import events
+from services.metrics import metrics
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -9,14 +12,25 @@ logger = logging.getLogger(__name__)
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
 
+# supabase (default) or sqlite: a local database file, for offline runs, load tests and single-node deployments
+DB_BACKEND = os.environ.get("DB_BACKEND", "supabase")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "maachbazar.db")
+
 supabase: Client = None
 
-if url and key:
+if DB_BACKEND == "sqlite":
+    from services.sqlite_backend import SQLiteClient
+    supabase = SQLiteClient(SQLITE_PATH)
+    logger.info(f"Using SQLite database at {SQLITE_PATH}")
+elif url and key:
     try:
         supabase = create_client(url, key)
     except Exception as e:
         logger.error(f"Failed to initialize Supabase: {e}")
 
+def inventory_query(client):
+    return client.table("inventory").select("*")
+
 def get_inventory():
     """
     Fetches inventory from Supabase.
@@ -27,12 +41,14 @@ def get_inventory():
         return []
     
     try:
-        response = supabase.table("inventory").select("*").execute()
-        return response.data
+        return inventory_query(supabase).execute().data
     except Exception as e:
         logger.error(f"Error fetching inventory: {e}")
         return []
 
+def price_update_query(client, fish_name: str, new_price: int):
+    return client.table("inventory").update({"price": new_price}).eq("name", fish_name)
+
 def update_price(fish_name: str, new_price: int):
     """
     Updates the price of a specific fish in Supabase.
@@ -41,12 +57,17 @@ def update_price(fish_name: str, new_price: int):
         return {"error": "Supabase not configured"}
 
     try:
-        response = supabase.table("inventory").update({"price": new_price}).eq("name", fish_name).execute()
-        return response.data
+        return price_update_query(supabase, fish_name, new_price).execute().data
     except Exception as e:
         logger.error(f"Error updating price: {e}")
         return {"error": str(e)}
 
+def inventory_item_update_query(client, item_id: int, price: int, is_available: bool):
+    return client.table("inventory").update({
+        "price": price,
+        "is_available": is_available
+    }).eq("id", item_id)
+
 def update_inventory_item(item_id: int, price: int, is_available: bool):
     """
     Updates price and availability of an inventory item.
@@ -55,15 +76,18 @@ def update_inventory_item(item_id: int, price: int, is_available: bool):
         return {"error": "Supabase not configured"}
 
     try:
-        response = supabase.table("inventory").update({
-            "price": price,
-            "is_available": is_available
-        }).eq("id", item_id).execute()
-        return response.data
+        return inventory_item_update_query(supabase, item_id, price, is_available).execute().data
     except Exception as e:
         logger.error(f"Error updating inventory item: {e}")
         return {"error": str(e)}
 
+def add_fish_query(client, name: str, price: int, is_available: bool = True):
+    return client.table("inventory").insert({
+        "name": name,
+        "price": price,
+        "is_available": is_available
+    })
+
 def add_fish(name: str, price: int, is_available: bool = True):
     """
     Adds a new fish to the inventory.
@@ -72,12 +96,7 @@ def add_fish(name: str, price: int, is_available: bool = True):
         return {"error": "Supabase not configured"}
 
     try:
-        response = supabase.table("inventory").insert({
-            "name": name,
-            "price": price,
-            "is_available": is_available
-        }).execute()
-        return response.data
+        return add_fish_query(supabase, name, price, is_available).execute().data
     except Exception as e:
         logger.error(f"Error adding fish: {e}")
         return {"error": str(e)}
@@ -104,6 +123,41 @@ def get_or_create_user(phone_number: str):
         logger.error(f"Error in get_or_create_user: {e}")
         return None, False
 
+def user_with_history_query(client, phone_number: str, limit: int = 5):
+    return client.table("users").select("*, messages(role, content, created_at)")\
+        .eq("phone", phone_number)\
+        .order("created_at", desc=True, foreign_table="messages")\
+        .limit(limit, foreign_table="messages")
+
+def split_user_history(rows: list):
+    if not rows:
+        return None, []
+    user = rows[0]
+    history = user.pop("messages", None) or []
+    return user, history[::-1]
+
+def get_user_with_history(phone_number: str, limit: int = 5):
+    """
+    Fetches the user row and their last N messages in a single query.
+    Returns: (user_data, history) with history oldest first, or (None, []) if the user doesn't exist.
+    """
+    if not supabase: return None, []
+    try:
+        return split_user_history(user_with_history_query(supabase, phone_number, limit).execute().data)
+    except Exception as e:
+        logger.error(f"Error fetching user with history: {e}")
+        return None, []
+
+def update_user_fields(phone_number: str, fields: dict):
+    """
+    Updates several columns of the user's row in one call.
+    """
+    if not supabase or not fields: return
+    try:
+        supabase.table("users").update(fields).eq("phone", phone_number).execute()
+    except Exception as e:
+        logger.error(f"Error updating user fields: {e}")
+
 def get_opt_in_users():
     """
     Fetches all users who have opted in.
@@ -116,13 +170,29 @@ def get_opt_in_users():
         logger.error(f"Error fetching opt-in users: {e}")
         return []
 
+def get_opt_in_users_page(after_phone: str = None, limit: int = 500):
+    """
+    Fetches one page of opted-in users, ordered by phone.
+    Pass the last phone of the previous page as after_phone to get the next page.
+    Raises on failure so a broadcast can't mistake an error for the end of the list.
+    """
+    if not supabase: return []
+    try:
+        query = supabase.table("users").select("phone, language").eq("opt_in", True)
+        if after_phone:
+            query = query.gt("phone", after_phone)
+        response = query.order("phone").limit(limit).execute()
+        return response.data
+    except Exception as e:
+        logger.error(f"Error fetching opt-in users page: {e}")
+        raise
+
 def update_user_last_active(phone_number: str):
     """
     Updates the last_active_ts for a user.
     """
     if not supabase: return
     try:
-        import datetime
         now = datetime.datetime.utcnow().isoformat()
         supabase.table("users").update({"last_active_ts": now, "opt_in": True}).eq("phone", phone_number).execute()
     except Exception as e:
@@ -138,25 +208,49 @@ def update_user_language(phone_number: str, language: str):
     except Exception as e:
         logger.error(f"Error updating language: {e}")
 
-def log_message(phone_number: str, role: str, content: str, whatsapp_message_id: str = None):
+def message_row(phone_number: str, role: str, content: str, whatsapp_message_id: str = None,
+                created_at: str = None, template_name: str = None):
+    """
+    Builds a row for the messages table.
+    """
+    data = {
+        "user_phone": phone_number,
+        "role": role,
+        "content": content
+    }
+    if whatsapp_message_id:
+        data["whatsapp_message_id"] = whatsapp_message_id
+    if created_at:
+        data["created_at"] = created_at
+    if template_name:
+        data["template_name"] = template_name
+    return data
+
+def log_message(phone_number: str, role: str, content: str, whatsapp_message_id: str = None, template_name: str = None):
     """
     Logs a message to the database.
     Role: 'user' or 'assistant'
     whatsapp_message_id: External ID from WhatsApp (wamid)
+    template_name: Set for template messages, for per-template delivery stats
+    Returns the new row's ID, or None on failure.
     """
-    if not supabase: return
+    if not supabase: return None
     try:
-        data = {
-            "user_phone": phone_number,
-            "role": role,
-            "content": content
-        }
-        if whatsapp_message_id:
-            data["whatsapp_message_id"] = whatsapp_message_id
-
-        supabase.table("messages").insert(data).execute()
+        data = message_row(phone_number, role, content, whatsapp_message_id, template_name=template_name)
+        response = supabase.table("messages").insert(data).execute()
+        return response.data[0]["id"] if response.data else None
     except Exception as e:
         logger.error(f"Error logging message: {e}")
+        return None
+
+def insert_messages(rows: list):
+    """
+    Inserts many message rows in one request.
+    Returns the new IDs in the same order as rows. Raises on failure.
+    """
+    if not supabase or not rows: return [None] * len(rows)
+    response = supabase.table("messages").insert(rows).execute()
+    return [row.get("id") for row in response.data]
 
 def get_message_id_by_whatsapp_id(whatsapp_message_id: str):
     """
@@ -172,17 +266,47 @@ def get_message_id_by_whatsapp_id(whatsapp_message_id: str):
         logger.error(f"Error fetching message ID by wamid: {e}")
         return None
 
+def message_statuses_query(client, updates: list):
+    return client.rpc("apply_message_statuses", {"p_updates": updates})
+
+def apply_message_statuses(updates: list) -> int:
+    """
+    Applies a batch of delivery status updates to the messages table in one call.
+    updates: [{'whatsapp_message_id': ..., 'status': ..., 'updated_at': ..., 'error': ...}]
+    Returns the number of messages updated. Raises on failure.
+    """
+    if not supabase or not updates: return 0
+    response = message_statuses_query(supabase, updates).execute()
+    return response.data or 0
+
+def template_delivery_stats_query(client, days: int = 7):
+    since = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
+    return client.table("template_delivery_stats").select("*").gte("day", since).order("day", desc=True)
+
+def get_template_delivery_stats(days: int = 7):
+    """
+    Fetches per-template delivery and read rates for the last `days` days.
+    """
+    if not supabase: return []
+    try:
+        return template_delivery_stats_query(supabase, days).execute().data
+    except Exception as e:
+        logger.error(f"Error fetching template delivery stats: {e}")
+        return []
+
+def chat_history_query(client, phone_number: str, limit: int = 5):
+    return client.table("messages").select("*")\
+        .eq("user_phone", phone_number)\
+        .order("created_at", desc=True)\
+        .limit(limit)
+
 def get_chat_history(phone_number: str, limit: int = 5):
     """
     Fetches the last N messages for context.
     """
     if not supabase: return []
     try:
-        response = supabase.table("messages").select("*")\
-            .eq("user_phone", phone_number)\
-            .order("created_at", desc=True)\
-            .limit(limit)\
-            .execute()
+        response = chat_history_query(supabase, phone_number, limit).execute()
         # Return reversed list (oldest first) for AI context
         return response.data[::-1] if response.data else []
     except Exception as e:
@@ -264,114 +388,158 @@ def check_order_exists(message_id: int):
 
 def create_order(user_phone: str, items: list, address: str = None, message_id: int = None):
     """
-    Creates a new order with multiple items.
+    Creates a new order with multiple items, in one call to the place_order SQL function.
     items: list of dicts [{'fish_name': 'Rohu', 'quantity': 1.5, 'price_per_kg': 250}]
     message_id: ID of the message that triggered the order (optional)
+    The function also saves the address on the user's profile, marks the message
+    as ordered and resets the address change counter, all in one transaction.
+    A second order for the same message_id is refused by the unique_message_order constraint.
     """
     if not supabase:
         return {"error": "Supabase not configured"}
 
     try:
-        # 0. Idempotency Check
-        if message_id and check_order_exists(message_id):
-            logger.info(f"Order already exists for message_id {message_id}")
-            return {"error": "Order already placed for this message"}
-
-        # 1. Calculate total price
-        total_price = 0
-        for item in items:
-            item['subtotal'] = int(item['quantity'] * item['price_per_kg'])
-            total_price += item['subtotal']
-
-        # 2. Create Order
-        order_data = {
-            "user_phone": user_phone,
-            "total_price": int(total_price),
-            "status": "pending"
+        params = {
+            "p_user_phone": user_phone,
+            "p_items": [
+                {"fish_name": item['fish_name'], "quantity": item['quantity'], "price_per_kg": item['price_per_kg']}
+                for item in items
+            ],
+            "p_address": address,
+            "p_message_id": message_id,
         }
-        if address:
-            order_data["delivery_address"] = address
-            # Also update user profile
-            update_user_address(user_phone, address)
-        
-        if message_id:
-            order_data["message_id"] = message_id
+        result = supabase.rpc("place_order", params).execute().data
 
-        order_response = supabase.table("orders").insert(order_data).execute()
-        
-        if not order_response.data:
+        if not result or not result.get("order"):
             return {"error": "Failed to create order"}
-            
-        order_id = order_response.data[0]['id']
-
-        # 3. Create Order Items
-        order_items_data = []
-        for item in items:
-            order_items_data.append({
-                "order_id": order_id,
-                "fish_name": item['fish_name'],
-                "quantity": item['quantity'],
-                "price_per_kg": int(item['price_per_kg']),
-                "subtotal": int(item['subtotal'])
-            })
-            
-        logger.info(f"Inserting order items: {order_items_data}")
-        supabase.table("order_items").insert(order_items_data).execute()
-
-        # 4. Update Message Status (if message_id provided)
-        if message_id:
-            try:
-                supabase.table("messages").update({"order_placed": True}).eq("id", message_id).execute()
-            except Exception as e:
-                logger.error(f"Failed to update message status for {message_id}: {e}")
-                # Don't fail the whole order if this fails, but log it.
-        
-        # 5. Reset Address Update Count
-        reset_address_update_count(user_phone)
 
-        return {"order_id": order_id, "total_price": total_price, "status": "success"}
+        order = result["order"]
+        if result.get("duplicate"):
+            logger.info(f"Order already exists for message_id {message_id}")
+            return {"error": "Order already placed for this message"}
+
+        # Push to connected dashboards
+        events.publish("order_created", order)
+
+        return {"order_id": order["id"], "total_price": order["total_price"], "status": "success", "order": order}
 
     except Exception as e:
         logger.error(f"Error creating order: {e}")
         return {"error": str(e)}
 
+def user_orders_query(client, user_phone: str):
+    return client.table("orders").select("*, order_items(*)")\
+        .eq("user_phone", user_phone)\
+        .order("created_at", desc=True)\
+        .limit(5)
+
 def get_user_orders(user_phone: str):
     """
     Fetches past orders for a user.
     """
     if not supabase: return []
     try:
-        response = supabase.table("orders").select("*, order_items(*)")\
-            .eq("user_phone", user_phone)\
-            .order("created_at", desc=True)\
-            .limit(5)\
-            .execute()
-        return response.data
+        return user_orders_query(supabase, user_phone).execute().data
     except Exception as e:
         logger.error(f"Error fetching user orders: {e}")
         return []
 
 
+def all_orders_query(client):
+    return client.table("orders").select("*, order_items(*)").order("created_at", desc=True)
+
 def get_all_orders():
     """
     Fetches all orders for the admin dashboard.
     """
     if not supabase: return []
     try:
-        response = supabase.table("orders").select("*, order_items(*)").order("created_at", desc=True).execute()
-        return response.data
+        return all_orders_query(supabase).execute().data
     except Exception as e:
         logger.error(f"Error fetching all orders: {e}")
         return []
 
+def orders_page_query(client, limit: int, before_id: int = None, statuses: list = None, phone: str = None,
+                      date_from: str = None, date_to: str = None, since: str = None):
+    """
+    Builds the get_orders_page query; works with the sync and the async client.
+    """
+    query = client.table("orders").select("*, order_items(*)")
+    if before_id is not None:
+        query = query.lt("id", before_id)
+    if statuses:
+        query = query.eq("status", statuses[0]) if len(statuses) == 1 else query.in_("status", statuses)
+    if phone:
+        query = query.eq("user_phone", phone)
+    if date_from:
+        query = query.gte("created_at", date_from)
+    if date_to:
+        query = query.lt("created_at", date_to)
+    if since:
+        query = query.gt("updated_at", since)
+    # One extra row tells us whether there is a next page
+    return query.order("id", desc=True).limit(limit + 1)
+
+def split_orders_page(rows: list, limit: int):
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]["id"]
+    return rows, None
+
+def get_orders_page(limit: int = 50, before_id: int = None, statuses: list = None, phone: str = None,
+                    date_from: str = None, date_to: str = None, since: str = None):
+    """
+    Fetches one page of orders (newest first) with their items.
+    before_id: keyset cursor, only orders with a smaller ID
+    statuses / phone: exact-match filters
+    date_from / date_to: created_at range, date_to exclusive
+    since: only orders changed after this timestamp
+    Returns (orders, next_cursor); next_cursor is None on the last page.
+    """
+    if not supabase: return [], None
+    try:
+        query = orders_page_query(supabase, limit, before_id, statuses, phone, date_from, date_to, since)
+        return split_orders_page(query.execute().data, limit)
+    except Exception as e:
+        logger.error(f"Error fetching orders page: {e}")
+        return [], None
+
+def orders_fingerprint_query(client):
+    return client.table("orders").select("updated_at", count="exact").order("updated_at", desc=True).limit(1)
+
+def format_orders_fingerprint(response) -> str:
+    latest = response.data[0]["updated_at"] if response.data else None
+    return f"{response.count}:{latest}"
+
+def get_orders_fingerprint():
+    """
+    Cheap summary of the orders table (row count and latest change) that
+    changes whenever any order is created, updated or deleted.
+    Returns None if it cannot be read.
+    """
+    if not supabase: return None
+    try:
+        return format_orders_fingerprint(orders_fingerprint_query(supabase).execute())
+    except Exception as e:
+        logger.error(f"Error fetching orders fingerprint: {e}")
+        return None
+
+def order_status_query(client, order_id: int, status: str):
+    return client.table("orders").update({"status": status}).eq("id", order_id)
+
+def publish_status_changes(orders: list):
+    for order in orders or []:
+        events.publish("order_status", {"id": order["id"], "status": order.get("status"), "user_phone": order.get("user_phone")})
+
 def update_order_status(order_id: int, status: str):
     """
     Updates the status of an order.
     """
     if not supabase: return {"error": "Supabase not configured"}
     try:
-        response = supabase.table("orders").update({"status": status}).eq("id", order_id).execute()
-        return response.data
+        rows = order_status_query(supabase, order_id, status).execute().data
+        publish_status_changes(rows)
+        return rows
     except Exception as e:
         logger.error(f"Error updating order status: {e}")
         return {"error": str(e)}
@@ -416,20 +584,16 @@ def get_address_update_count(phone_number: str):
         logger.error(f"Error fetching address update count: {e}")
         return 0
 
-def increment_address_update_count(phone_number: str):
+def increment_address_update_count(phone_number: str, limit: int = None):
     """
-    Increments the address update count by 1.
+    Atomically increments the address update count, in one call.
+    limit: only increment while the count is below this
+    Returns the new count, or None if the limit was already reached.
+    Raises on failure.
     """
-    if not supabase: return
-    try:
-        # We can't do atomic increment easily with simple update, so read-modify-write or RPC.
-        # For simplicity in this context, we'll read then write, or use a raw query if possible.
-        # Supabase-py doesn't support raw SQL easily without RPC.
-        # Let's do read-modify-write for now (low concurrency expected per user).
-        current = get_address_update_count(phone_number)
-        supabase.table("users").update({"address_update_count": current + 1}).eq("phone", phone_number).execute()
-    except Exception as e:
-        logger.error(f"Error incrementing address update count: {e}")
+    if not supabase: return None
+    response = supabase.rpc("increment_address_update_count", {"p_phone": phone_number, "p_limit": limit}).execute()
+    return response.data
 
 def reset_address_update_count(phone_number: str):
     """
@@ -441,3 +605,76 @@ def reset_address_update_count(phone_number: str):
     except Exception as e:
         logger.error(f"Error resetting address update count: {e}")
 
+def get_or_create_broadcast_job(job_key: str, name: str):
+    """
+    Fetches the broadcast job for job_key, creating it if this is the first run.
+    """
+    if not supabase: return None
+    try:
+        supabase.table("broadcast_jobs").upsert(
+            {"job_key": job_key, "name": name}, on_conflict="job_key", ignore_duplicates=True
+        ).execute()
+        response = supabase.table("broadcast_jobs").select("*").eq("job_key", job_key).execute()
+        return response.data[0] if response.data else None
+    except Exception as e:
+        logger.error(f"Error fetching broadcast job {job_key}: {e}")
+        return None
+
+def update_broadcast_job(job_id: int, fields: dict):
+    """
+    Updates a broadcast job's cursor, counters or status.
+    """
+    if not supabase: return
+    try:
+        fields = dict(fields, updated_at=datetime.datetime.utcnow().isoformat())
+        supabase.table("broadcast_jobs").update(fields).eq("id", job_id).execute()
+    except Exception as e:
+        logger.error(f"Error updating broadcast job {job_id}: {e}")
+
+def get_unfinished_broadcast_jobs(name: str):
+    """
+    Fetches broadcast jobs with this name that never completed.
+    """
+    if not supabase: return []
+    try:
+        response = supabase.table("broadcast_jobs").select("*").eq("name", name).eq("status", "running").execute()
+        return response.data
+    except Exception as e:
+        logger.error(f"Error fetching unfinished broadcast jobs: {e}")
+        return []
+
+def get_broadcast_ledger(job_id: int, phones: list):
+    """
+    Returns { phone: status } for the given recipients of a broadcast job.
+    Raises on failure: a broadcast must not send without knowing its ledger.
+    """
+    if not supabase or not phones: return {}
+    try:
+        response = supabase.table("broadcast_recipients").select("phone, status")\
+            .eq("job_id", job_id)\
+            .in_("phone", phones)\
+            .execute()
+        return {row["phone"]: row["status"] for row in response.data}
+    except Exception as e:
+        logger.error(f"Error fetching broadcast ledger for job {job_id}: {e}")
+        raise
+
+def record_broadcast_recipient(job_id: int, phone: str, status: str, whatsapp_message_id: str = None, error: str = None):
+    """
+    Writes one recipient's state to the broadcast ledger.
+    Raises on failure: a broadcast must not send without recording it.
+    """
+    if not supabase: return
+    supabase.table("broadcast_recipients").upsert({
+        "job_id": job_id,
+        "phone": phone,
+        "status": status,
+        "whatsapp_message_id": whatsapp_message_id,
+        "error": error,
+        "updated_at": datetime.datetime.utcnow().isoformat(),
+    }, on_conflict="job_id,phone").execute()
+
+# Time every database call (no-op with METRICS=off)
+# (not the pure query builders and row helpers, which only run inside those calls)
+_HELPERS = ("message_row", "split_orders_page", "split_user_history", "format_orders_fingerprint", "publish_status_changes")
+metrics.instrument(globals(), "db", exclude=_HELPERS + tuple(name for name in globals() if name.endswith("_query")))
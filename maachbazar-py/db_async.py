@@ -0,0 +1,205 @@
+# Awaitable db.py for async code: same function names, arguments and return values.
+# The paths the API serves run db.py's query builders natively on one pooled supabase AsyncClient;
+# everything else (and everything, on the SQLite backend or without credentials) runs db.py in a worker thread.
+import os
+import asyncio
+import functools
+import logging
+
+import httpx
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+
+import db
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "10"))  # seconds per request
+
+_client: AsyncClient = None
+_http: httpx.AsyncClient = None
+_lock = None
+
+async def get_client() -> AsyncClient:
+    """
+    Returns the shared async client, creating it on first use, or None if
+    Supabase is not configured.
+    """
+    global _client, _http, _lock
+    if _client is not None or db.DB_BACKEND != "supabase" or not (db.url and db.key) or db.supabase is None:
+        return _client
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        if _client is None:
+            _http = httpx.AsyncClient(
+                timeout=DB_TIMEOUT,
+                limits=httpx.Limits(max_connections=DB_POOL_SIZE, max_keepalive_connections=DB_POOL_SIZE),
+            )
+            try:
+                _client = await acreate_client(db.url, db.key, options=AsyncClientOptions(httpx_client=_http))
+            except Exception as e:
+                logger.error(f"Failed to initialize async Supabase client: {e}")
+                await _http.aclose()
+                _http = None
+    return _client
+
+def set_client(client: AsyncClient):
+    """
+    Replaces the shared client (e.g. with a fake in tests); None goes back to lazy creation.
+    """
+    global _client
+    _client = client
+
+async def close():
+    global _client, _http
+    http, _client, _http = _http, None, None
+    if http is not None:
+        await http.aclose()
+
+def _offload(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return wrapper
+
+def __getattr__(name: str):
+    # The rest of db.py's surface, awaitable
+    fn = getattr(db, name, None)
+    if name.startswith("_") or not callable(fn):
+        raise AttributeError(f"module 'db_async' has no attribute '{name}'")
+    return _offload(fn)
+
+async def get_inventory():
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.get_inventory)
+    try:
+        return (await db.inventory_query(client).execute()).data
+    except Exception as e:
+        logger.error(f"Error fetching inventory: {e}")
+        return []
+
+async def update_price(fish_name: str, new_price: int):
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.update_price, fish_name, new_price)
+    try:
+        return (await db.price_update_query(client, fish_name, new_price).execute()).data
+    except Exception as e:
+        logger.error(f"Error updating price: {e}")
+        return {"error": str(e)}
+
+async def update_inventory_item(item_id: int, price: int, is_available: bool):
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.update_inventory_item, item_id, price, is_available)
+    try:
+        return (await db.inventory_item_update_query(client, item_id, price, is_available).execute()).data
+    except Exception as e:
+        logger.error(f"Error updating inventory item: {e}")
+        return {"error": str(e)}
+
+async def add_fish(name: str, price: int, is_available: bool = True):
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.add_fish, name, price, is_available)
+    try:
+        return (await db.add_fish_query(client, name, price, is_available).execute()).data
+    except Exception as e:
+        logger.error(f"Error adding fish: {e}")
+        return {"error": str(e)}
+
+async def get_user_with_history(phone_number: str, limit: int = 5):
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.get_user_with_history, phone_number, limit)
+    try:
+        return db.split_user_history((await db.user_with_history_query(client, phone_number, limit).execute()).data)
+    except Exception as e:
+        logger.error(f"Error fetching user with history: {e}")
+        return None, []
+
+async def get_chat_history(phone_number: str, limit: int = 5):
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.get_chat_history, phone_number, limit)
+    try:
+        response = await db.chat_history_query(client, phone_number, limit).execute()
+        return response.data[::-1] if response.data else []
+    except Exception as e:
+        logger.error(f"Error fetching history: {e}")
+        return []
+
+async def get_user_orders(user_phone: str):
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.get_user_orders, user_phone)
+    try:
+        return (await db.user_orders_query(client, user_phone).execute()).data
+    except Exception as e:
+        logger.error(f"Error fetching user orders: {e}")
+        return []
+
+async def get_all_orders():
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.get_all_orders)
+    try:
+        return (await db.all_orders_query(client).execute()).data
+    except Exception as e:
+        logger.error(f"Error fetching all orders: {e}")
+        return []
+
+async def get_orders_page(limit: int = 50, before_id: int = None, statuses: list = None, phone: str = None,
+                          date_from: str = None, date_to: str = None, since: str = None):
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.get_orders_page, limit=limit, before_id=before_id, statuses=statuses,
+                                       phone=phone, date_from=date_from, date_to=date_to, since=since)
+    try:
+        query = db.orders_page_query(client, limit, before_id, statuses, phone, date_from, date_to, since)
+        return db.split_orders_page((await query.execute()).data, limit)
+    except Exception as e:
+        logger.error(f"Error fetching orders page: {e}")
+        return [], None
+
+async def get_orders_fingerprint():
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.get_orders_fingerprint)
+    try:
+        return db.format_orders_fingerprint(await db.orders_fingerprint_query(client).execute())
+    except Exception as e:
+        logger.error(f"Error fetching orders fingerprint: {e}")
+        return None
+
+async def update_order_status(order_id: int, status: str):
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.update_order_status, order_id, status)
+    try:
+        rows = (await db.order_status_query(client, order_id, status).execute()).data
+        db.publish_status_changes(rows)
+        return rows
+    except Exception as e:
+        logger.error(f"Error updating order status: {e}")
+        return {"error": str(e)}
+
+async def apply_message_statuses(updates: list) -> int:
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.apply_message_statuses, updates)
+    if not updates: return 0
+    response = await db.message_statuses_query(client, updates).execute()
+    return response.data or 0
+
+async def get_template_delivery_stats(days: int = 7):
+    client = await get_client()
+    if client is None:
+        return await asyncio.to_thread(db.get_template_delivery_stats, days)
+    try:
+        return (await db.template_delivery_stats_query(client, days).execute()).data
+    except Exception as e:
+        logger.error(f"Error fetching template delivery stats: {e}")
+        return []
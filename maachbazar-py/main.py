@@ -1,7 +1,10 @@
 import os
+import json
+import asyncio
+import datetime
 import logging
 from fastapi import FastAPI, Request, HTTPException, Query
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -9,9 +12,25 @@ from dotenv import load_dotenv
 # Import local modules
 # Import local modules
 import db
+import db_async
 import brain
 import whatsapp_utils
 from services import whatsapp
+from services.worker import WorkerPool
+from services import user_context
+from services import inventory
+from services import ai
+from services import graph_client
+from services import leader
+from services import session_store
+from services import message_log
+from services import status_ingest
+from services import events
+from services import intents
+from services import reply_stream
+from services.metrics import metrics
+from services.rate_limit import turn_limiter, turn_notice_limiter
+from services.debounce import Debouncer
 import hmac
 import hashlib
 from fastapi import Header
@@ -38,6 +57,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 def verify_signature(raw_body: bytes, signature_header: str | None) -> bool:
@@ -67,19 +87,15 @@ def verify_signature(raw_body: bytes, signature_header: str | None) -> bool:
     # constant time comparison to prevent timing attacks
     return hmac.compare_digest(transmitted_sig, expected_sig)
 
-# Session Management
-import time
-SESSION_EXPIRY = 24 * 60 * 60  # 24 hours
-sessions = {}  # { user_id: last_timestamp }
+# Session Management (SESSION_STORE=sqlite shares sessions between workers)
+SESSION_EXPIRY = session_store.SESSION_EXPIRY  # 24 hours
+sessions = session_store.make_store()  # { user_id: last_timestamp }
 
 def update_session(user_id: str):
-    sessions[user_id] = int(time.time())
+    sessions.touch(user_id)
 
 def session_active(user_id: str) -> bool:
-    ts = sessions.get(user_id)
-    if not ts:
-        return False
-    return (int(time.time()) - ts) <= SESSION_EXPIRY
+    return sessions.is_active(user_id)
 
 class PriceUpdate(BaseModel):
     name: str
@@ -97,23 +113,124 @@ class AddFish(BaseModel):
 
 @app.get("/api/inventory")
 async def get_inventory():
-    return db.get_inventory()
+    return (await inventory.get_snapshot_async()).items
 
 @app.post("/api/inventory")
 async def update_inventory(update: InventoryUpdate):
-    return db.update_inventory_item(update.id, update.price, update.is_available)
+    result = await db_async.update_inventory_item(update.id, update.price, update.is_available)
+    inventory.invalidate()
+    return result
 
 @app.post("/api/inventory/add")
 async def add_fish(fish: AddFish):
-    return db.add_fish(fish.name, fish.price, fish.is_available)
+    result = await db_async.add_fish(fish.name, fish.price, fish.is_available)
+    inventory.invalidate()
+    return result
 
 @app.post("/api/update")
 async def update_price(update: PriceUpdate):
-    return db.update_price(update.name, update.price)
+    result = await db_async.update_price(update.name, update.price)
+    inventory.invalidate()
+    return result
+
+ORDERS_PAGE_SIZE = 50
+ORDERS_MAX_PAGE_SIZE = 200
 
 @app.get("/api/orders")
-async def get_orders():
-    return db.get_all_orders()
+async def get_orders(
+    request: Request,
+    limit: int | None = Query(None, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    status: str | None = None,
+    phone: str | None = None,
+    date_from: datetime.date | None = None,
+    date_to: datetime.date | None = None,
+    since: datetime.datetime | None = None,
+):
+    """
+    Orders, newest first. Without any parameters, all orders (as before paging);
+    otherwise one page of ORDERS_PAGE_SIZE unless limit is given.
+    cursor: the X-Next-Cursor header of the previous page
+    status: one status or a comma-separated list
+    date_from / date_to: order creation dates, both inclusive
+    since: only orders changed after this timestamp (incremental refresh)
+    Sends an ETag; a matching If-None-Match gets a 304 without loading any orders.
+    """
+    try:
+        before_id = int(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    fingerprint = await db_async.get_orders_fingerprint()
+    etag = None
+    if fingerprint:
+        digest = hashlib.sha1(f"{fingerprint}|{request.url.query}".encode("utf-8")).hexdigest()
+        etag = f'W/"{digest}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    headers = {"Cache-Control": "no-cache"}
+    if etag:
+        headers["ETag"] = etag
+    if all(value is None for value in (limit, cursor, status, phone, date_from, date_to, since)):
+        return JSONResponse(content=await db_async.get_all_orders(), headers=headers)
+
+    orders, next_cursor = await db_async.get_orders_page(
+        limit=limit or ORDERS_PAGE_SIZE,
+        before_id=before_id,
+        statuses=[s.strip() for s in status.split(",") if s.strip()] if status else None,
+        phone=phone,
+        date_from=date_from.isoformat() if date_from else None,
+        date_to=(date_to + datetime.timedelta(days=1)).isoformat() if date_to else None,
+        since=since.isoformat() if since else None,
+    )
+
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    return JSONResponse(content=orders, headers=headers)
+
+ORDER_STREAM_KEEPALIVE = 15  # seconds between SSE comments, keeps proxies from closing idle streams
+
+@app.get("/api/orders/stream")
+async def stream_orders(request: Request, last_event_id: int | None = None):
+    """
+    Server-sent events for the dashboard: 'order_created' and 'order_status'.
+    On reconnect, EventSource sends Last-Event-ID and missed events are replayed;
+    a 'resync' event means too much was missed and /api/orders should be re-fetched.
+    """
+    header = request.headers.get("last-event-id")
+    if header:
+        try:
+            last_event_id = int(header)
+        except ValueError:
+            pass
+
+    subscription = events.hub.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            if subscription.missed:
+                yield "event: resync\ndata: {}\n\n"
+            for event in subscription.replay:
+                yield event.to_sse()
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), ORDER_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield event.to_sse()
+        finally:
+            events.hub.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
 
 class OrderStatusUpdate(BaseModel):
     order_id: int
@@ -122,7 +239,7 @@ class OrderStatusUpdate(BaseModel):
 @app.post("/api/orders/status")
 async def update_order_status(update: OrderStatusUpdate):
     # 1. Update in DB
-    result = db.update_order_status(update.order_id, update.status)
+    result = await db_async.update_order_status(update.order_id, update.status)
     
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
@@ -144,8 +261,9 @@ async def update_order_status(update: OrderStatusUpdate):
             else:
                 message = f"Update on your order #{update.order_id}: Status is now '{update.status}'."
                 
-            whatsapp.send_message(user_phone, message)
-            db.log_message(user_phone, "assistant", message)
+            # The blocking client may back off on a 429; keep that off the event loop
+            await asyncio.to_thread(whatsapp.send_message, user_phone, message)
+            user_context.record_message(user_phone, "assistant", message)
         else:
             # Session expired, send template
             logger.warning(f"Session expired for {user_phone}. Sending order_update template.")
@@ -170,7 +288,8 @@ async def update_order_status(update: OrderStatusUpdate):
                 }
             ]
             
-            whatsapp.send_template(
+            await asyncio.to_thread(
+                whatsapp.send_template,
                 user_phone, 
                 "order_update", 
                 language_code="en", 
@@ -193,6 +312,40 @@ async def login(credentials: LoginRequest):
     else:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+@app.get("/api/stats")
+async def get_stats():
+    """
+    Cache and pipeline counters for the admin dashboard.
+    """
+    return {
+        "model_registry": ai.get_model_stats(),
+        "ai_cache": ai.get_cache_stats(),
+        "webhook_pool": webhook_pool.stats(),
+        "debounce": debouncer.stats(),
+        "intent_router": intents.router.stats(),
+        "message_log": message_log.writer.stats(),
+        "status_ingest": status_ingest.aggregator.stats(),
+        "order_events": events.hub.stats(),
+        "turn_limiter": turn_limiter.stats(),
+        "scheduler": scheduler_leader.status() if scheduler_leader else None,
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Hot-path timings and counters in Prometheus text format (this worker only).
+    """
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/metrics/delivery")
+async def get_delivery_metrics(days: int = 7):
+    """
+    Delivery and read rates per template per day.
+    """
+    return await db_async.get_template_delivery_stats(days)
+
 @app.get("/")
 async def root():
     return {"message": "Maachbazar Bot is running! 🐟"}
@@ -214,72 +367,54 @@ async def verify_webhook(
         raise HTTPException(status_code=403, detail="Verification failed")
 
 
-@app.post("/webhook")
-async def webhook_handler(
-    request: Request,
-    x_hub_signature_256: str | None = Header(default=None)
-):
+def handle_status(status: dict):
     """
-    Handles incoming webhook events.
+    Handles a delivery status update (sent, delivered, read, failed).
+    Statuses are coalesced per message and written in batches.
     """
-    # 1. Read raw body (bytes)
-    raw_body = await request.body()
-    
-    # 2. Verify authenticity
-    # Only verify if we have the secret set, to allow local dev if needed, or enforce strictness?
-    # User said: "Reject if mismatch". 
-    if APP_SECRET: 
-        if not verify_signature(raw_body, x_hub_signature_256):
-            logger.warning("Signature verification failed")
-            raise HTTPException(status_code=403, detail="Invalid signature")
-    else:
-        logger.warning("WHATSAPP_APP_SECRET not set, skipping signature verification")
+    logger.debug(f"Message {status.get('id')} to {status.get('recipient_id')} is {status.get('status')}")
+    status_ingest.add(status)
 
+def handle_webhook_event(event: whatsapp.WebhookEvent):
+    """
+    Processes one message or status from a verified webhook payload.
+    Called from the webhook worker pool, off the event loop.
+    """
     try:
-        payload = await request.json()
-        logger.info(f"Received webhook payload: {payload}")
-
-        # Extract basic info
-        entry = payload.get("entry", [])[0]
-        changes = entry.get("changes", [])[0]
-        value = changes.get("value", {})
-        messages = value.get("messages", [])
-
-        if not messages:
-            # Check for statuses
-            statuses = value.get("statuses", [])
-            if statuses:
-                for status in statuses:
-                    # status updates: sent, delivered, read, failed
-                    # We can log this or update a 'messages' table row if we track by ID
-                    wamid = status.get("id")
-                    status_state = status.get("status")
-                    recipient_id = status.get("recipient_id")
-                    
-                    logger.info(f"Message {wamid} to {recipient_id} is {status_state}")
-                    # If we had a mechanism to update message status in DB, we'd do it here.
-                    # For now just logging is sufficient for MVP or extended later.
-                return {"status": "ok"}
-            
-            return {"status": "ok"}
+        if event.kind == "status":
+            handle_status(event.item)
+            return
 
-        message = messages[0]
-        sender_id = message.get("from")
-        msg_type = message.get("type")
+        with metrics.message(event.item.get("type", "unknown")):
+            handle_message(event.item)
+    except Exception as e:
+        logger.error(f"Error processing webhook: {e}")
 
-        # UPDATE SESSION for any message from user
-        update_session(sender_id)
-        
-        # UPDATE OPT-IN & LAST ACTIVE
-        db.update_user_last_active(sender_id)
+MAX_ADDRESS_CHANGES = 3  # per order
+TURN_LIMIT_REPLY = "You're sending messages faster than we can answer. Please wait a minute and try again. 🙏"
 
-        # 1. Check/Create User
-        user, is_new = db.get_or_create_user(sender_id)
+def handle_message(message: dict):
+    """
+    Handles one inbound user message. The user's context is loaded once and
+    any profile changes are written back in a single update at the end.
+    """
+    sender_id = message.get("from")
+    msg_type = message.get("type")
 
+    # UPDATE SESSION for any message from user
+    update_session(sender_id)
+
+    # 1. Check/Create User (row + recent history in one query)
+    ctx = user_context.load(sender_id)
+
+    # UPDATE OPT-IN & LAST ACTIVE (written back with the other changes)
+    ctx.touch()
+
+    try:
         # 2. Handle New User -> Send Language Menu
-        if is_new:
+        if ctx.is_new:
             whatsapp_utils.send_language_menu(sender_id)
-            return {"status": "ok"}
+            return
 
         # 3. Handle Language Selection & Button Replies (Interactive Reply)
         if msg_type == "interactive":
@@ -291,117 +426,230 @@ async def webhook_handler(
                 # Map selection_id to language code
                 lang_map = {"lang_en": "English", "lang_bn": "Bangla", "lang_hi": "Hinglish"}
                 selected_lang = lang_map.get(selection_id, "English")
-                
-                db.update_user_language(sender_id, selected_lang)
+
+                ctx.set("language", selected_lang)
                 whatsapp.send_message(sender_id, f"Language set to {selected_lang}. How can I help you today?")
-                return {"status": "ok"}
-            
+                return
+
             elif interactive_type == "button_reply":
                 button_id = interactive.get("button_reply", {}).get("id")
-                button_title = interactive.get("button_reply", {}).get("title")
-                
+
                 if button_id == "confirm_order":
                     # Treat as text message "Confirm"
                     message_text = "Confirm"
-                    
+
                     # Extract context ID (the ID of the message being replied to)
                     context_id = message.get("context", {}).get("id")
                     internal_message_id = None
-                    
+
                     if context_id:
-                        internal_message_id = db.get_message_id_by_whatsapp_id(context_id)
+                        internal_message_id = message_log.resolve_message_id(context_id)
                         logger.info(f"Resolved context_id {context_id} to internal_message_id {internal_message_id}")
 
                     logger.info(f"Processing button reply from {sender_id}: {message_text}")
-                    db.log_message(sender_id, "user", message_text)
-                    
+                    ctx.log_message("user", message_text)
+
                     # Pass internal_message_id to brain
-                    ai_response = brain.generate_response(sender_id, message_text, message_id=internal_message_id)
-                    
+                    ai_response = brain.generate_response(sender_id, message_text, message_id=internal_message_id, context=ctx,
+                                                          stream=_reply_stream(ctx, message.get("id")))
+
                     if ai_response:
-                        db.log_message(sender_id, "assistant", ai_response)
+                        ctx.log_message("assistant", ai_response)
                         whatsapp.send_message(sender_id, ai_response)
-                    return {"status": "ok"}
-                
+                    return
+
                 elif button_id == "change_address":
                     # Handle Change Address
                     logger.info(f"User {sender_id} requested to change address")
-                    db.update_user_state(sender_id, "AWAITING_ADDRESS")
-                    
+                    ctx.set("conversation_state", "AWAITING_ADDRESS")
+
                     response_text = "Please type your new address (include Floor, Block, Gali)."
                     whatsapp.send_message(sender_id, response_text)
-                    db.log_message(sender_id, "assistant", response_text)
-                    return {"status": "ok"}
+                    ctx.log_message("assistant", response_text)
+                    return
 
         # 4. Handle Text Message
         if msg_type == "text":
             message_text = message.get("text", {}).get("body")
             logger.info(f"Processing message from {sender_id}: {message_text}")
-            
+
             # 0. Check User State
-            current_state = db.get_user_state(sender_id)
-            
-            if current_state == "AWAITING_ADDRESS":
+            if ctx.state == "AWAITING_ADDRESS":
                 # 0.1 Validate Address (Non-empty)
                 if not message_text or not message_text.strip():
                     response_text = "Please provide a valid address. It cannot be empty."
                     whatsapp.send_message(sender_id, response_text)
-                    db.log_message(sender_id, "assistant", response_text)
-                    return {"status": "ok"}
-
-                # 0.2 Check Rate Limit
-                update_count = db.get_address_update_count(sender_id)
-                if update_count >= 3:
+                    ctx.log_message("assistant", response_text)
+                    return
+
+                # 0.2 Check Rate Limit: atomic increment-and-check, so two quick
+                # messages can't both get past the last allowed change
+                counted = True  # the database already has the new count
+                try:
+                    update_count = db.increment_address_update_count(sender_id, limit=MAX_ADDRESS_CHANGES)
+                except Exception as e:
+                    logger.error(f"Error incrementing address update count: {e}")
+                    # Same limit on the count we loaded; written back with the address
+                    counted = False
+                    update_count = ctx.address_update_count + 1
+                    if update_count > MAX_ADDRESS_CHANGES:
+                        update_count = None
+
+                if update_count is None:
+                    ctx.sync("address_update_count", MAX_ADDRESS_CHANGES)
                     response_text = "Maximum address changes reached. Please contact support."
                     whatsapp.send_message(sender_id, response_text)
-                    db.log_message(sender_id, "assistant", response_text)
+                    ctx.log_message("assistant", response_text)
                     # Clear state so they are not stuck
-                    db.update_user_state(sender_id, None)
-                    return {"status": "ok"}
+                    ctx.set("conversation_state", None)
+                    return
 
                 # Treat this text as the new address
                 new_address = message_text.strip()
-                db.update_user_address(sender_id, new_address)
-                db.increment_address_update_count(sender_id)
-                db.update_user_state(sender_id, None) # Clear state
-                
+                ctx.set("address", new_address)
+                if counted:
+                    ctx.sync("address_update_count", update_count)
+                else:
+                    ctx.set("address_update_count", update_count)
+                ctx.set("conversation_state", None) # Clear state
+
                 # Log the address update
-                db.log_message(sender_id, "user", f"Updated address to: {new_address}")
-                
+                ctx.log_message("user", f"Updated address to: {new_address}")
+
                 # Trigger confirmation again
-                remaining = 3 - (update_count + 1)
+                remaining = max(0, MAX_ADDRESS_CHANGES - update_count)
                 confirm_msg = f"Address updated to: {new_address}. (Changes remaining: {remaining})\nDo you want to confirm your order now?"
-                
+
                 # Send interactive buttons again
                 buttons = [
                     {"id": "confirm_order", "title": "Confirm Korun ✅"},
                     {"id": "change_address", "title": "Change Address 🏠"}
                 ]
                 wamid = whatsapp_utils.send_interactive_button(sender_id, confirm_msg, buttons)
-                db.log_message(sender_id, "assistant", confirm_msg, whatsapp_message_id=wamid)
-                return {"status": "ok"}
+                ctx.log_message("assistant", confirm_msg, whatsapp_message_id=wamid)
+                return
 
             # 1. Log User Message
-            db.log_message(sender_id, "user", message_text)
+            ctx.log_message("user", message_text)
+
+            if not turn_limiter.hit(sender_id):
+                logger.warning(f"Turn limit reached for {sender_id}, not answering")
+                # Tell them once per window, not once per flooded message
+                if turn_notice_limiter.hit(sender_id):
+                    wamid = whatsapp.send_message(sender_id, TURN_LIMIT_REPLY)
+                    ctx.log_message("assistant", TURN_LIMIT_REPLY, whatsapp_message_id=wamid)
+                return
 
             # 2. Generate AI response (Brain)
-            ai_response = brain.generate_response(sender_id, message_text)
-            
-            # 3. Send response back to WhatsApp
-            wamid = whatsapp.send_message(sender_id, ai_response)
+            ai_response = brain.generate_response(sender_id, message_text, context=ctx,
+                                                  stream=_reply_stream(ctx, message.get("id")))
 
-            # 4. Log Assistant Message
-            db.log_message(sender_id, "assistant", ai_response, whatsapp_message_id=wamid)
-        
-        return {"status": "ok"}
-    except Exception as e:
-        logger.error(f"Error processing webhook: {e}")
+            # 3. Send response back to WhatsApp (None means brain already sent it with buttons)
+            if ai_response:
+                wamid = whatsapp.send_message(sender_id, ai_response)
+
+                # 4. Log Assistant Message
+                ctx.log_message("assistant", ai_response, whatsapp_message_id=wamid)
+    finally:
+        ctx.flush()
+
+def _reply_stream(ctx, inbound_wamid: str):
+    """
+    In streaming mode, shows "typing..." as soon as Gemini is asked and sends
+    the first sentences of the reply before the rest is generated.
+    """
+    if not reply_stream.AI_STREAMING:
+        return None
+
+    def send(text: str):
+        wamid = whatsapp.send_message(ctx.phone, text)
+        ctx.log_message("assistant", text, whatsapp_message_id=wamid)
+
+    return reply_stream.ReplyStream(send=send, on_start=lambda: whatsapp.send_typing_indicator(inbound_wamid))
+
+def _conversation_state(user_id: str):
+    ctx = user_context.peek(user_id)
+    return ctx.state if ctx else None
+
+webhook_pool = WorkerPool(handle_webhook_event)
+# Merges bursts of texts from one user into a single AI turn (off unless MESSAGE_DEBOUNCE is set)
+debouncer = Debouncer(webhook_pool.submit_many, state_of=_conversation_state)
+
+@app.post("/webhook")
+async def webhook_handler(
+    request: Request,
+    x_hub_signature_256: str | None = Header(default=None)
+):
+    """
+    Handles incoming webhook events.
+    """
+    # 1. Read raw body (bytes)
+    raw_body = await request.body()
+    
+    # 2. Verify authenticity
+    # Only verify if we have the secret set, to allow local dev if needed, or enforce strictness?
+    # User said: "Reject if mismatch". 
+    if APP_SECRET: 
+        with metrics.span("verify_signature"):
+            verified = verify_signature(raw_body, x_hub_signature_256)
+        if not verified:
+            logger.warning("Signature verification failed")
+            raise HTTPException(status_code=403, detail="Invalid signature")
+    else:
+        logger.warning("WHATSAPP_APP_SECRET not set, skipping signature verification")
+
+    try:
+        payload = json.loads(raw_body)
+        if not isinstance(payload, dict):
+            raise ValueError("payload is not a JSON object")
+    except ValueError as e:
+        logger.error(f"Invalid webhook payload: {e}")
         return {"status": "error", "message": str(e)}
 
+    logger.info(f"Received webhook payload: {payload}")
+
+    # 3. Hand every message in the batch to the worker pool and acknowledge Meta right away.
+    # Events are keyed by user so each user's messages stay in order.
+    # Statuses skip the pool: they are only coalesced in memory here, so a
+    # post-broadcast status flood never queues in front of customer messages.
+    # Texts may be held briefly by the debouncer, but only once the batch is accepted.
+    # A 503 makes Meta redeliver later instead of us dropping the batch.
+    batch = []
+    for event in whatsapp.iter_webhook_events(payload):
+        if event.kind == "status":
+            handle_status(event.item)
+        else:
+            batch.append((event.user_id, event))
+    if batch and not debouncer.submit_batch(batch):
+        raise HTTPException(status_code=503, detail="Webhook queue is full")
+
+    return {"status": "ok"}
+
+scheduler_leader = None
+
 @app.on_event("startup")
 async def startup_event():
-    from services.scheduler import start_scheduler
-    start_scheduler()
+    global scheduler_leader
+    from services.scheduler import start_scheduler, stop_scheduler
+    await webhook_pool.start()
+    await events.hub.start()
+
+    # gunicorn runs several workers; only the one holding the lock runs scheduled jobs
+    scheduler_leader = leader.LeaderElector(leader.make_lock(), on_elected=start_scheduler, on_demoted=stop_scheduler)
+    await scheduler_leader.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if scheduler_leader:
+        await scheduler_leader.stop()
+    debouncer.flush_all()
+    await webhook_pool.stop()
+    await events.hub.stop()
+    await asyncio.to_thread(message_log.close)
+    await asyncio.to_thread(status_ingest.close)
+    await graph_client.close_clients()
+    await db_async.close()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
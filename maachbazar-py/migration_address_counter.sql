@@ -0,0 +1,16 @@
+-- Migration: Atomic Address Change Counter
+
+-- 1. Increment-and-check in one statement, so concurrent messages can't both
+-- read the same count and slip past the limit.
+-- p_limit: only increment while the count is below it (NULL = no limit)
+-- Returns the new count, or NULL if the limit was already reached (or the user doesn't exist).
+CREATE OR REPLACE FUNCTION increment_address_update_count(p_phone TEXT, p_limit INTEGER DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    UPDATE users
+    SET address_update_count = COALESCE(address_update_count, 0) + 1
+    WHERE phone = p_phone
+      AND (p_limit IS NULL OR COALESCE(address_update_count, 0) < p_limit)
+    RETURNING address_update_count;
+$$;
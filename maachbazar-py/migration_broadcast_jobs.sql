@@ -0,0 +1,31 @@
+-- Migration: Resumable Broadcast Jobs
+
+-- 1. One row per broadcast run (e.g. 'morning_broadcast:2026-10-18')
+-- cursor: last recipient phone whose page has been fully processed, so a restart resumes after it.
+CREATE TABLE IF NOT EXISTS broadcast_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    job_key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running', -- running | completed | abandoned
+    cursor TEXT,
+    sent INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    completed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs(name, status);
+
+-- 2. Per-recipient ledger
+-- status: 'sending' is written just before the API call, then 'sent' or 'failed'.
+-- A resumed job skips 'sending' and 'sent' rows so nobody gets the same broadcast twice.
+CREATE TABLE IF NOT EXISTS broadcast_recipients (
+    job_id BIGINT NOT NULL REFERENCES broadcast_jobs(id) ON DELETE CASCADE,
+    phone TEXT NOT NULL,
+    status TEXT NOT NULL,
+    whatsapp_message_id TEXT,
+    error TEXT,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (job_id, phone)
+);
@@ -0,0 +1,64 @@
+-- Migration: WhatsApp Delivery Statuses
+
+-- 1. Latest delivery state per outbound message
+-- delivery_status: sent | delivered | read | failed
+-- template_name: set for template messages (broadcasts), so rates can be reported per template.
+ALTER TABLE messages
+ADD COLUMN IF NOT EXISTS delivery_status TEXT,
+ADD COLUMN IF NOT EXISTS status_updated_at TIMESTAMPTZ,
+ADD COLUMN IF NOT EXISTS delivery_error TEXT,
+ADD COLUMN IF NOT EXISTS template_name TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_messages_template_name ON messages(template_name) WHERE template_name IS NOT NULL;
+
+-- 2. Applies a batch of coalesced status updates in one round trip.
+-- p_updates: [{"whatsapp_message_id": "...", "status": "read", "updated_at": "...", "error": null}, ...]
+-- A status never moves backwards (e.g. a late 'delivered' after 'read'); 'failed' and 'read' are final.
+-- Returns the number of messages updated.
+CREATE OR REPLACE FUNCTION delivery_status_rank(p_status TEXT)
+RETURNS INTEGER
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT CASE p_status
+        WHEN 'sent' THEN 1
+        WHEN 'delivered' THEN 2
+        WHEN 'read' THEN 3
+        WHEN 'failed' THEN 3
+        ELSE 0
+    END;
+$$;
+
+CREATE OR REPLACE FUNCTION apply_message_statuses(p_updates JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE messages m
+    SET delivery_status = u.status,
+        status_updated_at = u.updated_at,
+        delivery_error = u.error
+    FROM jsonb_to_recordset(p_updates) AS u(whatsapp_message_id TEXT, status TEXT, updated_at TIMESTAMPTZ, error TEXT)
+    WHERE m.whatsapp_message_id = u.whatsapp_message_id
+      AND delivery_status_rank(u.status) > delivery_status_rank(m.delivery_status);
+
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$;
+
+-- 3. Delivery and read rates per template per day
+CREATE OR REPLACE VIEW template_delivery_stats AS
+SELECT
+    template_name,
+    DATE(created_at) AS day,
+    COUNT(*) AS sent,
+    COUNT(*) FILTER (WHERE delivery_status IN ('delivered', 'read')) AS delivered,
+    COUNT(*) FILTER (WHERE delivery_status = 'read') AS read,
+    COUNT(*) FILTER (WHERE delivery_status = 'failed') AS failed,
+    ROUND(100.0 * COUNT(*) FILTER (WHERE delivery_status IN ('delivered', 'read')) / COUNT(*), 1) AS delivery_rate,
+    ROUND(100.0 * COUNT(*) FILTER (WHERE delivery_status = 'read') / COUNT(*), 1) AS read_rate
+FROM messages
+WHERE template_name IS NOT NULL
+GROUP BY template_name, DATE(created_at);
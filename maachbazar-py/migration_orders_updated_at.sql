@@ -0,0 +1,29 @@
+-- Migration: Incremental Order Sync
+
+-- 1. Track when each order last changed, so the dashboard can fetch only what changed.
+ALTER TABLE orders
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ DEFAULT NOW();
+
+UPDATE orders SET updated_at = COALESCE(order_created_at, created_at, NOW()) WHERE updated_at IS NULL;
+
+-- 2. Keep updated_at current on every write, whoever makes it (API, Supabase UI, SQL).
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS orders_touch_updated_at ON orders;
+CREATE TRIGGER orders_touch_updated_at
+BEFORE UPDATE ON orders
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- 3. Indexes for the paginated /api/orders filters
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at ON orders(updated_at);
+CREATE INDEX IF NOT EXISTS idx_orders_status_id ON orders(status, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_user_phone_id ON orders(user_phone, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
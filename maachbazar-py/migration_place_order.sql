@@ -0,0 +1,71 @@
+-- Migration: Atomic Order Placement
+
+-- 1. An order with its items, as JSON
+CREATE OR REPLACE FUNCTION order_json(p_order_id BIGINT)
+RETURNS JSONB
+LANGUAGE sql STABLE
+AS $$
+    SELECT to_jsonb(o) || jsonb_build_object(
+        'order_items',
+        COALESCE((SELECT jsonb_agg(to_jsonb(i) ORDER BY i.id) FROM order_items i WHERE i.order_id = o.id), '[]'::jsonb)
+    )
+    FROM orders o
+    WHERE o.id = p_order_id;
+$$;
+
+-- 2. Places an order in one transaction and one round trip:
+-- inserts the order and its items, marks the triggering message, saves the
+-- delivery address and resets the address change counter.
+-- p_items: [{"fish_name": "Rohu", "quantity": 1.5, "price_per_kg": 250}, ...]
+-- Idempotency comes from the unique_message_order constraint: a second call
+-- for the same message (e.g. a double "Confirm" tap) inserts nothing and
+-- returns the existing order with duplicate = true.
+-- Returns {"duplicate": bool, "order": {...order, "order_items": [...]}}
+CREATE OR REPLACE FUNCTION place_order(
+    p_user_phone TEXT,
+    p_items JSONB,
+    p_address TEXT DEFAULT NULL,
+    p_message_id BIGINT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_order_id BIGINT;
+    v_total INTEGER;
+BEGIN
+    SELECT COALESCE(SUM(TRUNC((item->>'quantity')::NUMERIC * (item->>'price_per_kg')::NUMERIC)), 0)::INTEGER
+    INTO v_total
+    FROM jsonb_array_elements(p_items) AS item;
+
+    INSERT INTO orders (user_phone, total_price, status, delivery_address, message_id)
+    VALUES (p_user_phone, v_total, 'pending', p_address, p_message_id)
+    ON CONFLICT ON CONSTRAINT unique_message_order DO NOTHING
+    RETURNING id INTO v_order_id;
+
+    IF v_order_id IS NULL THEN
+        SELECT id INTO v_order_id FROM orders WHERE message_id = p_message_id;
+        RETURN jsonb_build_object('duplicate', TRUE, 'order', order_json(v_order_id));
+    END IF;
+
+    INSERT INTO order_items (order_id, fish_name, quantity, price_per_kg, subtotal)
+    SELECT
+        v_order_id,
+        item->>'fish_name',
+        (item->>'quantity')::NUMERIC,
+        TRUNC((item->>'price_per_kg')::NUMERIC)::INTEGER,
+        TRUNC((item->>'quantity')::NUMERIC * (item->>'price_per_kg')::NUMERIC)::INTEGER
+    FROM jsonb_array_elements(p_items) AS item;
+
+    IF p_message_id IS NOT NULL THEN
+        UPDATE messages SET order_placed = TRUE WHERE id = p_message_id;
+    END IF;
+
+    UPDATE users
+    SET address = COALESCE(p_address, address),
+        address_update_count = 0
+    WHERE phone = p_user_phone;
+
+    RETURN jsonb_build_object('duplicate', FALSE, 'order', order_json(v_order_id));
+END;
+$$;
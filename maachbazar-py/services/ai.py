@@ -1,5 +1,9 @@
 import os
+import time
 import logging
+import threading
+from collections import OrderedDict
+from string import Template
 import google.generativeai as genai
 
 logger = logging.getLogger(__name__)
@@ -11,24 +15,21 @@ if GEMINI_API_KEY:
 else:
     logger.warning("GEMINI_API_KEY not set")
 
+MODEL_NAME = "gemini-flash-latest"
+
+# Replies to general questions (no address, no conversation state) are shared between users
+AI_CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "500"))  # 0 turns the cache off
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "900"))  # seconds
+
 import db
+from services import user_context
+from services import inventory
+from services import intents
+from services.metrics import metrics
 
-def get_system_instruction(user_address: str = None):
-    """
-    Dynamically generates the system instruction with current prices and user context.
-    """
-    inventory = db.get_inventory()
-    
-    price_list = ""
-    if inventory:
-        for item in inventory:
-            price_list += f"- {item['name']}: ₹{item['price']}/kg\n"
-    else:
-        price_list = "Inventory unavailable. Please check back later."
-
-    address_context = f"User's Address: {user_address}" if user_address else "User's Address: Not provided yet."
-
-    return f"""
+# Rendered once per (inventory version, address present) by the model registry.
+# The address itself goes into the per-message prompt so the instruction can be shared.
+SYSTEM_INSTRUCTION_TEMPLATE = Template("""
 You are a polite and friendly Bengali fishmonger at Maachbazar.
 You speak a mix of English, Hindi, and Bengali (Hinglish).
 
@@ -36,25 +37,35 @@ Your goal is to help customers place orders following this STRICT flow:
 1. **Price List**: Share the daily price list if asked.
 2. **Selection**: Ask what fish and quantity they want.
 3. **Suggestions**: Suggest other available fish if appropriate.
-4. **Address**: Ask for their delivery address. (Current: {address_context})
+4. **Address**: Ask for their delivery address. (Current: $address_context)
    - If you already have the address, confirm if they want to use it.
 5. **Bill**: Calculate the total bill and show it to them.
 6. **Confirmation**: Ask "Do you want to confirm this order?"
 7. **Order Placement**: ONLY call the `place_order` tool after the user explicitly types "confirm" or says "yes" to the bill.
 
 **Daily Price List**:
-{price_list}
+$price_list
 
 **Rules**:
 - Do NOT place an order without an address.
 - Do NOT place an order without explicit confirmation after showing the bill.
 - Keep responses concise (under 50 words).
-"""
+""")
 
-model = genai.GenerativeModel(
-    model_name="gemini-flash-latest"
-)
+ADDRESS_KNOWN = "User's Address is given at the top of the conversation."
+ADDRESS_UNKNOWN = "User's Address: Not provided yet."
+
+def get_system_instruction(has_address: bool = False, price_list: str = None):
+    """
+    Renders the system instruction with current prices and whether we know the user's address.
+    """
+    if price_list is None:
+        price_list = inventory.get_snapshot().price_list
 
+    return SYSTEM_INSTRUCTION_TEMPLATE.substitute(
+        address_context=ADDRESS_KNOWN if has_address else ADDRESS_UNKNOWN,
+        price_list=price_list,
+    )
 
 # Tool Definition
 place_order_tool = {
@@ -89,33 +100,226 @@ place_order_tool = {
     ]
 }
 
-def generate_response(prompt: str, user_phone: str = None, user_address: str = None, message_id: int = None) -> str:
+class ModelRegistry:
+    """
+    Keeps configured Gemini models warm, keyed by (inventory version, address present).
+    A new inventory version drops the models built for older versions.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, has_address: bool):
+        snapshot = inventory.get_snapshot()
+        key = (snapshot.version, bool(has_address))
+
+        with self._lock:
+            model = self._models.get(key)
+            if model:
+                self.hits += 1
+                return model
+            self.misses += 1
+
+        logger.info(f"Building Gemini model for inventory version {snapshot.version} (address: {bool(has_address)})")
+        model = genai.GenerativeModel(
+            model_name=MODEL_NAME,
+            system_instruction=get_system_instruction(has_address, snapshot.price_list),
+            tools=[place_order_tool]
+        )
+
+        with self._lock:
+            for stale_key in [k for k in self._models if k[0] != snapshot.version]:
+                del self._models[stale_key]
+            self._models[key] = model
+        return model
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "models": len(self._models)}
+
+model_registry = ModelRegistry()
+
+def get_model_stats() -> dict:
+    return model_registry.stats()
+
+class ResponseCache:
+    """
+    LRU + TTL cache of Gemini replies, keyed by (normalized message,
+    language, inventory version). A new inventory version - i.e. a price
+    or stock change - drops every reply built on the old one. Only for
+    turns whose reply doesn't depend on the user; the caller decides that.
+    """
+
+    def __init__(self, max_size: int = AI_CACHE_SIZE, ttl: float = AI_CACHE_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self._entries = OrderedDict()  # key -> (reply, tokens, stored_at)
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def key(text: str, language: str, version: int) -> tuple:
+        return (intents.normalize(text), language, version)
+
+    def get(self, key: tuple):
+        if not self.enabled:
+            return None
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry[2] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_tokens += entry[1]
+            return entry[0]
+
+    def put(self, key: tuple, reply: str, tokens: int = 0):
+        if not self.enabled:
+            return
+        with self._lock:
+            version = key[2]
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._entries[key] = (reply, tokens, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "saved_calls": self.hits,
+            "saved_tokens": self.saved_tokens,
+        }
+
+response_cache = ResponseCache()
+
+def get_cache_stats() -> dict:
+    return response_cache.stats()
+
+def _token_count(response) -> int:
+    usage = getattr(response, "usage_metadata", None)
+    return int(getattr(usage, "total_token_count", 0) or 0)
+
+def _place_order(fc, user_phone: str, message_id: int = None) -> str:
+    if not user_phone:
+        return "I need your phone number to place an order. (System Error: Phone not passed)"
+
+    # Extract args
+    items_data = []
+    for item in fc.args["items"]:
+        items_data.append({
+            "fish_name": item["fish_name"],
+            "quantity": item["quantity"],
+            "price_per_kg": item["price_per_kg"]
+        })
+
+    address = fc.args.get("address")
+
+    # Execute DB function
+    result = db.create_order(user_phone, items_data, address, message_id)
+
+    if "error" in result:
+        return f"Sorry, I couldn't place the order. Error: {result['error']}"
+
+    # create_order updated the address and reset the counter in the DB
+    user_context.invalidate(user_phone)
+
+    return f"Order placed successfully! Order ID: #{result['order_id']}. Total: ₹{result['total_price']}. We will deliver to: {address}. Thank you!"
+
+def _stream_content(model, contents: str, stream):
+    """
+    Consumes a streamed reply, feeding its text to `stream` as it arrives.
+    Stops at the first function call instead of waiting for the rest.
+    Returns (function_call, text, tokens).
+    """
+    response = model.generate_content(
+        contents,
+        tool_config={'function_calling_config': {'mode': 'AUTO'}},
+        stream=True
+    )
+    tokens = 0
+    for chunk in response:
+        tokens = _token_count(chunk) or tokens
+        if not chunk.candidates:
+            continue
+        for part in chunk.candidates[0].content.parts:
+            if part.function_call:
+                return part.function_call, stream.text, tokens
+            if part.text:
+                stream.feed(part.text)
+    return None, stream.text, tokens
+
+def generate_response(prompt: str, user_phone: str = None, user_address: str = None, message_id: int = None,
+                      cache_text: str = None, language: str = None, stream=None) -> str:
     """
     Generates a response from Gemini based on the user's prompt.
     Supports function calling for placing orders.
+    cache_text: the user's message, if the reply may be shared with other users asking the same.
+    stream: a ReplyStream to generate in streaming mode; the returned reply is
+    always the full text, including anything the stream already sent.
     """
     if not GEMINI_API_KEY:
         return "I'm sorry, my brain is currently offline (API Key missing). 😵"
 
     try:
-        current_instruction = get_system_instruction(user_address)
-        
-        # Initialize model with tools
-        dynamic_model = genai.GenerativeModel(
-            model_name="gemini-flash-latest",
-            system_instruction=current_instruction,
-            tools=[place_order_tool]
-        )
-        
-        # Start a chat session to handle function calls naturally
-        # chat = dynamic_model.start_chat(enable_automatic_function_calling=True)
-        
-        # Manual approach:
-        response = dynamic_model.generate_content(
-            prompt,
-            tools=[place_order_tool],
-            tool_config={'function_calling_config': {'mode': 'AUTO'}}
-        )
+        cache_key = None
+        if cache_text and not user_address and response_cache.enabled:
+            cache_key = response_cache.key(cache_text, language, inventory.current_version())
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        model = model_registry.get(has_address=bool(user_address))
+
+        # Per-message work is just the user context plus the conversation
+        address_line = f"User's Address: {user_address}" if user_address else ADDRESS_UNKNOWN
+        contents = f"{address_line}\n{prompt}"
+
+        if stream is not None:
+            stream.start()
+            with metrics.span("gemini", "stream_content"):
+                fc, text, tokens = _stream_content(model, contents, stream)
+            metrics.add_tokens(tokens)
+            if fc and fc.name == "place_order":
+                return _place_order(fc, user_phone, message_id)
+            if not text:
+                logger.error("Gemini stream ended without text")
+                return "I'm sorry, I couldn't generate a response (No parts)."
+            if cache_key and text:
+                response_cache.put(cache_key, text, tokens)
+            return text
+
+        with metrics.span("gemini", "generate_content"):
+            response = model.generate_content(
+                contents,
+                tool_config={'function_calling_config': {'mode': 'AUTO'}}
+            )
+        metrics.add_tokens(_token_count(response))
         
         # 2. Check for function call
         if not response.candidates:
@@ -132,30 +336,12 @@ def generate_response(prompt: str, user_phone: str = None, user_address: str = N
         if part.function_call:
             fc = part.function_call
             if fc.name == "place_order":
-                if not user_phone:
-                    return "I need your phone number to place an order. (System Error: Phone not passed)"
-                
-                # Extract args
-                items_data = []
-                for item in fc.args["items"]:
-                    items_data.append({
-                        "fish_name": item["fish_name"],
-                        "quantity": item["quantity"],
-                        "price_per_kg": item["price_per_kg"]
-                    })
-                
-                address = fc.args.get("address")
-                
-                # Execute DB function
-                result = db.create_order(user_phone, items_data, address, message_id)
-                
-                if "error" in result:
-                    return f"Sorry, I couldn't place the order. Error: {result['error']}"
-                
-                return f"Order placed successfully! Order ID: #{result['order_id']}. Total: ₹{result['total_price']}. We will deliver to: {address}. Thank you!"
-
-        return response.text
+                return _place_order(fc, user_phone, message_id)
+
+        text = response.text
+        if cache_key and text:
+            response_cache.put(cache_key, text, _token_count(response))
+        return text
     except Exception as e:
         logger.error(f"Gemini API Error: {e}")
         return "Aare dada, ektu problem hocche. Please try again later. 😓"
-
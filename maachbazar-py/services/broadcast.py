@@ -0,0 +1,301 @@
+import os
+import time
+import asyncio
+import datetime
+import logging
+
+import db
+from services.graph_client import get_async_client, retry_delay, GraphAPIError
+
+logger = logging.getLogger(__name__)
+
+# Tune to the WABA messaging tier; Cloud API allows roughly 80 messages/sec by default
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "80"))  # messages per second
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_PAGE_SIZE = int(os.getenv("BROADCAST_PAGE_SIZE", "500"))
+BROADCAST_RETRIES = int(os.getenv("BROADCAST_RETRIES", "2"))  # on top of the client's own retries
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` tokens per second, bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """
+        Waits until a token is available and takes it.
+        """
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+class BroadcastReport:
+    """
+    Outcome of one broadcast run.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.total = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.errors = {}  # { status code or 'network': count }
+        self.started_at = time.monotonic()
+        self.duration = 0.0
+
+    def record_error(self, error: GraphAPIError):
+        key = str(error.status_code or "network")
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    def finish(self):
+        self.duration = time.monotonic() - self.started_at
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "total": self.total,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "errors": self.errors,
+            "duration_s": round(self.duration, 2),
+            "rate_per_s": round(self.sent / self.duration, 1) if self.duration else 0.0,
+        }
+
+    def __str__(self):
+        return ", ".join(f"{k}: {v}" for k, v in self.as_dict().items())
+
+async def iter_opt_in_recipients(page_size: int = BROADCAST_PAGE_SIZE, after_phone: str = None):
+    """
+    Streams opted-in users page by page (keyset pagination on phone).
+    """
+    while True:
+        page = await asyncio.to_thread(db.get_opt_in_users_page, after_phone, page_size)
+        if not page:
+            return
+        for user in page:
+            yield user
+        if len(page) < page_size:
+            return
+        after_phone = page[-1]["phone"]
+
+async def run_broadcast(name: str, build_payload, recipients=None, on_send=None, on_result=None,
+                        client=None, rate: float = BROADCAST_RATE,
+                        concurrency: int = BROADCAST_CONCURRENCY,
+                        retries: int = BROADCAST_RETRIES, report: BroadcastReport = None) -> BroadcastReport:
+    """
+    Sends one message per recipient with `concurrency` senders sharing a
+    `rate`-per-second token bucket.
+
+    build_payload(user) -> /messages payload, or None to skip the user
+    recipients: async iterable of user dicts (defaults to all opted-in users)
+    on_send(user): optional async callback before the first attempt; raising skips the user
+    on_result(user, wamid, error): optional async callback after each final outcome
+    report: optional BroadcastReport to fill in (lets callers watch progress)
+    """
+    client = client or get_async_client()
+    recipients = recipients if recipients is not None else iter_opt_in_recipients()
+    bucket = TokenBucket(rate)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    report = report or BroadcastReport(name)
+
+    async def send(payload):
+        attempt = 0
+        while True:
+            await bucket.acquire()
+            try:
+                return await client.post_message(payload)
+            except GraphAPIError as e:
+                if not e.retryable or attempt >= retries:
+                    raise
+                report.retried += 1
+                await asyncio.sleep(retry_delay(attempt))
+                attempt += 1
+
+    async def sender():
+        while True:
+            job = await queue.get()
+            try:
+                if job is None:
+                    return
+                user, payload = job
+                if on_send:
+                    await on_send(user)
+                try:
+                    wamid = await send(payload)
+                except GraphAPIError as e:
+                    report.failed += 1
+                    report.record_error(e)
+                    logger.error(f"Broadcast '{name}' failed for {user.get('phone')}: {e}")
+                    if on_result:
+                        await on_result(user, None, e)
+                else:
+                    report.sent += 1
+                    if on_result:
+                        await on_result(user, wamid, None)
+            except Exception as e:
+                report.failed += 1
+                logger.error(f"Broadcast '{name}' sender error: {e}")
+            finally:
+                queue.task_done()
+
+    senders = [asyncio.create_task(sender()) for _ in range(max(1, concurrency))]
+
+    try:
+        async for user in recipients:
+            payload = build_payload(user)
+            if payload is None:
+                continue
+            report.total += 1
+            await queue.put((user, payload))
+
+        for _ in senders:
+            await queue.put(None)
+        await asyncio.gather(*senders)
+    finally:
+        # Only does anything if the recipient stream failed part-way
+        for task in senders:
+            task.cancel()
+
+    report.finish()
+    logger.info(f"Broadcast '{name}' complete. {report}")
+    return report
+
+class _PageTracker:
+    """
+    Tracks which recipient pages are fully processed so the job cursor only
+    ever moves past recipients that have a final outcome.
+    """
+
+    def __init__(self):
+        self.pages = []  # [last_phone, pending, fully_enqueued]
+        self.page_of = {}  # phone -> page entry
+
+    def add(self, phone: str, last_phone: str):
+        if not self.pages or self.pages[-1][0] != last_phone:
+            self.pages.append([last_phone, 0, False])
+        page = self.pages[-1]
+        page[1] += 1
+        self.page_of[phone] = page
+
+    def seal(self, last_phone: str):
+        if not self.pages or self.pages[-1][0] != last_phone:
+            self.pages.append([last_phone, 0, False])
+        self.pages[-1][2] = True
+
+    def done(self, phone: str):
+        page = self.page_of.pop(phone, None)
+        if page:
+            page[1] -= 1
+
+    def advance(self):
+        """
+        Pops finished pages from the front; returns the new cursor or None.
+        """
+        cursor = None
+        while self.pages and self.pages[0][2] and self.pages[0][1] <= 0:
+            cursor = self.pages.pop(0)[0]
+        return cursor
+
+async def run_job(job_key: str, name: str, build_payload, on_result=None, client=None,
+                  rate: float = BROADCAST_RATE, concurrency: int = BROADCAST_CONCURRENCY,
+                  page_size: int = BROADCAST_PAGE_SIZE):
+    """
+    Runs a broadcast as a persisted, resumable job.
+
+    The job row keeps a cursor over the recipient list and a per-recipient
+    ledger. Re-running the same job_key after a crash or restart continues
+    after the cursor and skips anyone already sent (or mid-send) - so each
+    recipient gets the message at most once. Returns None if the job has
+    already completed or cannot be loaded.
+    """
+    job = await asyncio.to_thread(db.get_or_create_broadcast_job, job_key, name)
+    if not job:
+        logger.error(f"Broadcast job '{job_key}' could not be loaded, not sending")
+        return None
+    if job.get("status") != "running":
+        logger.info(f"Broadcast job '{job_key}' is {job.get('status')}, nothing to do")
+        return None
+
+    job_id = job["id"]
+    base_sent = job.get("sent") or 0
+    base_failed = job.get("failed") or 0
+    tracker = _PageTracker()
+    report = BroadcastReport(name)
+
+    if job.get("cursor"):
+        logger.info(f"Resuming broadcast job '{job_key}' after {job['cursor']}")
+
+    async def recipients():
+        after_phone = job.get("cursor")
+        while True:
+            page = await asyncio.to_thread(db.get_opt_in_users_page, after_phone, page_size)
+            if not page:
+                return
+            last_phone = page[-1]["phone"]
+            ledger = await asyncio.to_thread(db.get_broadcast_ledger, job_id, [u["phone"] for u in page])
+            for user in page:
+                if ledger.get(user["phone"]) in ("sent", "sending"):
+                    continue
+                tracker.add(user["phone"], last_phone)
+                yield user
+            tracker.seal(last_phone)
+            if len(page) < page_size:
+                return
+            after_phone = last_phone
+
+    async def checkpoint():
+        cursor = tracker.advance()
+        if cursor:
+            job["cursor"] = cursor
+            await asyncio.to_thread(db.update_broadcast_job, job_id, {
+                "cursor": cursor,
+                "sent": base_sent + report.sent,
+                "failed": base_failed + report.failed,
+            })
+
+    async def claim(user):
+        await asyncio.to_thread(db.record_broadcast_recipient, job_id, user["phone"], "sending")
+
+    async def record(user, wamid, error):
+        phone = user["phone"]
+        try:
+            if wamid:
+                await asyncio.to_thread(db.record_broadcast_recipient, job_id, phone, "sent", wamid)
+            else:
+                await asyncio.to_thread(db.record_broadcast_recipient, job_id, phone, "failed", None, str(error)[:500])
+        except Exception as e:
+            logger.error(f"Broadcast job '{job_key}' could not record {phone}: {e}")
+        if on_result:
+            await on_result(user, wamid, error)
+        tracker.done(phone)
+        await checkpoint()
+
+    await run_broadcast(
+        name, build_payload, recipients=recipients(), on_send=claim, on_result=record,
+        client=client, rate=rate, concurrency=concurrency, report=report
+    )
+
+    await asyncio.to_thread(db.update_broadcast_job, job_id, {
+        "status": "completed",
+        "cursor": tracker.advance() or job.get("cursor"),
+        "sent": base_sent + report.sent,
+        "failed": base_failed + report.failed,
+        "completed_at": datetime.datetime.utcnow().isoformat(),
+    })
+    return report
@@ -0,0 +1,159 @@
+import os
+import time
+import asyncio
+import logging
+
+from services.whatsapp import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+# "<default ms>[,<STATE>:<ms>...]", e.g. "600,AWAITING_ADDRESS:0". 0 turns debouncing off.
+MESSAGE_DEBOUNCE = os.getenv("MESSAGE_DEBOUNCE", "0")
+MESSAGE_DEBOUNCE_MAX_WAIT = float(os.getenv("MESSAGE_DEBOUNCE_MAX_WAIT", "2"))  # seconds, from the first message
+
+def parse_windows(spec: str):
+    """
+    Parses a MESSAGE_DEBOUNCE spec into (default seconds, {state: seconds}).
+    """
+    default, windows = 0.0, {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if ":" in part:
+                state, ms = part.split(":", 1)
+                windows[state.strip()] = float(ms) / 1000
+            else:
+                default = float(part) / 1000
+        except ValueError:
+            logger.error(f"Ignoring invalid MESSAGE_DEBOUNCE entry '{part}'")
+    return default, windows
+
+def is_mergeable(event: WebhookEvent) -> bool:
+    return event.kind == "message" and event.item.get("type") == "text"
+
+def merge(events: list) -> WebhookEvent:
+    """
+    Folds consecutive text messages into one, as if the user had sent them together.
+    """
+    if len(events) == 1:
+        return events[0]
+    last = events[-1]
+    item = dict(last.item)
+    item["text"] = {"body": "\n".join(e.item.get("text", {}).get("body") or "" for e in events)}
+    item["merged_ids"] = [e.item.get("id") for e in events]
+    return WebhookEvent(last.entry, last.change, last.kind, item)
+
+class Debouncer:
+    """
+    Holds a user's text messages for a short window and hands them on as a
+    single merged message, so a burst like "rohu", "2 kg", "and katla 1kg"
+    becomes one AI turn. Each new text restarts the window, up to `max_wait`
+    after the first one. The window depends on the user's conversation
+    state (looked up with `state_of`, without touching the database).
+
+    Runs on the event loop; `submit(keyed_events) -> bool` receives the
+    merged messages in order.
+    """
+
+    def __init__(self, submit, spec: str = MESSAGE_DEBOUNCE, max_wait: float = MESSAGE_DEBOUNCE_MAX_WAIT, state_of=None):
+        self.submit = submit
+        self.default_window, self.windows = parse_windows(spec)
+        self.max_wait = max_wait
+        self.state_of = state_of or (lambda key: None)
+        self.held = 0
+        self.turns = 0
+        self._pending = {}  # key -> [events, first_at, timer]
+
+    @property
+    def enabled(self) -> bool:
+        return self.default_window > 0 or any(w > 0 for w in self.windows.values())
+
+    def window_for(self, key) -> float:
+        return self.windows.get(self.state_of(key), self.default_window)
+
+    def submit_batch(self, keyed_events: list) -> bool:
+        """
+        Hands on one webhook batch of (user, message) pairs, holding the
+        texts that can be merged. Anything already held for a user goes out
+        (merged) ahead of that user's next unmergeable message, in the same
+        all-or-nothing submit. Returns False, holding nothing, if the submit
+        was refused, so a redelivered batch is not held twice.
+        """
+        if not self.enabled:
+            return not keyed_events or self.submit(keyed_events)
+
+        to_submit, flushed, holds = [], set(), {}  # holds: key -> [texts], in order
+        held = turns = 0
+        for key, event in keyed_events:
+            if key is not None and is_mergeable(event) and self.window_for(key) > 0:
+                holds.setdefault(key, []).append(event)
+                continue
+            # Held and just-held texts first, so the user's order is kept
+            new = holds.pop(key, [])
+            earlier = ([] if key in flushed else self._pending.get(key, [[]])[0]) + new
+            if earlier:
+                to_submit.append((key, merge(earlier)))
+                held += len(new)
+                turns += 1
+            flushed.add(key)
+            to_submit.append((key, event))
+
+        if to_submit and not self.submit(to_submit):
+            return False
+
+        self.held += held
+        self.turns += turns
+        for key in flushed:
+            pending = self._pending.pop(key, None)
+            if pending:
+                pending[2].cancel()
+        for key, events in holds.items():
+            for event in events:
+                self._hold(key, event)
+        return True
+
+    def _hold(self, key, event: WebhookEvent):
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = [[], now, None]
+        else:
+            pending[2].cancel()
+        pending[0].append(event)
+        self.held += 1
+
+        delay = min(self.window_for(key), pending[1] + self.max_wait - now)
+        pending[2] = loop.call_later(max(0.0, delay), self.flush, key)
+
+    def flush(self, key) -> bool:
+        """
+        Hands on whatever is held for the user as one merged message.
+        """
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return True
+        events, first_at, timer = pending
+        if timer:
+            timer.cancel()
+
+        if not self.submit([(key, merge(events))]):
+            # Queue is full: keep holding and try again shortly
+            logger.warning(f"Could not hand on {len(events)} held messages for {key}, retrying")
+            retry = asyncio.get_running_loop().call_later(max(self.default_window, 0.1), self.flush, key)
+            self._pending[key] = [events, first_at, retry]
+            return False
+
+        self.turns += 1
+        if len(events) > 1:
+            logger.info(f"Merged {len(events)} messages from {key} into one turn")
+        return True
+
+    def flush_all(self):
+        for key in list(self._pending):
+            self.flush(key)
+
+    def stats(self) -> dict:
+        return {"held": self.held, "turns": self.turns, "saved": self.held - self.turns, "waiting": len(self._pending)}
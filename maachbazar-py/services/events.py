@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import tempfile
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# memory: events only reach dashboards connected to the same process
+# sqlite: events go through a local SQLite log, so every gunicorn worker on the host sees them
+EVENT_BUS = os.getenv("EVENT_BUS", "memory")
+EVENT_DB_PATH = os.getenv("EVENT_DB_PATH", os.path.join(tempfile.gettempdir(), "maachbazar-events.db"))
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "500"))  # events kept for replay on reconnect
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))  # per subscriber, before it is dropped
+EVENT_POLL_INTERVAL = float(os.getenv("EVENT_POLL_INTERVAL", "0.5"))  # seconds, sqlite bus only
+
+class Event:
+    __slots__ = ("id", "type", "data")
+
+    def __init__(self, id: int, type: str, data: dict):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def to_sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+class Subscription:
+    """
+    One connected client. Events arrive on `queue`; None means the
+    subscription was closed (shutdown, or the client fell too far behind)
+    and the client should reconnect with its last event ID.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, replay: list, missed: bool, max_queue: int):
+        self.loop = loop
+        self.replay = replay
+        self.missed = missed  # True if events were lost beyond the replay buffer
+        self.max_queue = max_queue
+        self.queue = asyncio.Queue()
+        self.closed = False
+
+    def _deliver(self, event):
+        # Runs on the subscriber's event loop
+        if self.closed:
+            return
+        if event is None or self.queue.qsize() >= self.max_queue:
+            self.closed = True
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        """
+        Thread-safe hand-off. Returns False if the subscriber's loop is gone.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, event)
+            return True
+        except RuntimeError:
+            return False
+
+class EventHub:
+    """
+    Fans events out to every subscriber and keeps the last `buffer_size`
+    events so a reconnecting client can replay what it missed.
+    `publish` may be called from any thread.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_BUFFER_SIZE, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.published = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, type: str, data: dict):
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, type, data)
+        self._dispatch(event)
+        return event
+
+    def _dispatch(self, event: Event):
+        with self._lock:
+            self._last_id = max(self._last_id, event.id)
+            self._buffer.append(event)
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if not subscription.deliver(event):
+                self.unsubscribe(subscription)
+
+    def subscribe(self, last_event_id: int = None) -> Subscription:
+        """
+        Registers a subscriber on the running event loop. Events after
+        `last_event_id` that are still buffered come back in `replay`.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            replay, missed = [], False
+            if last_event_id is not None:
+                replay = [event for event in self._buffer if event.id > last_event_id]
+                oldest = self._buffer[0].id if self._buffer else self._last_id + 1
+                missed = last_event_id < oldest - 1
+            subscription = Subscription(loop, replay, missed, self.queue_size)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        """
+        Ends every open subscription so streaming responses can finish.
+        """
+        with self._lock:
+            subscribers, self._subscribers = list(self._subscribers), set()
+        for subscription in subscribers:
+            subscription.deliver(None)
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscribers), "published": self.published, "last_id": self._last_id}
+
+class SQLiteEventHub(EventHub):
+    """
+    Hub whose events go through a shared SQLite log (WAL mode). Every
+    process polls the log and fans out locally, so a dashboard connected to
+    any worker sees orders created in all of them, and event IDs are the
+    same everywhere (Last-Event-ID works across workers).
+    """
+
+    def __init__(self, path: str = EVENT_DB_PATH, poll_interval: float = EVENT_POLL_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.poll_interval = poll_interval
+        self._db_lock = threading.Lock()
+        self._task = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "type TEXT NOT NULL, data TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        # Start from the end of the log; older events are not ours to replay
+        row = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+        self._last_id = row[0]
+        self._polled_id = row[0]
+
+    def publish(self, type: str, data: dict):
+        with self._db_lock:
+            cursor = self._conn.execute(
+                "INSERT INTO events (type, data, created_at) VALUES (?, ?, ?)",
+                (type, json.dumps(data, default=str), time.time()),
+            )
+            # Keep the log about as long as the replay buffer
+            self._conn.execute("DELETE FROM events WHERE id <= ?", (cursor.lastrowid - self._buffer.maxlen,))
+        return Event(cursor.lastrowid, type, data)
+
+    def poll(self) -> int:
+        """
+        Dispatches events appended to the log since the last poll.
+        """
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT id, type, data FROM events WHERE id > ? ORDER BY id", (self._polled_id,)
+            ).fetchall()
+        for event_id, type, data in rows:
+            self._polled_id = event_id
+            self._dispatch(Event(event_id, type, json.loads(data)))
+        return len(rows)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.poll)
+            except Exception as e:
+                logger.error(f"Event log poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await super().stop()
+
+    def close(self):
+        self._conn.close()
+
+def make_hub(kind: str = EVENT_BUS) -> EventHub:
+    if kind == "sqlite":
+        try:
+            return SQLiteEventHub()
+        except sqlite3.Error as e:
+            logger.error(f"Could not open event log {EVENT_DB_PATH}, using in-process events: {e}")
+    return EventHub()
+
+hub = make_hub()
+
+def publish(type: str, data: dict):
+    """
+    Publishes an event to connected dashboards. Never raises: a failed push
+    must not fail the write that triggered it.
+    """
+    try:
+        return hub.publish(type, data)
+    except Exception as e:
+        logger.error(f"Failed to publish {type} event: {e}")
+        return None
@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Point this at a local fake Graph API for tests and benchmarks
+GRAPH_API_URL = os.getenv("GRAPH_API_URL", "https://graph.facebook.com/v17.0")
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", "20"))  # connections per host
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "3"))
+GRAPH_TIMEOUT = float(os.getenv("GRAPH_TIMEOUT", "10"))  # seconds
+
+# Only failures where Meta cannot have accepted the message are resent: a 5xx or a
+# read timeout may follow a send that went through, and resending would duplicate it
+RETRY_STATUSES = {429}
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 30.0  # seconds
+
+class GraphAPIError(Exception):
+    """
+    A failed Graph API call. `retryable` is True for rate limits and
+    connection failures, i.e. calls that can be resent without risking a
+    duplicate message.
+    """
+
+    def __init__(self, message: str, status_code: int = None, retryable: bool = False, body: str = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.body = body
+
+def retry_delay(attempt: int, headers=None) -> float:
+    """
+    How long to wait before retry number `attempt` (0-based).
+    Honours Retry-After and Meta's usage headers, else exponential backoff with jitter.
+    """
+    headers = headers or {}
+
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_CAP)
+        except ValueError:
+            pass
+
+    # e.g. X-Business-Use-Case-Usage: {"<id>": [{"estimated_time_to_regain_access": 2, ...}]} (minutes)
+    usage = headers.get("X-Business-Use-Case-Usage")
+    if usage:
+        try:
+            waits = [
+                entry.get("estimated_time_to_regain_access", 0)
+                for entries in json.loads(usage).values()
+                for entry in entries
+            ]
+            if waits and max(waits) > 0:
+                return min(max(waits) * 60.0, BACKOFF_CAP)
+        except (ValueError, AttributeError, TypeError):
+            pass
+
+    delay = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_CAP)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def _message_id(status_code: int, body: str) -> str:
+    try:
+        data = json.loads(body)
+        if "messages" not in data and data.get("success"):
+            return None  # status updates (read receipts, typing) have no message id
+        return data["messages"][0]["id"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise GraphAPIError(f"Unexpected Graph API response: {body}", status_code=status_code, body=body)
+
+def _send_kind(payload: dict) -> str:
+    # Span name for a /messages call: text, interactive, template, ... or read (receipts, typing)
+    return "read" if payload.get("status") == "read" else payload.get("type", "unknown")
+
+def _error(status_code: int, body: str) -> GraphAPIError:
+    return GraphAPIError(
+        f"Graph API returned {status_code}: {body}",
+        status_code=status_code,
+        retryable=status_code in RETRY_STATUSES,
+        body=body,
+    )
+
+def _never_sent(error: requests.exceptions.RequestException) -> bool:
+    """
+    True if a request failed before the connection to Meta was made. requests
+    also raises ConnectionError for resets and RemoteDisconnected after the
+    body went out (stale keep-alive connections), and those may have been sent.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+    # ConnectionError(MaxRetryError(reason=NewConnectionError(...)))
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, NewConnectionError)
+
+class GraphClient:
+    """
+    Blocking WhatsApp Cloud API client on a pooled keep-alive requests.Session.
+    adapter: optional requests transport adapter (e.g. a fake Graph API in tests).
+    """
+
+    def __init__(self, token: str = None, phone_number_id: str = None, base_url: str = GRAPH_API_URL,
+                 adapter: HTTPAdapter = None, pool_size: int = GRAPH_POOL_SIZE,
+                 max_retries: int = GRAPH_MAX_RETRIES, timeout: float = GRAPH_TIMEOUT):
+        self.token = token or os.getenv("WHATSAPP_TOKEN")
+        self.phone_number_id = phone_number_id or os.getenv("PHONE_NUMBER_ID")
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": "application/json",
+        })
+        adapter = adapter or HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def messages_url(self) -> str:
+        return f"{self.base_url}/{self.phone_number_id}/messages"
+
+    def post_message(self, payload: dict) -> str:
+        """
+        Posts to the /messages endpoint, retrying transient failures.
+        Returns the WhatsApp message id (wamid) or raises GraphAPIError.
+        """
+        with metrics.span("whatsapp_send", _send_kind(payload)):
+            return self._post_message(payload)
+
+    def _post_message(self, payload: dict) -> str:
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(self.messages_url, json=payload, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                error = GraphAPIError(f"Graph API request failed: {e}", retryable=_never_sent(e))
+                headers = {}
+            else:
+                if response.status_code < 400:
+                    return _message_id(response.status_code, response.text)
+                error = _error(response.status_code, response.text)
+                headers = response.headers
+
+            if not error.retryable or attempt >= self.max_retries:
+                raise error
+
+            delay = retry_delay(attempt, headers)
+            logger.warning(f"Graph API call failed ({error.status_code or 'network'}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+class AsyncGraphClient:
+    """
+    Async WhatsApp Cloud API client on a pooled keep-alive httpx.AsyncClient.
+    transport: optional httpx transport (e.g. httpx.MockTransport in tests).
+    """
+
+    def __init__(self, token: str = None, phone_number_id: str = None, base_url: str = GRAPH_API_URL,
+                 transport: httpx.AsyncBaseTransport = None, pool_size: int = GRAPH_POOL_SIZE,
+                 max_retries: int = GRAPH_MAX_RETRIES, timeout: float = GRAPH_TIMEOUT):
+        self.token = token or os.getenv("WHATSAPP_TOKEN")
+        self.phone_number_id = phone_number_id or os.getenv("PHONE_NUMBER_ID")
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+
+        self.client = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "Content-Type": "application/json",
+            },
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=timeout,
+            transport=transport,
+        )
+
+    @property
+    def messages_url(self) -> str:
+        return f"{self.base_url}/{self.phone_number_id}/messages"
+
+    async def post_message(self, payload: dict) -> str:
+        """
+        Posts to the /messages endpoint, retrying transient failures.
+        Returns the WhatsApp message id (wamid) or raises GraphAPIError.
+        """
+        with metrics.span("whatsapp_send", _send_kind(payload)):
+            return await self._post_message(payload)
+
+    async def _post_message(self, payload: dict) -> str:
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.post(self.messages_url, json=payload)
+            except httpx.HTTPError as e:
+                sent = not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+                error = GraphAPIError(f"Graph API request failed: {e}", retryable=not sent)
+                headers = {}
+            else:
+                if response.status_code < 400:
+                    return _message_id(response.status_code, response.text)
+                error = _error(response.status_code, response.text)
+                headers = response.headers
+
+            if not error.retryable or attempt >= self.max_retries:
+                raise error
+
+            delay = retry_delay(attempt, headers)
+            logger.warning(f"Graph API call failed ({error.status_code or 'network'}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def close(self):
+        await self.client.aclose()
+
+_client = None
+_async_client = None
+_lock = threading.Lock()
+
+def get_client() -> GraphClient:
+    """
+    Returns the shared blocking client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = GraphClient()
+    return _client
+
+def get_async_client() -> AsyncGraphClient:
+    """
+    Returns the shared async client. Must be called from the event loop that will use it.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncGraphClient()
+    return _async_client
+
+def set_client(client: GraphClient = None, async_client: AsyncGraphClient = None):
+    """
+    Replaces the shared clients (tests and benchmarks plug in fakes here).
+    """
+    global _client, _async_client
+    _client = client
+    _async_client = async_client
+
+async def close_clients():
+    global _client, _async_client
+    if _client:
+        _client.close()
+        _client = None
+    if _async_client:
+        await _async_client.close()
+        _async_client = None
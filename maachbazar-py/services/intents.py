@@ -0,0 +1,278 @@
+import os
+import re
+import difflib
+import logging
+import threading
+from string import Template
+
+from services import inventory
+
+logger = logging.getLogger(__name__)
+
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "on") == "on"
+INTENT_MAX_WORDS = 6  # longer messages always go to the LLM
+FISH_MATCH_CUTOFF = 0.8  # difflib ratio for fuzzy fish names
+
+def normalize(text: str) -> str:
+    """
+    Lowercases and strips punctuation. Only ASCII/Bengali punctuation is
+    removed, so Bengali vowel signs survive.
+    """
+    text = re.sub(r"[!?.,;:'\"()\[\]{}।…*~_\-]+", " ", (text or "").lower())
+    return " ".join(text.split())
+
+# Keyword tables (English / Bangla / Hinglish). Single words match tokens, phrases match substrings.
+GREETINGS = {
+    "hi", "hii", "hiii", "hello", "helo", "hlo", "hey", "namaste", "namaskar", "nomoshkar", "nomoskar",
+    "নমস্কার", "হ্যালো", "good morning", "good evening", "good afternoon", "suprobhat", "সুপ্রভাত",
+}
+THANKS = {
+    "thanks", "thank you", "thanku", "thankyou", "thx", "ty", "dhonnobad", "dhonyobad", "dhanyavad",
+    "shukriya", "ধন্যবাদ", "thank you dada", "thanks dada",
+}
+PRICE_WORDS = {
+    "price", "prices", "rate", "rates", "menu", "list", "dam", "daam", "bhav", "kemon dam", "koto", "kitna",
+    "kitne", "stock", "available", "today", "aaj", "aj", "ajker", "দাম", "রেট", "মেনু", "কত", "আজকের",
+    "ki ache", "kya hai", "ki ki ache", "kya kya hai",
+}
+HELP_WORDS = {"help", "madad", "sahayata", "সাহায্য", "how to order"}
+LANGUAGES = {
+    "english": "English", "bangla": "Bangla", "bengali": "Bangla", "বাংলা": "Bangla",
+    "hindi": "Hinglish", "hinglish": "Hinglish",
+}
+# Anything that is part of ordering needs the LLM's bill/confirm flow and the place_order tool
+ORDER_WORDS = {
+    "confirm", "yes", "haan", "ha", "han", "hya", "ji", "ok", "okay", "done", "pakka", "order", "want", "need",
+    "chai", "chahiye", "lagbe", "nebo", "nibo", "dibe", "den", "dao", "send", "deliver", "delivery", "address",
+    "cancel", "kg", "kilo", "gram", "gm", "piece", "pcs", "half", "adha", "হ্যাঁ", "চাই", "লাগবে",
+    "অর্ডার", "কেজি", "ঠিক আছে", "thik ache", "theek hai", "bill",
+}
+# Words that refer back to earlier messages ("and katla?", "how much is that?")
+FOLLOW_UP_WORDS = {
+    "and", "also", "that", "it", "this", "those", "them", "same", "more", "another", "aur", "ar", "ye", "yeh",
+    "woh", "wo", "oita", "ota", "eta", "seta", "আর", "ওটা", "এটা",
+}
+# Local names that don't look like the English inventory names
+FISH_ALIASES = {
+    "rui": "rohu", "রুই": "rohu", "rohu": "rohu",
+    "katla": "katla", "catla": "katla", "কাতলা": "katla",
+    "ilish": "ilish", "hilsa": "ilish", "ইলিশ": "ilish",
+    "chingri": "prawn", "prawn": "prawn", "prawns": "prawn", "shrimp": "prawn", "চিংড়ি": "prawn",
+    "bhetki": "bhetki", "vetki": "bhetki", "ভেটকি": "bhetki",
+    "pabda": "pabda", "পাবদা": "pabda",
+    "tangra": "tangra", "ট্যাংরা": "tangra",
+    "parshe": "parshe", "পার্শে": "parshe",
+    "pomfret": "pomfret", "pomphret": "pomfret", "চাঁদা": "pomfret",
+    "mourala": "mourala", "মৌরলা": "mourala",
+}
+
+REPLIES = {
+    "greeting": {
+        "English": Template("Hello! 🐟 Welcome to Maachbazar. Fresh today: $stock_list.\nType 'price' for today's rates or tell me what you'd like to order."),
+        "Bangla": Template("নমস্কার! 🐟 মাছবাজারে স্বাগতম। আজ টাটকা: $stock_list।\nআজকের দাম জানতে 'দাম' লিখুন, অথবা কী মাছ চাই বলুন।"),
+        "Hinglish": Template("Namaste! 🐟 Maachbazar mein swagat hai. Aaj fresh: $stock_list.\nAaj ka rate dekhne ke liye 'price' likhiye, ya bataiye kya chahiye."),
+    },
+    "price_list": {
+        "English": Template("Today's prices:\n$price_list\nWhat would you like to order?"),
+        "Bangla": Template("আজকের দাম:\n$price_list\nকোন মাছ কতটা লাগবে বলুন?"),
+        "Hinglish": Template("Aaj ka rate:\n$price_list\nKya aur kitna chahiye?"),
+    },
+    "fish_price": {
+        "English": Template("$fish is ₹$price/kg today. How much would you like?"),
+        "Bangla": Template("আজ $fish ₹$price/kg। কতটা লাগবে?"),
+        "Hinglish": Template("Aaj $fish ₹$price/kg hai. Kitna chahiye?"),
+    },
+    "fish_unavailable": {
+        "English": Template("Sorry, $fish is not available today. Fresh today: $stock_list."),
+        "Bangla": Template("দুঃখিত, আজ $fish নেই। আজ টাটকা: $stock_list।"),
+        "Hinglish": Template("Sorry, aaj $fish available nahi hai. Aaj fresh: $stock_list."),
+    },
+    "thanks": {
+        "English": Template("You're welcome! 🐟 Message us any time you need fresh fish."),
+        "Bangla": Template("ধন্যবাদ আপনাকেও! 🐟 টাটকা মাছ লাগলে যখন খুশি মেসেজ করবেন।"),
+        "Hinglish": Template("Aapka swagat hai! 🐟 Fresh fish chahiye toh kabhi bhi message kijiye."),
+    },
+    "help": {
+        "English": Template("Tell me the fish and quantity (e.g. '1 kg Rohu'), share your address, and confirm the bill. Type 'price' for today's rates."),
+        "Bangla": Template("মাছ আর পরিমাণ লিখুন (যেমন '১ কেজি রুই'), ঠিকানা দিন, তারপর বিল কনফার্ম করুন। আজকের দাম জানতে 'দাম' লিখুন।"),
+        "Hinglish": Template("Fish aur quantity likhiye (jaise '1 kg Rohu'), address dijiye, aur bill confirm kijiye. Aaj ka rate ke liye 'price' likhiye."),
+    },
+    "language": {
+        "English": Template("Language set to $language. How can I help you today?"),
+    },
+}
+
+class Route:
+    """
+    A locally answered turn. `language` is set when the user switched language.
+    """
+    __slots__ = ("intent", "reply", "language")
+
+    def __init__(self, intent: str, reply: str, language: str = None):
+        self.intent = intent
+        self.reply = reply
+        self.language = language
+
+def _has(tokens: list, text: str, table: set) -> bool:
+    padded = f" {text} "
+    return any(token in table for token in tokens) or any(
+        " " in phrase and f" {phrase} " in padded for phrase in table
+    )
+
+class IntentRouter:
+    """
+    Answers common, unambiguous messages (greetings, price list, the price
+    of one fish, thanks, help, language switch) from templates, and sends
+    everything else - orders, quantities, confirmations, longer messages -
+    to the LLM.
+    """
+
+    def __init__(self):
+        self.counts = {}  # intent -> turns answered locally
+        self.escalated = 0
+        self._fish_index = (None, {})  # (inventory version, {lowercase name or alias: item name})
+        self._lock = threading.Lock()
+
+    def _fish_names(self, snapshot) -> dict:
+        version, index = self._fish_index
+        if version == snapshot.version:
+            return index
+        names = {item["name"].lower(): item["name"] for item in snapshot.items if item.get("name")}
+        groups = {}  # canonical -> all its local names
+        for alias, canonical in FISH_ALIASES.items():
+            groups.setdefault(canonical, [canonical]).append(alias)
+        index = dict(names)
+        for members in groups.values():
+            # Whichever name of the group the shop uses; None if it doesn't stock it at all
+            match = next((names[m] for m in members if m in names), None) or \
+                next((names[n] for n in names for m in members if n.startswith(m)), None)
+            for alias in members:
+                index.setdefault(alias, match)
+        self._fish_index = (snapshot.version, index)
+        return index
+
+    def find_fish(self, tokens: list, snapshot) -> list:
+        """
+        Fish mentioned in the message, matched fuzzily against the inventory and local names.
+        A known fish the inventory has no row for comes back as None.
+        """
+        index = self._fish_names(snapshot)
+        found = []
+        for token in tokens:
+            if len(token) < 3:
+                continue
+            key = token
+            if key not in index:
+                close = difflib.get_close_matches(token, index.keys(), n=1, cutoff=FISH_MATCH_CUTOFF)
+                key = close[0] if close else None
+            if key is not None and index[key] not in found:
+                found.append(index[key])
+        return found
+
+    def classify(self, text: str, snapshot=None):
+        """
+        Returns (intent, data) for a message, or (None, None) if it needs the LLM.
+        """
+        text = normalize(text)
+        tokens = text.split()
+        if not tokens or len(tokens) > INTENT_MAX_WORDS:
+            return None, None
+        if any(ch.isdigit() for ch in text) or _has(tokens, text, ORDER_WORDS):
+            return None, None
+
+        if text in LANGUAGES:
+            return "language", LANGUAGES[text]
+        if text in GREETINGS:
+            return "greeting", None
+        if text in THANKS:
+            return "thanks", None
+        if text in HELP_WORDS:
+            return "help", None
+
+        snapshot = snapshot or inventory.get_snapshot()
+        fish = self.find_fish(tokens, snapshot)
+        if None in fish:
+            return None, None  # a fish we don't list under any name: let the LLM answer
+        if len(fish) == 1:
+            return "fish_price", fish[0]
+        if fish:
+            return None, None  # several fish: let the LLM answer
+        if _has(tokens, text, PRICE_WORDS):
+            return "price_list", None
+        if _has(tokens, text, GREETINGS):
+            return "greeting", None
+        return None, None
+
+    def route(self, text: str, language: str = "English", snapshot=None):
+        """
+        Returns a Route if the message can be answered locally, else None.
+        """
+        snapshot = snapshot or inventory.get_snapshot()
+        intent, data = self.classify(text, snapshot)
+        if intent is None:
+            with self._lock:
+                self.escalated += 1
+            return None
+
+        values = {"stock_list": snapshot.stock_list, "price_list": snapshot.price_list.rstrip()}
+        switch_to = None
+        if intent == "language":
+            switch_to = language = data
+            values["language"] = data
+        elif intent == "fish_price":
+            values["fish"] = data
+            price = snapshot.prices.get(data)
+            if price is None:
+                intent = "fish_unavailable"
+            else:
+                values["price"] = price
+
+        templates = REPLIES[intent]
+        reply = (templates.get(language) or templates["English"]).safe_substitute(values)
+        with self._lock:
+            self.counts[intent] = self.counts.get(intent, 0) + 1
+        return Route(intent, reply, switch_to)
+
+    def stats(self) -> dict:
+        handled = sum(self.counts.values())
+        total = handled + self.escalated
+        return {
+            "handled": handled,
+            "escalated": self.escalated,
+            "handled_rate": round(handled / total, 3) if total else 0.0,
+            "intents": dict(self.counts),
+        }
+
+router = IntentRouter()
+
+def route(text: str, language: str = "English"):
+    if not INTENT_ROUTER:
+        return None
+    try:
+        return router.route(text, language)
+    except Exception as e:
+        logger.error(f"Intent routing failed, using the LLM: {e}")
+        return None
+
+def is_standalone(text: str) -> bool:
+    """
+    True if a message reads the same whoever sends it and whatever came
+    before: no quantities, ordering words or references to earlier messages.
+    """
+    text = normalize(text)
+    tokens = text.split()
+    if not tokens or any(ch.isdigit() for ch in text):
+        return False
+    return not (_has(tokens, text, ORDER_WORDS) or _has(tokens, text, FOLLOW_UP_WORDS))
+
+CONFIRM_WORDS = ("confirm", "নিশ্চিত", "কনফার্ম", "pakka", "final")
+
+def asks_for_confirmation(text: str) -> bool:
+    """
+    True if a reply asks the user to confirm their order, i.e. one of its
+    questions (not just any sentence) mentions confirming.
+    """
+    for question in re.findall(r"[^.!?।\n]*\?", (text or "").lower()):
+        if any(word in question for word in CONFIRM_WORDS):
+            return True
+    return False
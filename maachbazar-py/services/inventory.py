@@ -0,0 +1,91 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+
+import db
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_TTL = float(os.getenv("INVENTORY_TTL", "60"))  # seconds, catches edits made directly in Supabase
+
+class InventorySnapshot:
+    """
+    An immutable view of the inventory table plus the derived forms the
+    hot paths need, computed once per load.
+    """
+
+    def __init__(self, items: list, version: int):
+        self.items = items
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+        self.available = [item for item in items if item.get("is_available")]
+        self.prices = {item["name"]: item["price"] for item in self.available}
+
+        if self.available:
+            # Prompt format: "- Rohu: ₹250/kg"
+            self.price_list = "".join(f"- {name}: ₹{price}/kg\n" for name, price in self.prices.items())
+            # Short format: "Rohu: 250/kg, Katla: 300/kg"
+            self.price_string = ", ".join(f"{name}: {price}/kg" for name, price in self.prices.items())
+            self.stock_list = ", ".join(self.prices)
+        else:
+            self.price_list = "Inventory unavailable. Please check back later."
+            self.price_string = "No items available today."
+            self.stock_list = "fresh fish"
+
+_snapshot = None
+_version = 0
+_lock = threading.Lock()
+
+def _fresh(snapshot) -> bool:
+    return bool(snapshot) and snapshot.version == _version and time.monotonic() - snapshot.loaded_at <= INVENTORY_TTL
+
+def get_snapshot() -> InventorySnapshot:
+    """
+    Returns the current inventory snapshot, reloading it if it was
+    invalidated or is older than INVENTORY_TTL.
+    """
+    global _snapshot, _version
+
+    snapshot = _snapshot
+    if _fresh(snapshot):
+        return snapshot
+
+    with _lock:
+        # Another thread may have reloaded while we waited
+        snapshot = _snapshot
+        if _fresh(snapshot):
+            return snapshot
+
+        items = db.get_inventory()
+        if snapshot and snapshot.version == _version and items != snapshot.items:
+            # TTL reload picked up an external change
+            _version += 1
+
+        snapshot = InventorySnapshot(items, _version)
+        # Don't pin an empty result (e.g. a failed fetch) for a whole TTL
+        _snapshot = snapshot if items else None
+        return snapshot
+
+async def get_snapshot_async() -> InventorySnapshot:
+    """
+    get_snapshot() for async handlers: a reload runs in a worker thread.
+    """
+    snapshot = _snapshot
+    if _fresh(snapshot):
+        return snapshot
+    return await asyncio.to_thread(get_snapshot)
+
+def current_version() -> int:
+    return get_snapshot().version
+
+def invalidate():
+    """
+    Bumps the inventory version; call after any write to the inventory table.
+    """
+    global _version
+    with _lock:
+        _version += 1
+    logger.info(f"Inventory invalidated (version {_version})")
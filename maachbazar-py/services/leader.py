@@ -0,0 +1,153 @@
+import os
+import asyncio
+import logging
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# file: OS file lock shared by every worker on the host (gunicorn -w N)
+# local: in-process stand-in, for tests
+# none: every process leads (single-process dev servers)
+SCHEDULER_LOCK = os.getenv("SCHEDULER_LOCK", "file")
+SCHEDULER_LOCK_PATH = os.getenv("SCHEDULER_LOCK_PATH", os.path.join(tempfile.gettempdir(), "maachbazar-scheduler.lock"))
+LEADER_POLL_INTERVAL = float(os.getenv("LEADER_POLL_INTERVAL", "15"))  # seconds between follower retries
+
+class FileLock:
+    """
+    Non-blocking exclusive flock on a file. The kernel drops it when the
+    holding process dies, which is what gives us failover.
+    """
+
+    def __init__(self, path: str = SCHEDULER_LOCK_PATH):
+        self.path = path
+        self._fd = None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode("utf-8"))
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+class LocalLock:
+    """
+    In-process stand-in for FileLock: instances with the same name compete
+    for one slot, like workers competing for the lock file.
+    """
+
+    _holders = {}
+    _guard = threading.Lock()
+
+    def __init__(self, name: str = "scheduler"):
+        self.name = name
+
+    def try_acquire(self) -> bool:
+        with LocalLock._guard:
+            holder = LocalLock._holders.get(self.name)
+            if holder is None:
+                LocalLock._holders[self.name] = self
+                return True
+            return holder is self
+
+    def release(self):
+        with LocalLock._guard:
+            if LocalLock._holders.get(self.name) is self:
+                del LocalLock._holders[self.name]
+
+class NoLock:
+    """
+    Always acquired: every process is leader.
+    """
+
+    def try_acquire(self) -> bool:
+        return True
+
+    def release(self):
+        pass
+
+def make_lock(kind: str = SCHEDULER_LOCK):
+    if kind == "none":
+        return NoLock()
+    if kind == "local":
+        return LocalLock()
+    if kind == "file" and fcntl is None:
+        logger.warning("fcntl not available, falling back to an in-process scheduler lock")
+        return LocalLock()
+    return FileLock()
+
+class LeaderElector:
+    """
+    Makes exactly one process the owner of scheduled jobs.
+    Followers keep retrying the lock every `interval` seconds and take over
+    (calling on_elected) if the leader dies.
+    """
+
+    def __init__(self, lock, on_elected, on_demoted=None, interval: float = LEADER_POLL_INTERVAL):
+        self.lock = lock
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.interval = interval
+        self.is_leader = False
+        self._task = None
+
+    def _try_lead(self) -> bool:
+        try:
+            acquired = self.lock.try_acquire()
+        except Exception as e:
+            logger.error(f"Leader election failed: {e}")
+            return False
+        if acquired and not self.is_leader:
+            self.is_leader = True
+            logger.info(f"Process {os.getpid()} is now the scheduler leader")
+            self.on_elected()
+        return acquired
+
+    async def start(self):
+        """
+        Tries to lead right away; otherwise keeps trying in the background.
+        """
+        if self._try_lead():
+            return
+        logger.info(f"Process {os.getpid()} is a scheduler follower")
+        self._task = asyncio.create_task(self._follow())
+
+    async def _follow(self):
+        while not self.is_leader:
+            await asyncio.sleep(self.interval)
+            self._try_lead()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.is_leader:
+            self.is_leader = False
+            if self.on_demoted:
+                self.on_demoted()
+            self.lock.release()
+
+    def status(self) -> dict:
+        return {"pid": os.getpid(), "leader": self.is_leader}
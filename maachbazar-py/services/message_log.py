@@ -0,0 +1,191 @@
+import os
+import atexit
+import datetime
+import logging
+import threading
+from concurrent.futures import Future
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# batched: buffer rows and insert them in bulk; sync: one insert per message (old behaviour)
+MESSAGE_LOG_MODE = os.getenv("MESSAGE_LOG_MODE", "batched")
+MESSAGE_LOG_BATCH_SIZE = int(os.getenv("MESSAGE_LOG_BATCH_SIZE", "50"))
+MESSAGE_LOG_FLUSH_INTERVAL = float(os.getenv("MESSAGE_LOG_FLUSH_INTERVAL", "0.5"))  # seconds
+MESSAGE_LOG_RESOLVE_TIMEOUT = 10.0  # seconds to wait for a pending row's ID
+
+class MessageLogWriter:
+    """
+    Write-behind buffer for the messages table.
+
+    `log` returns straight away with a Future for the row's ID; rows are
+    inserted in one request once `batch_size` are waiting or every
+    `flush_interval` seconds, whichever comes first. Each row carries its
+    own created_at, so history order doesn't depend on when it was flushed.
+    """
+
+    def __init__(self, batch_size: int = MESSAGE_LOG_BATCH_SIZE,
+                 flush_interval: float = MESSAGE_LOG_FLUSH_INTERVAL, insert=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.insert = insert  # rows -> ids; defaults to db.insert_messages
+        self.flushed = 0
+        self.batches = 0
+        self._pending = []  # [(row, future)]
+        self._by_wamid = {}  # whatsapp_message_id -> future, for rows not yet written
+        self._inflight = set()  # phones in the batch being inserted right now
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+
+    def log(self, phone: str, role: str, content: str, whatsapp_message_id: str = None,
+            template_name: str = None) -> Future:
+        """
+        Queues a message row. The returned Future resolves to its ID (or None if the insert failed).
+        """
+        future = Future()
+        if self._closed:
+            future.set_result(db.log_message(phone, role, content, whatsapp_message_id=whatsapp_message_id,
+                                             template_name=template_name))
+            return future
+
+        row = db.message_row(phone, role, content, whatsapp_message_id,
+                             created_at=datetime.datetime.utcnow().isoformat(), template_name=template_name)
+        with self._lock:
+            self._pending.append((row, future))
+            if whatsapp_message_id:
+                self._by_wamid[whatsapp_message_id] = future
+            pending = len(self._pending)
+
+        self._ensure_thread()
+        if pending >= self.batch_size:
+            self._wake.set()
+        return future
+
+    def flush(self) -> int:
+        """
+        Writes everything buffered so far. Returns the number of rows written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._inflight = {row["user_phone"] for row, _ in batch}
+            if not batch:
+                return 0
+            try:
+                return self._write(batch)
+            finally:
+                with self._lock:
+                    self._inflight = set()
+
+    def _write(self, batch: list) -> int:
+        insert = self.insert or db.insert_messages
+        rows = [row for row, _ in batch]
+        try:
+            ids = insert(rows)
+        except Exception as e:
+            # Retry one by one so a single bad row doesn't lose the batch
+            logger.error(f"Bulk message insert of {len(rows)} rows failed, retrying individually: {e}")
+            ids = []
+            for row in rows:
+                try:
+                    ids.append(insert([row])[0])
+                except Exception as e:
+                    logger.error(f"Error logging message: {e}")
+                    ids.append(None)
+
+        ids = list(ids) + [None] * (len(batch) - len(ids))
+        for (row, future), message_id in zip(batch, ids):
+            future.set_result(message_id)
+
+        with self._lock:
+            for row, future in batch:
+                wamid = row.get("whatsapp_message_id")
+                if wamid and self._by_wamid.get(wamid) is future:
+                    del self._by_wamid[wamid]
+
+        self.flushed += len(batch)
+        self.batches += 1
+        return len(batch)
+
+    def flush_for(self, phone: str):
+        """
+        Flushes if any of the user's messages are still buffered (or being
+        written), so a history read right after sees them.
+        """
+        with self._lock:
+            waiting = phone in self._inflight or any(row["user_phone"] == phone for row, _ in self._pending)
+        if waiting:
+            self.flush()
+
+    def resolve_message_id(self, whatsapp_message_id: str):
+        """
+        Returns the internal ID for a wamid, flushing first if that row is still buffered.
+        """
+        with self._lock:
+            future = self._by_wamid.get(whatsapp_message_id)
+        if future is None:
+            return db.get_message_id_by_whatsapp_id(whatsapp_message_id)
+        if not future.done():
+            self.flush()
+        return future.result(timeout=MESSAGE_LOG_RESOLVE_TIMEOUT)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="message-log", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Message log flush failed: {e}")
+
+    def close(self):
+        """
+        Stops the background flusher and writes whatever is left. Later
+        `log` calls insert synchronously.
+        """
+        self._closed = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=MESSAGE_LOG_RESOLVE_TIMEOUT)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "flushed": self.flushed, "batches": self.batches}
+
+writer = MessageLogWriter()
+atexit.register(writer.close)
+
+def log(phone: str, role: str, content: str, whatsapp_message_id: str = None, template_name: str = None) -> Future:
+    """
+    Logs a message. Returns a Future for the new row's ID.
+    """
+    if MESSAGE_LOG_MODE == "sync":
+        future = Future()
+        future.set_result(db.log_message(phone, role, content, whatsapp_message_id=whatsapp_message_id,
+                                         template_name=template_name))
+        return future
+    return writer.log(phone, role, content, whatsapp_message_id=whatsapp_message_id, template_name=template_name)
+
+def resolve_message_id(whatsapp_message_id: str):
+    """
+    Drop-in for db.get_message_id_by_whatsapp_id that also sees buffered rows.
+    """
+    return writer.resolve_message_id(whatsapp_message_id)
+
+def flush_for(phone: str):
+    writer.flush_for(phone)
+
+def close():
+    writer.close()
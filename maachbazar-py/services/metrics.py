@@ -0,0 +1,230 @@
+import os
+import time
+import bisect
+import functools
+import threading
+
+# Hot-path timings and counters, served on /metrics in Prometheus text format.
+# With METRICS=off, spans are a shared no-op and instrumented functions are left unwrapped.
+METRICS_ENABLED = os.getenv("METRICS", "on") == "on"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+CALL_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}  # label values -> total
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    bucket = _labels(self.labelnames, labels, f'le="{le}"')
+                    lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NO_SPAN = _NoSpan()
+
+class _Span:
+    __slots__ = ("metrics", "kind", "name", "started")
+
+    def __init__(self, metrics, kind: str, name: str):
+        self.metrics = metrics
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._finish(self.kind, self.name, time.perf_counter() - self.started, exc_type)
+        return False
+
+class _MessageScope:
+    __slots__ = ("metrics", "kind", "previous")
+
+    def __init__(self, metrics, kind: str):
+        self.metrics = metrics
+        self.kind = kind
+
+    def __enter__(self):
+        local = self.metrics._local
+        self.previous = getattr(local, "calls", None)
+        local.calls = {}
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics = self.metrics
+        calls, metrics._local.calls = metrics._local.calls, self.previous
+        metrics.messages.inc(self.kind)
+        for kind in metrics.PER_MESSAGE:
+            metrics.calls_per_message.observe(calls.get(kind, 0), kind)
+        return False
+
+class Metrics:
+    """
+    Timing spans around the hot path (signature check, database calls,
+    brain, Gemini, WhatsApp sends), aggregated in process:
+
+    - maachbazar_span_seconds{span, name}: latency histogram per operation
+    - maachbazar_span_errors_total{span, name, type}: exceptions by type
+    - maachbazar_calls_per_message{span}: database/Gemini/send calls per handled message
+    - maachbazar_messages_total{kind}: handled inbound messages
+    - maachbazar_gemini_tokens_total: tokens reported by Gemini
+
+    Each gunicorn worker keeps its own numbers.
+    """
+
+    PER_MESSAGE = ("db", "gemini", "whatsapp_send")
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.spans = Histogram("maachbazar_span_seconds", "Time spent in hot-path operations.", ("span", "name"))
+        self.errors = Counter("maachbazar_span_errors_total", "Operations that raised, by exception type.",
+                              ("span", "name", "type"))
+        self.calls_per_message = Histogram("maachbazar_calls_per_message", "Calls made while handling one inbound message.",
+                                           ("span",), buckets=CALL_BUCKETS)
+        self.messages = Counter("maachbazar_messages_total", "Inbound messages handled.", ("kind",))
+        self.tokens = Counter("maachbazar_gemini_tokens_total", "Tokens used by Gemini calls.")
+        self._local = threading.local()
+
+    def span(self, kind: str, name: str = ""):
+        """
+        Context manager timing one operation.
+        """
+        if not self.enabled:
+            return NO_SPAN
+        return _Span(self, kind, name)
+
+    def message(self, kind: str):
+        """
+        Context manager around handling one inbound message; counts the calls made inside it.
+        """
+        if not self.enabled:
+            return NO_SPAN
+        return _MessageScope(self, kind)
+
+    def timed(self, kind: str, name: str = None):
+        """
+        Decorator timing every call of a function. Returns the function
+        itself when metrics are disabled.
+        """
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+            label = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Span(self, kind, label):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def instrument(self, namespace: dict, kind: str, exclude: tuple = ()):
+        """
+        Wraps every public function defined in a module (pass its globals()) with a span.
+        """
+        if not self.enabled:
+            return
+        module = namespace.get("__name__")
+        for attr, value in list(namespace.items()):
+            if (attr.startswith("_") or attr in exclude or not callable(value) or isinstance(value, type)
+                    or getattr(value, "__module__", None) != module):
+                continue
+            namespace[attr] = self.timed(kind, attr)(value)
+
+    def add_tokens(self, tokens: int):
+        if self.enabled and tokens:
+            self.tokens.inc(amount=tokens)
+
+    def _finish(self, kind: str, name: str, seconds: float, exc_type):
+        self.spans.observe(seconds, kind, name)
+        if exc_type is not None:
+            self.errors.inc(kind, name, exc_type.__name__)
+        calls = getattr(self._local, "calls", None)
+        if calls is not None:
+            calls[kind] = calls.get(kind, 0) + 1
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.spans, self.errors, self.calls_per_message, self.messages, self.tokens):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+def span(kind: str, name: str = ""):
+    return metrics.span(kind, name)
+
+def timed(kind: str, name: str = None):
+    return metrics.timed(kind, name)
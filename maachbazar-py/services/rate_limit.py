@@ -0,0 +1,83 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+
+# Per-user cap on AI turns, against message floods (each turn is a Gemini call)
+USER_TURN_LIMIT = int(os.getenv("USER_TURN_LIMIT", "30"))
+USER_TURN_WINDOW = float(os.getenv("USER_TURN_WINDOW", "60"))  # seconds
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+class SlidingWindowLimiter:
+    """
+    In-memory sliding-window limiter: at most `limit` actions per key in
+    any `window` seconds. Per process, so it needs no database round trip;
+    use a database counter where the limit must hold across workers.
+    Keys idle for longer than the window are forgotten, and at most
+    `max_keys` are tracked (least recently used go first).
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = RATE_LIMIT_MAX_KEYS, clock=time.monotonic):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.clock = clock
+        self.allowed = 0
+        self.rejected = 0
+        self._hits = OrderedDict()  # key -> deque of timestamps, oldest first
+        self._lock = threading.Lock()
+
+    def _prune(self, hits: deque, now: float):
+        cutoff = now - self.window
+        while hits and hits[0] <= cutoff:
+            hits.popleft()
+
+    def hit(self, key: str) -> bool:
+        """
+        Records an action for `key` if it is within the limit. Returns False (and records nothing) if not.
+        """
+        now = self.clock()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            else:
+                self._hits.move_to_end(key)
+                self._prune(hits, now)
+
+            if len(hits) >= self.limit:
+                self.rejected += 1
+                return False
+
+            hits.append(now)
+            self.allowed += 1
+            self._evict(now)
+            return True
+
+    def remaining(self, key: str) -> int:
+        now = self.clock()
+        with self._lock:
+            hits = self._hits.get(key)
+            if not hits:
+                return self.limit
+            self._prune(hits, now)
+            return max(0, self.limit - len(hits))
+
+    def reset(self, key: str):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def _evict(self, now: float):
+        # Oldest-used keys first; stop at the first one still inside its window
+        while self._hits:
+            key, hits = next(iter(self._hits.items()))
+            if len(self._hits) <= self.max_keys and hits and hits[-1] > now - self.window:
+                break
+            del self._hits[key]
+
+    def stats(self) -> dict:
+        return {"keys": len(self._hits), "allowed": self.allowed, "rejected": self.rejected}
+
+turn_limiter = SlidingWindowLimiter(USER_TURN_LIMIT, USER_TURN_WINDOW)
+# One "please wait" reply per user per window once they hit the turn limit
+turn_notice_limiter = SlidingWindowLimiter(1, USER_TURN_WINDOW)
@@ -0,0 +1,72 @@
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Stream Gemini replies: show "typing..." at once and send the first sentences early
+AI_STREAMING = os.getenv("AI_STREAMING", "off") == "on"
+STREAM_MIN_CHARS = int(os.getenv("STREAM_MIN_CHARS", "40"))  # shortest early send
+
+# End of a sentence, followed by more text (so "2." in "2.5 kg" is not one)
+SENTENCE_END = re.compile(r"[.!।\n](?=\s)")
+
+class ReplyStream:
+    """
+    Collects a reply as Gemini streams it. The first time the text holds
+    at least `min_chars` of complete sentences, those are handed to
+    `send(text)`, so the customer sees something while the rest is
+    generated. Questions are never sent early: the bill's "confirm?"
+    question must go out with the buttons, in the final message.
+
+    `on_start()` is called once, when generation starts (e.g. to show a
+    typing indicator).
+    """
+
+    def __init__(self, send=None, on_start=None, min_chars: int = STREAM_MIN_CHARS):
+        self.send = send
+        self.on_start = on_start
+        self.min_chars = min_chars
+        self.text = ""
+        self.sent = ""  # prefix of `text` already handed to `send`
+        self.started = False
+
+    def start(self):
+        if self.started:
+            return
+        self.started = True
+        if self.on_start:
+            try:
+                self.on_start()
+            except Exception as e:
+                logger.error(f"Reply stream start callback failed: {e}")
+
+    def feed(self, chunk: str):
+        self.text += chunk or ""
+        if self.sent or not self.send:
+            return
+
+        cut = None
+        for match in SENTENCE_END.finditer(self.text):
+            if match.end() >= self.min_chars:
+                cut = match.end()
+                break
+        if cut is None:
+            return
+        head = self.text[:cut]
+        if "?" in head:
+            return
+
+        self.sent = head
+        try:
+            self.send(head.strip())
+        except Exception as e:
+            logger.error(f"Early reply send failed: {e}")
+
+    def unsent(self, reply: str):
+        """
+        The part of the final reply not sent yet, or None if nothing is left.
+        """
+        if reply and self.sent and reply.startswith(self.sent):
+            return reply[len(self.sent):].strip() or None
+        return reply
@@ -1,6 +1,6 @@
 import logging
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from services.template_sender import broadcast_morning_template
+from services.template_sender import broadcast_morning_template, resume_morning_broadcast
 from apscheduler.triggers.cron import CronTrigger
 
 logger = logging.getLogger(__name__)
@@ -30,5 +30,20 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # Pick up a broadcast that a previous worker was killed in the middle of
+    scheduler.add_job(
+        resume_morning_broadcast,
+        id="resume_morning_broadcast",
+        replace_existing=True
+    )
+
     scheduler.start()
     logger.info("Scheduler started. Morning broadcast set for 8:00 AM IST.")
+
+def stop_scheduler():
+    """
+    Stops the scheduler (e.g. when this process gives up leadership).
+    """
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+        logger.info("Scheduler stopped.")
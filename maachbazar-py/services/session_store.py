@@ -0,0 +1,139 @@
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+SESSION_EXPIRY = 24 * 60 * 60  # WhatsApp customer-service window: 24 hours
+# memory: per-process dict; sqlite: one file shared by every worker on the host
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(tempfile.gettempdir(), "maachbazar-sessions.db"))
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "600"))  # seconds
+
+class SessionStore:
+    """
+    Tracks when each user last messaged us, to know whether we are inside
+    their 24-hour window. Expired entries are swept at most every
+    SESSION_SWEEP_INTERVAL seconds, piggybacking on touch().
+    """
+
+    def __init__(self, expiry: int = SESSION_EXPIRY, sweep_interval: int = SESSION_SWEEP_INTERVAL):
+        self.expiry = expiry
+        self.sweep_interval = sweep_interval
+        self._last_sweep = int(time.time())
+
+    def touch(self, user_id: str):
+        now = int(time.time())
+        self.set(user_id, now)
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            removed = self.sweep(now)
+            if removed:
+                logger.info(f"Swept {removed} expired sessions")
+
+    def is_active(self, user_id: str) -> bool:
+        ts = self.get(user_id)
+        if not ts:
+            return False
+        return (int(time.time()) - ts) <= self.expiry
+
+    # Dict-style access to raw timestamps
+    def __setitem__(self, user_id: str, ts: int):
+        self.set(user_id, ts)
+
+    def __getitem__(self, user_id: str) -> int:
+        ts = self.get(user_id)
+        if ts is None:
+            raise KeyError(user_id)
+        return ts
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.get(user_id) is not None
+
+class MemorySessionStore(SessionStore):
+    """
+    Per-process store. Entries are kept in last-touched order, and since
+    every session has the same lifetime that is also expiry order, so a
+    sweep only walks the expired prefix.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set(self, user_id: str, ts: int):
+        with self._lock:
+            self._sessions[user_id] = ts
+            self._sessions.move_to_end(user_id)
+
+    def get(self, user_id: str, default=None):
+        return self._sessions.get(user_id, default)
+
+    def sweep(self, now: int = None) -> int:
+        cutoff = (now or int(time.time())) - self.expiry
+        removed = 0
+        with self._lock:
+            while self._sessions:
+                user_id, ts = next(iter(self._sessions.items()))
+                if ts >= cutoff:
+                    break
+                del self._sessions[user_id]
+                removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self._sessions)
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store backed by a local SQLite file in WAL mode, so all gunicorn
+    workers on the host see the same sessions.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sessions (user_id TEXT PRIMARY KEY, last_seen INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions(last_seen)")
+
+    def set(self, user_id: str, ts: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (user_id, last_seen) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (user_id, ts),
+            )
+
+    def get(self, user_id: str, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT last_seen FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else default
+
+    def sweep(self, now: int = None) -> int:
+        cutoff = (now or int(time.time())) - self.expiry
+        with self._lock:
+            return self._conn.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,)).rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+def make_store(kind: str = SESSION_STORE) -> SessionStore:
+    if kind == "sqlite":
+        try:
+            return SQLiteSessionStore()
+        except sqlite3.Error as e:
+            logger.error(f"Could not open session database {SESSION_DB_PATH}, using in-memory sessions: {e}")
+    return MemorySessionStore()
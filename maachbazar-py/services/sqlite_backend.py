@@ -0,0 +1,495 @@
+import json
+import sqlite3
+import datetime
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Mirrors the Supabase tables (including the migrations) closely enough for db.py
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    phone TEXT PRIMARY KEY,
+    name TEXT,
+    language TEXT,
+    address TEXT,
+    conversation_state TEXT,
+    address_update_count INTEGER DEFAULT 0,
+    opt_in BOOLEAN DEFAULT 1,
+    last_active_ts TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_phone TEXT REFERENCES users(phone),
+    role TEXT,
+    content TEXT,
+    whatsapp_message_id TEXT UNIQUE,
+    order_placed BOOLEAN DEFAULT 0,
+    delivery_status TEXT,
+    status_updated_at TEXT,
+    delivery_error TEXT,
+    template_name TEXT,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_phone TEXT REFERENCES users(phone),
+    total_price INTEGER,
+    status TEXT DEFAULT 'pending',
+    delivery_address TEXT,
+    message_id INTEGER REFERENCES messages(id),
+    order_created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    CONSTRAINT unique_message_order UNIQUE (message_id)
+);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER REFERENCES orders(id) ON DELETE CASCADE,
+    fish_name TEXT,
+    quantity REAL,
+    price_per_kg INTEGER,
+    subtotal INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE,
+    price INTEGER,
+    is_available BOOLEAN DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS broadcast_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'running',
+    cursor TEXT,
+    sent INTEGER DEFAULT 0,
+    failed INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    completed_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS broadcast_recipients (
+    job_id INTEGER NOT NULL REFERENCES broadcast_jobs(id) ON DELETE CASCADE,
+    phone TEXT NOT NULL,
+    status TEXT NOT NULL,
+    whatsapp_message_id TEXT,
+    error TEXT,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    PRIMARY KEY (job_id, phone)
+);
+
+CREATE INDEX IF NOT EXISTS idx_users_opt_in ON users(opt_in);
+CREATE INDEX IF NOT EXISTS idx_messages_user_phone_created_at ON messages(user_phone, created_at);
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at ON orders(updated_at);
+CREATE INDEX IF NOT EXISTS idx_orders_status_id ON orders(status, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_user_phone_id ON orders(user_phone, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
+CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status ON broadcast_jobs(name, status);
+
+CREATE VIEW IF NOT EXISTS template_delivery_stats AS
+SELECT
+    template_name,
+    DATE(created_at) AS day,
+    COUNT(*) AS sent,
+    COUNT(*) FILTER (WHERE delivery_status IN ('delivered', 'read')) AS delivered,
+    COUNT(*) FILTER (WHERE delivery_status = 'read') AS read,
+    COUNT(*) FILTER (WHERE delivery_status = 'failed') AS failed,
+    ROUND(100.0 * COUNT(*) FILTER (WHERE delivery_status IN ('delivered', 'read')) / COUNT(*), 1) AS delivery_rate,
+    ROUND(100.0 * COUNT(*) FILTER (WHERE delivery_status = 'read') / COUNT(*), 1) AS read_rate
+FROM messages
+WHERE template_name IS NOT NULL
+GROUP BY template_name, DATE(created_at);
+
+-- Every order write gets an updated_at later than any other, so the orders
+-- fingerprint (count:max(updated_at)) changes even within one millisecond
+DROP TRIGGER IF EXISTS orders_touch_updated_at;
+CREATE TRIGGER orders_touch_updated_at AFTER UPDATE ON orders
+FOR EACH ROW WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE orders SET updated_at = change_stamp((SELECT MAX(updated_at) FROM orders)) WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS orders_stamp_insert AFTER INSERT ON orders
+FOR EACH ROW
+BEGIN
+    UPDATE orders SET updated_at = change_stamp((SELECT MAX(updated_at) FROM orders WHERE id != NEW.id))
+    WHERE id = NEW.id;
+END;
+"""
+
+def _change_stamp(latest: str) -> str:
+    # The current UTC time in microseconds, or just after `latest` if the clock hasn't passed it
+    now = datetime.datetime.utcnow()
+    if latest:
+        try:
+            now = max(now, datetime.datetime.fromisoformat(latest) + datetime.timedelta(microseconds=1))
+        except ValueError:
+            pass
+    return now.isoformat(timespec="microseconds")
+
+class APIError(Exception):
+    """
+    Raised for failed statements, like postgrest's APIError.
+    """
+
+class Result:
+    """
+    Looks like a postgrest APIResponse: `data` and `count`.
+    """
+
+    def __init__(self, data, count: int = None):
+        self.data = data
+        self.count = count
+
+# Embedded resources in select(): (parent, child) -> (parent key, child foreign key)
+RELATIONS = {
+    ("users", "messages"): ("phone", "user_phone"),
+    ("orders", "order_items"): ("id", "order_id"),
+}
+
+def _split_columns(columns: str) -> list:
+    # "*, messages(role, content)" -> ["*", "messages(role, content)"]
+    parts, depth, current = [], 0, ""
+    for ch in columns or "*":
+        if ch == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += ch == "("
+        depth -= ch == ")"
+        current += ch
+    parts.append(current.strip())
+    return [part for part in parts if part]
+
+def _parse_select(columns: str):
+    """
+    Returns ([column or '*'], {embedded table: [column or '*']}).
+    """
+    plain, embeds = [], {}
+    for part in _split_columns(columns):
+        if "(" in part:
+            name, inner = part.split("(", 1)
+            embeds[name.strip()] = _parse_select(inner.rstrip(")"))[0]
+        else:
+            plain.append(part)
+    return plain or ["*"], embeds
+
+def _project(row: dict, columns: list) -> dict:
+    return dict(row) if "*" in columns else {column: row.get(column) for column in columns}
+
+class _Query:
+    """
+    The subset of postgrest's request builder that db.py uses:
+    select/insert/update/upsert/delete, eq/neq/gt/gte/lt/lte/in_ filters,
+    order and limit (also on embedded tables), and count="exact".
+    """
+
+    OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+    def __init__(self, client, table: str):
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.count = None
+        self.values = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.filters = []  # (sql, params)
+        self.orders = {}  # table -> [(column, desc)]
+        self.limits = {}  # table -> n
+
+    def select(self, columns: str = "*", count: str = None):
+        self.columns = columns
+        self.count = count
+        return self
+
+    def insert(self, values):
+        self.action, self.values = "insert", values
+        return self
+
+    def upsert(self, values, on_conflict: str = None, ignore_duplicates: bool = False):
+        self.action, self.values = "upsert", values
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: dict):
+        self.action, self.values = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    def _filter(self, op: str, column: str, value):
+        self.filters.append((f'"{column}" {self.OPERATORS[op]} ?', [value]))
+        return self
+
+    def eq(self, column, value): return self._filter("eq", column, value)
+    def neq(self, column, value): return self._filter("neq", column, value)
+    def gt(self, column, value): return self._filter("gt", column, value)
+    def gte(self, column, value): return self._filter("gte", column, value)
+    def lt(self, column, value): return self._filter("lt", column, value)
+    def lte(self, column, value): return self._filter("lte", column, value)
+
+    def in_(self, column: str, values):
+        values = list(values)
+        if not values:
+            self.filters.append(("0", []))
+        else:
+            self.filters.append((f'"{column}" IN ({", ".join("?" * len(values))})', values))
+        return self
+
+    def order(self, column: str, desc: bool = False, foreign_table: str = None):
+        self.orders.setdefault(foreign_table or self.table, []).append((column, desc))
+        return self
+
+    def limit(self, size: int, foreign_table: str = None):
+        self.limits[foreign_table or self.table] = size
+        return self
+
+    def _where(self):
+        if not self.filters:
+            return "", []
+        params = [value for _, values in self.filters for value in values]
+        return " WHERE " + " AND ".join(sql for sql, _ in self.filters), params
+
+    def _order_by(self, table: str) -> str:
+        orders = self.orders.get(table)
+        if not orders:
+            return ""
+        return " ORDER BY " + ", ".join(f'"{column}"{" DESC" if desc else ""}' for column, desc in orders)
+
+    def execute(self) -> Result:
+        try:
+            with self.client._lock:
+                return getattr(self, f"_{self.action}")(self.client._conn)
+        except sqlite3.Error as e:
+            raise APIError(str(e)) from e
+
+    def _select(self, conn) -> Result:
+        columns, embeds = _parse_select(self.columns)
+        where, params = self._where()
+        sql = f'SELECT * FROM "{self.table}"{where}{self._order_by(self.table)}'
+        if self.table in self.limits:
+            sql += f" LIMIT {int(self.limits[self.table])}"
+        rows = [self.client._row(self.table, row) for row in conn.execute(sql, params)]
+
+        for child, child_columns in embeds.items():
+            self._embed(conn, rows, child, child_columns)
+        data = [_project(row, columns + list(embeds)) for row in rows]
+
+        count = None
+        if self.count:
+            count = conn.execute(f'SELECT COUNT(*) FROM "{self.table}"{where}', params).fetchone()[0]
+        return Result(data, count)
+
+    def _embed(self, conn, rows: list, child: str, columns: list):
+        key, foreign_key = RELATIONS[(self.table, child)]
+        keys = list({row[key] for row in rows})
+        grouped = {k: [] for k in keys}
+        if keys:
+            sql = f'SELECT * FROM "{child}" WHERE "{foreign_key}" IN ({", ".join("?" * len(keys))}){self._order_by(child)}'
+            for row in conn.execute(sql, keys):
+                row = self.client._row(child, row)
+                grouped[row[foreign_key]].append(_project(row, columns))
+        limit = self.limits.get(child)
+        for row in rows:
+            children = grouped.get(row[key], [])
+            row[child] = children[:limit] if limit is not None else children
+
+    def _rows(self) -> list:
+        return self.values if isinstance(self.values, list) else [self.values]
+
+    def _insert(self, conn) -> Result:
+        rows = self._rows()
+        if not rows:
+            return Result([])
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        names = ", ".join(f'"{c}"' for c in columns)
+        sql = f'INSERT INTO "{self.table}" ({names}) VALUES ({", ".join("?" * len(columns))})'
+        if self.action == "upsert":
+            keys = [c.strip() for c in (self.on_conflict or "id").split(",")]
+            target = ", ".join(f'"{c}"' for c in keys)
+            updates = [f'"{c}" = excluded."{c}"' for c in columns if c not in keys]
+            if self.ignore_duplicates or not updates:
+                sql += f" ON CONFLICT ({target}) DO NOTHING"
+            else:
+                sql += f" ON CONFLICT ({target}) DO UPDATE SET {', '.join(updates)}"
+        sql += " RETURNING *"
+
+        data = []
+        with self.client._transaction() as conn:
+            for row in rows:
+                data.extend(self.client._row(self.table, r) for r in conn.execute(sql, [row.get(c) for c in columns]))
+        return Result(data)
+
+    _upsert = _insert
+
+    def _update(self, conn) -> Result:
+        where, params = self._where()
+        assignments = ", ".join(f'"{column}" = ?' for column in self.values)
+        sql = f'UPDATE "{self.table}" SET {assignments}{where} RETURNING *'
+        rows = conn.execute(sql, list(self.values.values()) + params).fetchall()
+        return Result([self.client._row(self.table, row) for row in rows])
+
+    def _delete(self, conn) -> Result:
+        where, params = self._where()
+        rows = conn.execute(f'DELETE FROM "{self.table}"{where} RETURNING *', params).fetchall()
+        return Result([self.client._row(self.table, row) for row in rows])
+
+class _RPC:
+    def __init__(self, client, name: str, params: dict):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self) -> Result:
+        handler = getattr(self.client, f"_rpc_{self.name}", None)
+        if handler is None:
+            raise APIError(f"Could not find the function {self.name}")
+        return Result(handler(**self.params))
+
+class SQLiteClient:
+    """
+    Storage backend on a local SQLite database (WAL mode), for running
+    and load-testing the bot offline or as a single-node deployment
+    (DB_BACKEND=sqlite). It implements the part of the supabase-py
+    client that db.py uses - table() queries and rpc() - so db.py runs
+    on it unchanged. SQL functions from the migrations are implemented
+    as `_rpc_<name>` methods.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.create_function("change_stamp", 1, _change_stamp)
+        self._conn.executescript(SCHEMA)
+        self._booleans = {}
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def _row(self, table: str, row: sqlite3.Row) -> dict:
+        # SQLite has no boolean type; return BOOLEAN columns as True/False like PostgREST
+        booleans = self._booleans.get(table)
+        if booleans is None:
+            booleans = self._booleans[table] = {
+                info["name"] for info in self._conn.execute(f'PRAGMA table_info("{table}")') if info["type"] == "BOOLEAN"
+            }
+        row = dict(row)
+        for column in booleans & row.keys():
+            if row[column] is not None:
+                row[column] = bool(row[column])
+        return row
+
+    def rpc(self, name: str, params: dict = None) -> _RPC:
+        return _RPC(self, name, params or {})
+
+    def _transaction(self):
+        """
+        Context manager running a block in one write transaction.
+        """
+        client = self
+
+        class Transaction:
+            def __enter__(self):
+                client._lock.acquire()
+                client._conn.execute("BEGIN IMMEDIATE")
+                return client._conn
+
+            def __exit__(self, exc_type, exc, tb):
+                try:
+                    client._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                finally:
+                    client._lock.release()
+                return False
+
+        return Transaction()
+
+    def _order_json(self, conn, order_id: int) -> dict:
+        order = dict(conn.execute("SELECT * FROM orders WHERE id = ?", (order_id,)).fetchone())
+        order["order_items"] = [
+            dict(row) for row in conn.execute("SELECT * FROM order_items WHERE order_id = ? ORDER BY id", (order_id,))
+        ]
+        return order
+
+    def _rpc_place_order(self, p_user_phone: str, p_items, p_address: str = None, p_message_id: int = None) -> dict:
+        # Same steps and semantics as place_order() in migration_place_order.sql
+        if isinstance(p_items, str):
+            p_items = json.loads(p_items)
+        items = [
+            (item["fish_name"], item["quantity"], int(item["price_per_kg"]), int(item["quantity"] * item["price_per_kg"]))
+            for item in p_items
+        ]
+        total = sum(subtotal for _, _, _, subtotal in items)
+
+        with self._transaction() as conn:
+            order_id = conn.execute(
+                "INSERT INTO orders (user_phone, total_price, status, delivery_address, message_id) "
+                "VALUES (?, ?, 'pending', ?, ?) ON CONFLICT (message_id) DO NOTHING RETURNING id",
+                (p_user_phone, total, p_address, p_message_id),
+            ).fetchone()
+
+            if order_id is None:
+                existing = conn.execute("SELECT id FROM orders WHERE message_id = ?", (p_message_id,)).fetchone()
+                return {"duplicate": True, "order": self._order_json(conn, existing[0])}
+            order_id = order_id[0]
+
+            conn.executemany(
+                "INSERT INTO order_items (order_id, fish_name, quantity, price_per_kg, subtotal) VALUES (?, ?, ?, ?, ?)",
+                [(order_id,) + item for item in items],
+            )
+            if p_message_id is not None:
+                conn.execute("UPDATE messages SET order_placed = 1 WHERE id = ?", (p_message_id,))
+            conn.execute(
+                "UPDATE users SET address = COALESCE(?, address), address_update_count = 0 WHERE phone = ?",
+                (p_address, p_user_phone),
+            )
+            return {"duplicate": False, "order": self._order_json(conn, order_id)}
+
+    def _rpc_increment_address_update_count(self, p_phone: str, p_limit: int = None):
+        # Same as increment_address_update_count() in migration_address_counter.sql
+        with self._transaction() as conn:
+            row = conn.execute(
+                "UPDATE users SET address_update_count = COALESCE(address_update_count, 0) + 1 "
+                "WHERE phone = ? AND (? IS NULL OR COALESCE(address_update_count, 0) < ?) "
+                "RETURNING address_update_count",
+                (p_phone, p_limit, p_limit),
+            ).fetchone()
+            return row[0] if row else None
+
+    def _rpc_apply_message_statuses(self, p_updates) -> int:
+        # Same as apply_message_statuses() in migration_delivery_status.sql: statuses never move backwards
+        if isinstance(p_updates, str):
+            p_updates = json.loads(p_updates)
+        rank = "CASE {0} WHEN 'sent' THEN 1 WHEN 'delivered' THEN 2 WHEN 'read' THEN 3 WHEN 'failed' THEN 3 ELSE 0 END"
+        updated = 0
+        with self._transaction() as conn:
+            for update in p_updates:
+                updated += conn.execute(
+                    "UPDATE messages SET delivery_status = ?, status_updated_at = ?, delivery_error = ? "
+                    f"WHERE whatsapp_message_id = ? AND {rank.format('?')} > {rank.format('delivery_status')}",
+                    (update["status"], update.get("updated_at"), update.get("error"),
+                     update["whatsapp_message_id"], update["status"]),
+                ).rowcount
+        return updated
+
+    def close(self):
+        self._conn.close()
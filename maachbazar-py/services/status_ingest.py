@@ -0,0 +1,171 @@
+import os
+import atexit
+import datetime
+import logging
+import threading
+
+import db
+
+logger = logging.getLogger(__name__)
+
+STATUS_BATCH_SIZE = int(os.getenv("STATUS_BATCH_SIZE", "500"))
+STATUS_FLUSH_INTERVAL = float(os.getenv("STATUS_FLUSH_INTERVAL", "2"))  # seconds
+STATUS_MAX_PENDING = int(os.getenv("STATUS_MAX_PENDING", "50000"))  # beyond this, new statuses are dropped
+
+# Statuses only move forward; 'read' and 'failed' are final (mirrors delivery_status_rank in SQL)
+STATUS_RANK = {"sent": 1, "delivered": 2, "read": 3, "failed": 3}
+
+def _update_from_status(status: dict):
+    """
+    Turns a webhook status object into a row for db.apply_message_statuses.
+    """
+    timestamp = status.get("timestamp")
+    try:
+        updated_at = datetime.datetime.utcfromtimestamp(int(timestamp)).isoformat()
+    except (TypeError, ValueError):
+        updated_at = datetime.datetime.utcnow().isoformat()
+
+    error = None
+    errors = status.get("errors") or []
+    if errors:
+        error = f"{errors[0].get('code')}: {errors[0].get('title')}"[:500]
+
+    return {
+        "whatsapp_message_id": status.get("id"),
+        "status": status.get("status"),
+        "updated_at": updated_at,
+        "error": error,
+    }
+
+class StatusAggregator:
+    """
+    Coalesces delivery status events per wamid, keeping only the most
+    advanced state, and writes them in batches off the request path.
+
+    `add` is a dict update under a lock, so the webhook endpoint can call it
+    directly instead of queueing statuses behind customer messages.
+    """
+
+    def __init__(self, batch_size: int = STATUS_BATCH_SIZE, flush_interval: float = STATUS_FLUSH_INTERVAL,
+                 max_pending: int = STATUS_MAX_PENDING, apply=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.apply = apply  # updates -> count; defaults to db.apply_message_statuses
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self._pending = {}  # wamid -> update
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+
+    def _merge(self, update: dict) -> bool:
+        """
+        Folds one update into the pending set. Caller holds the lock.
+        """
+        wamid = update["whatsapp_message_id"]
+        current = self._pending.get(wamid)
+        if current is None:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending[wamid] = update
+            return True
+
+        self.coalesced += 1
+        if STATUS_RANK.get(update["status"], 0) > STATUS_RANK.get(current["status"], 0):
+            self._pending[wamid] = update
+        return True
+
+    def add(self, status: dict):
+        """
+        Records one status object from a webhook payload.
+        """
+        if not status.get("id") or status.get("status") not in STATUS_RANK:
+            return
+        update = _update_from_status(status)
+        with self._lock:
+            self.received += 1
+            self._merge(update)
+            pending = len(self._pending)
+
+        self._ensure_thread()
+        if pending >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """
+        Writes all pending statuses. Returns the number of messages updated.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = list(self._pending.values()), {}
+            if not batch:
+                return 0
+
+            apply = self.apply or db.apply_message_statuses
+            updated = 0
+            for start in range(0, len(batch), self.batch_size):
+                chunk = batch[start:start + self.batch_size]
+                try:
+                    updated += apply(chunk) or 0
+                    self.batches += 1
+                except Exception as e:
+                    logger.error(f"Failed to write {len(chunk)} delivery statuses, will retry: {e}")
+                    with self._lock:
+                        for update in chunk:
+                            self._merge(update)
+
+            self.written += updated
+            return updated
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="status-ingest", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Status flush failed: {e}")
+
+    def close(self):
+        """
+        Stops the background flusher and writes whatever is left.
+        """
+        self._closed = True
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "pending": len(self._pending),
+            "written": self.written,
+            "batches": self.batches,
+        }
+
+aggregator = StatusAggregator()
+atexit.register(aggregator.close)
+
+def add(status: dict):
+    aggregator.add(status)
+
+def close():
+    aggregator.close()
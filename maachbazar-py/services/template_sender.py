@@ -1,75 +1,88 @@
 import logging
 import asyncio
-from services.whatsapp import send_template
+import datetime
+from zoneinfo import ZoneInfo
 import db
+from services import whatsapp
+from services import broadcast
+from services import user_context
 
 logger = logging.getLogger(__name__)
 
+MORNING_TEMPLATE = "maachbazar_intro_v2"
+MORNING_JOB = "morning_broadcast"
+IST = ZoneInfo("Asia/Kolkata")
+
+def morning_job_key(day: datetime.date = None) -> str:
+    """
+    One morning broadcast job per IST calendar day, e.g. 'morning_broadcast:2026-10-18'.
+    """
+    day = day or datetime.datetime.now(IST).date()
+    return f"{MORNING_JOB}:{day.isoformat()}"
+
+def build_morning_payload(user: dict):
+    """
+    Builds the 'fresh stock alert' template message for one user.
+    """
+    phone = user.get("phone")
+    if not phone:
+        return None
+
+    # {{1}} = Customer Name
+    user_name = "Customer"
+
+    components = [
+        {
+            "type": "body",
+            "parameters": [
+                {
+                    "type": "text",
+                    "text": user_name
+                }
+            ]
+        }
+    ]
+    return whatsapp.build_template_payload(phone, MORNING_TEMPLATE, language_code="en", components=components)
+
+async def log_morning_result(user: dict, wamid: str, error):
+    if wamid:
+        # Log usage
+        await asyncio.to_thread(
+            user_context.record_message, user["phone"], "assistant", "Sent daily fresh stock alert",
+            whatsapp_message_id=wamid, template_name=MORNING_TEMPLATE
+        )
+
 async def broadcast_morning_template():
     """
-    Fetches opt-in users and sends the morning 'fresh_stock_alert' template.
+    Sends the morning 'fresh_stock_alert' template to every opted-in user.
+    Runs as today's resumable broadcast job, so calling it again after a
+    restart continues where it stopped instead of messaging people twice.
     """
     logger.info("Starting morning broadcast...")
-    
-    # 1. Fetch Opt-in Users
-    users = db.get_opt_in_users()
-    if not users:
-        logger.info("No opt-in users found.")
+
+    if not whatsapp.WHATSAPP_TOKEN or not whatsapp.PHONE_NUMBER_ID:
+        logger.error("WHATSAPP_TOKEN or PHONE_NUMBER_ID not set")
         return
 
-    logger.info(f"Found {len(users)} opt-in users.")
-    
-    # 2. Fetch Inventory for {{2}}
-    # "Rohu, Katla, Pomfret"
-    inventory_str = db.get_inventory_string()
-    # Simple extraction or use as is if it's formatted nicely. 
-    # get_inventory_string returns "Rohu: 250/kg, ..."
-    # We might want just names for the template to keep it short if needed, 
-    # but the prompt example says "includes {{2}}", so "Rohu, Katla" is nice.
-    # Let's clean it up to just names for brevity in the alert.
-    
-    try:
-        items = db.get_inventory()
-        # Filter available
-        avail_names = [i['name'] for i in items if i.get('is_available')]
-        stock_list = ", ".join(avail_names) if avail_names else "fresh fish"
-    except Exception:
-        stock_list = "fresh fish"
+    report = await broadcast.run_job(morning_job_key(), MORNING_JOB, build_morning_payload, on_result=log_morning_result)
+    if report is None:
+        return
+    if not report.total:
+        logger.info("No opt-in users left to message.")
 
-    for user in users:
-        phone = user.get("phone")
-        
-        # Prepare template components
-        # {{1}} = Customer Name
-        user_name = "Customer" 
-        
-        components = [
-            {
-                "type": "body",
-                "parameters": [
-                    {
-                        "type": "text",
-                        "text": user_name
-                    }
-                ]
-            }
-        ]
-        
-        # Send
-        try:
-            msg_id = send_template(phone, "maachbazar_intro_v2", language_code="en", components=components)
-            if msg_id:
-                count_sent += 1
-                # Log usage
-                db.log_message(phone, "assistant", "Sent daily fresh stock alert", whatsapp_message_id=msg_id)
-            else:
-                count_failed += 1
-        except Exception as e:
-            logger.error(f"Failed to broadcast to {phone}: {e}")
-            count_failed += 1
-            
-        # Rate limiting matching WhatsApp limits (approx 80/sec is limit, but be safe)
-        await asyncio.sleep(0.1) 
+    return report.as_dict()
 
-    logger.info(f"Broadcast complete. Sent: {count_sent}, Failed: {count_failed}")
-    return {"sent": count_sent, "failed": count_failed}
+async def resume_morning_broadcast():
+    """
+    Resumes today's morning broadcast if a previous process stopped mid-run.
+    Unfinished runs from earlier days are abandoned rather than sent late.
+    """
+    today = morning_job_key()
+    jobs = await asyncio.to_thread(db.get_unfinished_broadcast_jobs, MORNING_JOB)
+    for job in jobs:
+        if job["job_key"] == today:
+            logger.info(f"Found interrupted broadcast job '{today}', resuming")
+            await broadcast_morning_template()
+        else:
+            logger.warning(f"Abandoning stale broadcast job '{job['job_key']}'")
+            await asyncio.to_thread(db.update_broadcast_job, job["id"], {"status": "abandoned"})
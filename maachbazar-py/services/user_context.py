@@ -0,0 +1,153 @@
+import os
+import time
+import datetime
+import logging
+import threading
+from collections import OrderedDict
+
+import db
+from services import message_log
+
+logger = logging.getLogger(__name__)
+
+HISTORY_LIMIT = 5
+CONTEXT_TTL = float(os.getenv("USER_CONTEXT_TTL", "15"))  # seconds a context stays visible to peek()
+CONTEXT_CACHE_SIZE = int(os.getenv("USER_CONTEXT_CACHE_SIZE", "1000"))
+
+class UserContext:
+    """
+    Everything a turn needs to know about a user, loaded in one query.
+    Changes made with `set` are kept in memory and written back by `flush`
+    in a single update.
+    """
+
+    def __init__(self, phone: str, user: dict = None, history: list = None, is_new: bool = False):
+        self.phone = phone
+        self.user = dict(user or {})
+        self.history = list(history or [])
+        self.is_new = is_new
+        self._dirty = {}
+
+    def get(self, field: str, default=None):
+        value = self.user.get(field)
+        return default if value is None else value
+
+    def set(self, field: str, value):
+        """
+        Updates a user field locally and marks it for write-back.
+        """
+        self.user[field] = value
+        self._dirty[field] = value
+
+    def sync(self, field: str, value):
+        """
+        Updates a user field locally that the database already has (no write-back).
+        """
+        self.user[field] = value
+        self._dirty.pop(field, None)
+
+    @property
+    def language(self) -> str:
+        return self.get("language", "English")
+
+    @property
+    def address(self):
+        return self.get("address")
+
+    @property
+    def state(self):
+        return self.get("conversation_state")
+
+    @property
+    def address_update_count(self) -> int:
+        return self.get("address_update_count", 0)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty)
+
+    def touch(self):
+        """
+        Marks the user as active (and opted in) as of now.
+        """
+        self.set("last_active_ts", datetime.datetime.utcnow().isoformat())
+        self.set("opt_in", True)
+
+    def append_history(self, role: str, content: str):
+        self.history.append({"role": role, "content": content})
+        del self.history[:-HISTORY_LIMIT]
+
+    def log_message(self, role: str, content: str, whatsapp_message_id: str = None):
+        """
+        Logs a message (write-behind) and keeps the cached history in step.
+        """
+        message_log.log(self.phone, role, content, whatsapp_message_id=whatsapp_message_id)
+        self.append_history(role, content)
+
+    def flush(self):
+        """
+        Writes all pending field changes back in one update.
+        """
+        if not self._dirty:
+            return
+        fields, self._dirty = self._dirty, {}
+        db.update_user_fields(self.phone, fields)
+
+# Recently loaded contexts, for peek() only: { phone: (loaded_at, UserContext) }.
+# Turns always load from the database, since another worker may have changed
+# conversation_state or logged messages since.
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+def load(phone: str) -> UserContext:
+    """
+    Returns the user's context with one query (plus an insert for brand new
+    users). The user's buffered message_log rows are written first, so the
+    history includes the turns just before this one.
+    """
+    message_log.flush_for(phone)
+    user, history = db.get_user_with_history(phone, limit=HISTORY_LIMIT)
+    is_new = False
+    if not user:
+        user, is_new = db.get_or_create_user(phone)
+
+    context = UserContext(phone, user, history, is_new=is_new)
+    if user:
+        _store(context)
+    return context
+
+def _store(context: UserContext):
+    with _lock:
+        _cache[context.phone] = (time.monotonic(), context)
+        _cache.move_to_end(context.phone)
+        while len(_cache) > CONTEXT_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def peek(phone: str):
+    """
+    Returns the context loaded in the last CONTEXT_TTL seconds, without touching
+    the database. A hint only (e.g. for debounce windows): it may be stale.
+    """
+    with _lock:
+        cached = _cache.get(phone)
+    if cached and time.monotonic() - cached[0] <= CONTEXT_TTL:
+        return cached[1]
+    return None
+
+def invalidate(phone: str):
+    """
+    Drops the cached context so peek() stops returning it.
+    """
+    with _lock:
+        _cache.pop(phone, None)
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+def record_message(phone: str, role: str, content: str, whatsapp_message_id: str = None, template_name: str = None):
+    """
+    Logs a message for a user that may not have a context loaded in this request
+    (e.g. admin notifications).
+    """
+    message_log.log(phone, role, content, whatsapp_message_id=whatsapp_message_id, template_name=template_name)
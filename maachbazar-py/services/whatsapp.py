@@ -1,7 +1,8 @@
 import os
-import requests
 import logging
 import json
+from collections import namedtuple
+from services.graph_client import get_client, GraphAPIError
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +17,6 @@ def send_message(to: str, body: str):
         logger.error("WHATSAPP_TOKEN or PHONE_NUMBER_ID not set")
         return
 
-    url = f"https://graph.facebook.com/v17.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-        "Content-Type": "application/json",
-    }
     data = {
         "messaging_product": "whatsapp",
         "to": to,
@@ -29,54 +25,80 @@ def send_message(to: str, body: str):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
+        wamid = get_client().post_message(data)
         logger.info(f"Message sent to {to}: {body}")
-        return response.json()['messages'][0]['id']
-    except requests.exceptions.RequestException as e:
+        return wamid
+    except GraphAPIError as e:
         logger.error(f"Failed to send message: {e}")
-        if e.response:
-            logger.error(f"Response: {e.response.text}")
         return None
 
+def send_typing_indicator(message_id: str) -> bool:
+    """
+    Marks the user's message as read and shows "typing..." until we reply
+    (WhatsApp hides it after ~25 seconds).
+    """
+    if not WHATSAPP_TOKEN or not PHONE_NUMBER_ID or not message_id:
+        return False
+
+    data = {
+        "messaging_product": "whatsapp",
+        "status": "read",
+        "message_id": message_id,
+        "typing_indicator": {"type": "text"},
+    }
+
+    try:
+        get_client().post_message(data)
+        return True
+    except GraphAPIError as e:
+        logger.error(f"Failed to send typing indicator: {e}")
+        return False
+
+class WebhookEvent(namedtuple("WebhookEvent", ["entry", "change", "kind", "item"])):
+    """
+    One message or status from a webhook payload.
+    kind: 'message' or 'status'
+    """
+    __slots__ = ()
+
+    @property
+    def user_id(self):
+        if self.kind == "message":
+            return self.item.get("from")
+        return self.item.get("recipient_id")
+
+def iter_webhook_events(payload: dict):
+    """
+    Yields every message and status in a webhook payload, across all
+    entries and changes, in the order Meta sent them.
+    """
+    for entry in payload.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value") or {}
+            for message in value.get("messages") or []:
+                yield WebhookEvent(entry, change, "message", message)
+            for status in value.get("statuses") or []:
+                yield WebhookEvent(entry, change, "status", status)
+
 def process_webhook_payload(payload: dict):
     """
     Extracts relevant data from the webhook payload.
-    Returns a tuple (sender_id, message_text) or (None, None).
+    Returns a list of (sender_id, message_text) tuples, one per text message.
     """
+    results = []
     try:
-        entry = payload.get("entry", [])[0]
-        changes = entry.get("changes", [])[0]
-        value = changes.get("value", {})
-        messages = value.get("messages", [])
-
-        if messages:
-            message = messages[0]
-            sender_id = message.get("from")
-            text_body = message.get("text", {}).get("body")
-            
-            if message.get("type") == "text":
-                return sender_id, text_body
-            
-    except (IndexError, AttributeError) as e:
+        for event in iter_webhook_events(payload):
+            if event.kind == "message" and event.item.get("type") == "text":
+                results.append((event.user_id, event.item.get("text", {}).get("body")))
+    except AttributeError as e:
         logger.warning(f"Error parsing payload: {e}")
-    
-    return None, None
 
-def send_template(to_phone: str, template_name: str, language_code: str = "en_US", components: list = None):
+    return results
+
+def build_template_payload(to_phone: str, template_name: str, language_code: str = "en_US", components: list = None) -> dict:
     """
-    Sends a WhatsApp template message.
+    Builds the /messages payload for a template message.
     """
-    if not WHATSAPP_TOKEN or not PHONE_NUMBER_ID:
-        logger.error("WHATSAPP_TOKEN or PHONE_NUMBER_ID not set")
-        return
-
-    url = f"https://graph.facebook.com/v17.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    
     payload = {
         "messaging_product": "whatsapp",
         "to": to_phone,
@@ -92,13 +114,22 @@ def send_template(to_phone: str, template_name: str, language_code: str = "en_US
     if components:
         payload["template"]["components"] = components
 
+    return payload
+
+def send_template(to_phone: str, template_name: str, language_code: str = "en_US", components: list = None):
+    """
+    Sends a WhatsApp template message.
+    """
+    if not WHATSAPP_TOKEN or not PHONE_NUMBER_ID:
+        logger.error("WHATSAPP_TOKEN or PHONE_NUMBER_ID not set")
+        return
+
+    payload = build_template_payload(to_phone, template_name, language_code, components)
+
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+        wamid = get_client().post_message(payload)
         logger.info(f"Template '{template_name}' sent to {to_phone}")
-        return response.json()['messages'][0]['id']
-    except requests.exceptions.RequestException as e:
+        return wamid
+    except GraphAPIError as e:
         logger.error(f"Failed to send template: {e}")
-        if e.response:
-            logger.error(f"Response: {e.response.text}")
         return None
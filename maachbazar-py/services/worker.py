@@ -0,0 +1,167 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_KEY_DEPTH = int(os.getenv("WEBHOOK_KEY_DEPTH", "50"))  # queued items per user
+
+class WorkerPool:
+    """
+    Keyed serial executor: bounded in-process queues drained by a pool of
+    async consumers. The handler is a plain (blocking) function; each
+    consumer runs it on a thread pool so the event loop stays free to
+    acknowledge new webhooks.
+
+    Items with the same key are processed strictly one at a time, in
+    submission order, while different keys run in parallel on any free
+    consumer - a slow user never holds up anyone else. Each key has its own
+    FIFO of at most `key_depth` items and is forgotten as soon as it has
+    nothing queued or running. Ordering is per process: it covers every
+    event this worker receives.
+    """
+
+    def __init__(self, handler, workers: int = WEBHOOK_WORKERS, queue_size: int = WEBHOOK_QUEUE_SIZE,
+                 key_depth: int = WEBHOOK_KEY_DEPTH, name: str = "webhook"):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.key_depth = key_depth
+        self.name = name
+        self.processed = 0
+        self.rejected = 0
+        self._pending = {}  # key -> deque of items; present while the key is queued or running
+        self._ready = None  # keys with work and no consumer, in turn order
+        self._size = 0  # items waiting (not yet started)
+        self._unfinished = 0  # items waiting or running
+        self._idle = None
+        self._tasks = []
+        self._executor = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def qsize(self) -> int:
+        return self._size
+
+    async def start(self):
+        """
+        Spawns the consumers on the running loop.
+        """
+        if self.running:
+            return
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        self._tasks = [
+            asyncio.create_task(self._consume(i), name=f"{self.name}-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Worker pool '{self.name}' started with {self.workers} workers (queue size {self.queue_size})")
+
+    def submit(self, item, key=None) -> bool:
+        """
+        Enqueues an item without waiting. Items without a key have no ordering constraint.
+        Returns False if the pool is not running or the queue is full.
+        """
+        return self.submit_many([(key, item)])
+
+    def submit_many(self, keyed_items: list) -> bool:
+        """
+        Enqueues a list of (key, item) pairs, all or nothing.
+        Returns False (and enqueues nothing) if the pool or any key's queue
+        lacks room, so a rejected webhook batch can be redelivered without duplicates.
+        Must be called from the pool's event loop.
+        """
+        if not self.running:
+            logger.error(f"Worker pool '{self.name}' is not running, dropping {len(keyed_items)} items")
+            return False
+
+        if self._size + len(keyed_items) > self.queue_size:
+            self.rejected += len(keyed_items)
+            logger.warning(f"Worker pool '{self.name}' is full, rejecting {len(keyed_items)} items")
+            return False
+
+        needed = {}
+        for key, _ in keyed_items:
+            if key is not None:
+                needed[key] = needed.get(key, 0) + 1
+        for key, count in needed.items():
+            if len(self._pending.get(key, ())) + count > self.key_depth:
+                self.rejected += len(keyed_items)
+                logger.warning(f"Worker pool '{self.name}' queue for {key} is full, rejecting {len(keyed_items)} items")
+                return False
+
+        for key, item in keyed_items:
+            if key is None:
+                key = object()  # a key of its own
+            items = self._pending.get(key)
+            if items is None:
+                items = self._pending[key] = deque()
+                self._ready.put_nowait(key)
+            items.append(item)
+            self._size += 1
+            self._unfinished += 1
+        self._idle.clear()
+        return True
+
+    async def join(self):
+        """
+        Waits until every queued item has been processed.
+        """
+        if self._idle:
+            await self._idle.wait()
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Drains the queues (up to `timeout` seconds) and stops the consumers.
+        """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Worker pool '{self.name}' stopped with {self.qsize()} items still queued")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False)
+        logger.info(f"Worker pool '{self.name}' stopped")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._size,
+            "keys": len(self._pending),
+            "processed": self.processed,
+            "rejected": self.rejected,
+        }
+
+    async def _consume(self, index: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            key = await self._ready.get()
+            items = self._pending[key]
+            item = items.popleft()
+            self._size -= 1
+            try:
+                await loop.run_in_executor(self._executor, self.handler, item)
+            except Exception as e:
+                logger.error(f"Worker {index} of '{self.name}' failed to process item: {e}")
+            finally:
+                self.processed += 1
+                if items:
+                    # Back of the line, so one busy user can't starve the others
+                    self._ready.put_nowait(key)
+                else:
+                    del self._pending[key]
+                self._unfinished -= 1
+                if self._unfinished == 0:
+                    self._idle.set()
@@ -0,0 +1,177 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import ai
+from services import inventory
+
+ITEMS = [{"id": 1, "name": "Rohu", "price": 250, "is_available": True}]
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        inventory._snapshot = None
+        self.registry = ai.ModelRegistry()
+        self.db_patch = patch('db.get_inventory', return_value=list(ITEMS))
+        self.db_patch.start()
+
+    def tearDown(self):
+        self.db_patch.stop()
+
+    def test_models_reused_per_key(self):
+        with patch('google.generativeai.GenerativeModel', side_effect=lambda **kw: MagicMock(**kw)) as build:
+            a = self.registry.get(has_address=True)
+            b = self.registry.get(has_address=True)
+            c = self.registry.get(has_address=False)
+
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+        self.assertEqual(build.call_count, 2)
+        self.assertEqual(self.registry.stats(), {"hits": 1, "misses": 2, "models": 2})
+
+    def test_inventory_change_rebuilds(self):
+        with patch('google.generativeai.GenerativeModel', side_effect=lambda **kw: MagicMock(**kw)) as build:
+            self.registry.get(has_address=False)
+            inventory.invalidate()
+            self.registry.get(has_address=False)
+
+        self.assertEqual(build.call_count, 2)
+        # Models for the old inventory version are dropped
+        self.assertEqual(self.registry.stats()["models"], 1)
+
+    def test_instruction_has_prices_not_address(self):
+        instruction = ai.get_system_instruction(has_address=True, price_list="- Rohu: ₹250/kg\n")
+        self.assertIn("- Rohu: ₹250/kg", instruction)
+        self.assertIn(ai.ADDRESS_KNOWN, instruction)
+        self.assertNotIn(ai.ADDRESS_UNKNOWN, instruction)
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def text_response(text, tokens=120):
+    part = MagicMock()
+    part.function_call = None
+    response = MagicMock(text=text)
+    response.candidates[0].content.parts = [part]
+    response.usage_metadata.total_token_count = tokens
+    return response
+
+class TestResponseCache(unittest.TestCase):
+    def test_lru_ttl_and_version(self):
+        clock = Clock()
+        cache = ai.ResponseCache(max_size=2, ttl=10, clock=clock)
+        key = cache.key("Aaj ka rate?", "Hinglish", 1)
+        self.assertEqual(key, cache.key("aaj ka  RATE", "Hinglish", 1))
+
+        cache.put(key, "reply", tokens=100)
+        self.assertEqual(cache.get(key), "reply")
+        cache.put(cache.key("b", "English", 1), "b")
+        cache.get(key)
+        cache.put(cache.key("c", "English", 1), "c")
+        # "b" was least recently used
+        self.assertIsNone(cache.get(cache.key("b", "English", 1)))
+
+        clock.now = 11
+        self.assertIsNone(cache.get(key))
+
+        cache.put(cache.key("d", "English", 1), "d")
+        cache.put(cache.key("d", "English", 2), "d2")
+        self.assertEqual(cache.stats()["size"], 1)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["saved_tokens"]), (2, 2, 200))
+
+    def test_generate_response_uses_cache(self):
+        model = MagicMock()
+        model.generate_content.return_value = text_response("We have fresh Rohu today.")
+
+        with patch.object(ai, 'GEMINI_API_KEY', 'key'), \
+             patch.object(ai, 'response_cache', ai.ResponseCache(max_size=10)) as cache, \
+             patch.object(ai.model_registry, 'get', return_value=model), \
+             patch('services.inventory.current_version', return_value=3):
+            first = ai.generate_response("prompt", user_phone="111", cache_text="which fish is good for curry", language="English")
+            second = ai.generate_response("prompt", user_phone="222", cache_text="Which fish is good for curry?", language="English")
+            # Personal turns are never cached
+            ai.generate_response("prompt", user_phone="333", user_address="Gariahat", cache_text="which fish is good for curry", language="English")
+
+        self.assertEqual(first, second)
+        self.assertEqual(model.generate_content.call_count, 2)
+        self.assertEqual(cache.stats()["saved_calls"], 1)
+
+    def test_order_calls_are_not_cached(self):
+        part = MagicMock()
+        part.function_call.name = "place_order"
+        part.function_call.args = {"items": [], "address": "Gariahat"}
+        response = MagicMock()
+        response.candidates[0].content.parts = [part]
+        model = MagicMock()
+        model.generate_content.return_value = response
+
+        with patch.object(ai, 'GEMINI_API_KEY', 'key'), \
+             patch.object(ai, 'response_cache', ai.ResponseCache(max_size=10)) as cache, \
+             patch.object(ai.model_registry, 'get', return_value=model), \
+             patch('services.inventory.current_version', return_value=3), \
+             patch('db.create_order', return_value={"order_id": 1, "total_price": 0}), \
+             patch('services.user_context.invalidate'):
+            ai.generate_response("prompt", user_phone="111", cache_text="place it", language="English")
+
+        self.assertEqual(cache.stats()["size"], 0)
+
+class TestShareableTurns(unittest.TestCase):
+    def test_only_general_questions_are_shared(self):
+        import brain
+        from services import intents
+        from services.user_context import UserContext
+
+        cases = [
+            (UserContext("111", {"language": "English"}), "which fish is best for curry", True),
+            (UserContext("111", {"language": "English", "address": "Gariahat"}), "which fish is best for curry", False),
+            (UserContext("111", {"conversation_state": "AWAITING_ADDRESS"}), "which fish is best for curry", False),
+            (UserContext("111", {}), "and katla?", False),
+            (UserContext("111", {}), "2 kg rohu", False),
+        ]
+        for ctx, message, shared in cases:
+            with patch('services.intents.route', return_value=None), \
+                 patch('services.ai.generate_response', return_value="ok") as llm:
+                brain.generate_response("111", message, context=ctx)
+            self.assertEqual(llm.call_args.kwargs["cache_text"], message if shared else None, message)
+
+    def test_replies_to_the_bot_keep_history(self):
+        import brain
+        from services.user_context import UserContext
+
+        history = [
+            {"role": "user", "content": "2 kg rohu"},
+            {"role": "assistant", "content": "Sure! Where should we deliver it?"},
+            {"role": "user", "content": "Salt Lake sector five near City Centre"},
+        ]
+        ctx = UserContext("111", {"language": "English"}, history)
+        with patch('services.intents.route', return_value=None), \
+             patch('services.ai.generate_response', return_value="ok") as llm:
+            brain.generate_response("111", "Salt Lake sector five near City Centre", context=ctx)
+
+        self.assertIsNone(llm.call_args.kwargs["cache_text"])
+        self.assertIn("Assistant: Sure! Where should we deliver it?", llm.call_args.args[0])
+
+    def test_nothing_is_shared_without_the_cache(self):
+        import brain
+        from services.user_context import UserContext
+
+        ctx = UserContext("111", {"language": "English"}, [{"role": "user", "content": "which fish is best for curry"}])
+        with patch.object(ai, 'response_cache', ai.ResponseCache(max_size=0)), \
+             patch('services.intents.route', return_value=None), \
+             patch('services.ai.generate_response', return_value="ok") as llm:
+            brain.generate_response("111", "which fish is best for curry", context=ctx)
+
+        self.assertIsNone(llm.call_args.kwargs["cache_text"])
+        self.assertIn("User: which fish is best for curry\n", llm.call_args.args[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+import asyncio
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from bench.webhook_bench import BenchConfig, run, format_report, percentile
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual((percentile(values, 50), percentile(values, 99), percentile([], 95)), (50, 99, 0.0))
+
+    def test_short_run(self):
+        saved = db.supabase
+        config = BenchConfig(rate=200, duration=0.3, users=10, gemini_latency=0, graph_latency=0, workers=2)
+        report = asyncio.run(run(config))
+
+        self.assertEqual(report["status_codes"], {200: report["webhooks"]})
+        self.assertEqual(report["unanswered"], 0)
+        self.assertEqual(report["reply_ms"]["count"], report["messages"]["messages"])
+        self.assertGreater(report["per_message"]["db_calls"], 0)
+        self.assertIn("Per message", format_report(report))
+        # Everything it patched is restored
+        self.assertIs(db.supabase, saved)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import unittest
+import asyncio
+import time
+import sys
+import os
+from unittest.mock import patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import broadcast
+from services.graph_client import GraphAPIError
+
+class FakeAsyncClient:
+    """
+    Records sends; phones listed in `fail` raise the given error a number of times.
+    """
+
+    def __init__(self, fail=None):
+        self.fail = dict(fail or {})
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def post_message(self, payload):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            phone = payload["to"]
+            if phone in self.fail:
+                error, times = self.fail[phone]
+                if times:
+                    self.fail[phone] = (error, times - 1)
+                    raise error
+            self.sent.append(phone)
+            return f"wamid.{phone}"
+        finally:
+            self.in_flight -= 1
+
+async def recipients(n):
+    for i in range(n):
+        yield {"phone": f"91{i:08d}"}
+
+def payload(user):
+    return {"to": user["phone"]}
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate_is_enforced(self):
+        async def run():
+            bucket = broadcast.TokenBucket(rate=100, capacity=1)
+            start = time.monotonic()
+            for _ in range(11):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        # 1 token up front, then 10 more at 100/sec
+        self.assertGreaterEqual(asyncio.run(run()), 0.09)
+
+class TestRunBroadcast(unittest.TestCase):
+    def test_sends_to_everyone_concurrently(self):
+        client = FakeAsyncClient()
+        results = []
+
+        async def on_result(user, wamid, error):
+            results.append((user["phone"], wamid))
+
+        report = asyncio.run(broadcast.run_broadcast(
+            "test", payload, recipients=recipients(50), on_result=on_result,
+            client=client, rate=10000, concurrency=8
+        ))
+
+        self.assertEqual(report.total, 50)
+        self.assertEqual(report.sent, 50)
+        self.assertEqual(report.failed, 0)
+        self.assertEqual(len(set(client.sent)), 50)
+        self.assertGreater(client.max_in_flight, 1)
+        self.assertLessEqual(client.max_in_flight, 8)
+        self.assertEqual(len(results), 50)
+
+    def test_transient_failures_are_retried(self):
+        client = FakeAsyncClient(fail={
+            "9100000001": (GraphAPIError("busy", status_code=429, retryable=True), 1),
+            "9100000002": (GraphAPIError("bad number", status_code=400), 1),
+        })
+
+        with patch('services.broadcast.retry_delay', return_value=0):
+            report = asyncio.run(broadcast.run_broadcast(
+                "test", payload, recipients=recipients(5), client=client, rate=10000, concurrency=2
+            ))
+
+        self.assertEqual(report.sent, 4)
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(report.retried, 1)
+        self.assertEqual(report.errors, {"400": 1})
+
+    def test_skipped_recipients_not_counted(self):
+        client = FakeAsyncClient()
+        report = asyncio.run(broadcast.run_broadcast(
+            "test", lambda user: None, recipients=recipients(3), client=client, rate=10000
+        ))
+        self.assertEqual(report.total, 0)
+        self.assertEqual(client.sent, [])
+
+    def test_recipients_streamed_in_pages(self):
+        pages = {None: [{"phone": "1"}, {"phone": "2"}], "2": [{"phone": "3"}]}
+
+        async def collect():
+            return [u["phone"] async for u in broadcast.iter_opt_in_recipients(page_size=2)]
+
+        with patch('db.get_opt_in_users_page', side_effect=lambda after, limit: pages[after]) as fetch:
+            self.assertEqual(asyncio.run(collect()), ["1", "2", "3"])
+        self.assertEqual(fetch.call_count, 2)
+
+class FakeJobStore:
+    """
+    In-memory stand-in for the broadcast_jobs / broadcast_recipients tables.
+    """
+
+    def __init__(self, users, job=None):
+        self.users = sorted(users, key=lambda u: u["phone"])
+        self.job = job or {"id": 1, "job_key": "morning_broadcast:2026-10-18", "status": "running", "cursor": None, "sent": 0, "failed": 0}
+        self.ledger = {}
+        self.job_updates = []
+
+    def patches(self):
+        return [
+            patch('db.get_or_create_broadcast_job', side_effect=lambda key, name: dict(self.job)),
+            patch('db.get_opt_in_users_page', side_effect=self.page),
+            patch('db.get_broadcast_ledger', side_effect=lambda job_id, phones: {p: self.ledger[p] for p in phones if p in self.ledger}),
+            patch('db.record_broadcast_recipient', side_effect=self.record),
+            patch('db.update_broadcast_job', side_effect=self.update),
+        ]
+
+    def page(self, after_phone, limit):
+        rows = [u for u in self.users if after_phone is None or u["phone"] > after_phone]
+        return rows[:limit]
+
+    def record(self, job_id, phone, status, whatsapp_message_id=None, error=None):
+        self.ledger[phone] = status
+
+    def update(self, job_id, fields):
+        self.job_updates.append(fields)
+        self.job.update(fields)
+
+    def run(self, client, **kwargs):
+        for p in self.patches():
+            p.start()
+        try:
+            return asyncio.run(broadcast.run_job(self.job["job_key"], "morning_broadcast", payload, client=client,
+                                                 rate=10000, page_size=4, **kwargs))
+        finally:
+            patch.stopall()
+
+class TestBroadcastJob(unittest.TestCase):
+    def test_job_runs_to_completion_with_checkpoints(self):
+        store = FakeJobStore([{"phone": f"91{i:08d}"} for i in range(10)])
+        client = FakeAsyncClient()
+
+        report = store.run(client, concurrency=3)
+
+        self.assertEqual(report.sent, 10)
+        self.assertEqual(store.job["status"], "completed")
+        self.assertEqual(store.job["sent"], 10)
+        self.assertEqual(store.job["cursor"], "9100000009")
+        self.assertEqual(set(store.ledger.values()), {"sent"})
+        # Cursor moved forward page by page, never past unfinished recipients
+        cursors = [u["cursor"] for u in store.job_updates if "cursor" in u]
+        self.assertEqual(cursors, sorted(cursors))
+
+    def test_resume_skips_delivered_and_in_flight(self):
+        users = [{"phone": f"91{i:08d}"} for i in range(10)]
+        store = FakeJobStore(users, job={"id": 1, "job_key": "morning_broadcast:2026-10-18", "status": "running",
+                                         "cursor": "9100000003", "sent": 4, "failed": 0})
+        store.ledger = {"9100000004": "sent", "9100000005": "sending", "9100000006": "failed"}
+        client = FakeAsyncClient()
+
+        report = store.run(client)
+
+        # 0-3 are behind the cursor, 4 was sent, 5 may have been sent; 6 failed and is retried
+        self.assertEqual(sorted(client.sent), ["9100000006", "9100000007", "9100000008", "9100000009"])
+        self.assertEqual(report.sent, 4)
+        self.assertEqual(store.job["sent"], 8)
+
+    def test_completed_job_is_not_rerun(self):
+        store = FakeJobStore([{"phone": "1"}])
+        store.job["status"] = "completed"
+        client = FakeAsyncClient()
+
+        self.assertIsNone(store.run(client))
+        self.assertEqual(client.sent, [])
+
+if __name__ == '__main__':
+    unittest.main()
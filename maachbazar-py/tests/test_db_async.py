@@ -0,0 +1,89 @@
+import unittest
+import asyncio
+import sys
+import os
+from unittest.mock import MagicMock, patch
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import db_async
+
+class FakeAsyncQuery:
+    """
+    Records the builder calls of one query; execute() is a coroutine that takes `delay` seconds.
+    """
+
+    def __init__(self, client, table):
+        self.client = client
+        self.calls = [("table", table)]
+        client.queries.append(self)
+
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+        return method
+
+    async def execute(self):
+        await asyncio.sleep(self.client.delay)
+        table = self.calls[0][1]
+        return MagicMock(data=self.client.data.get(table, []), count=len(self.client.data.get(table, [])))
+
+class FakeAsyncClient:
+    def __init__(self, data=None, delay=0.0):
+        self.data = data or {}
+        self.delay = delay
+        self.queries = []
+
+    def table(self, name):
+        return FakeAsyncQuery(self, name)
+
+class TestAsyncDataAccess(unittest.TestCase):
+    def tearDown(self):
+        db_async.set_client(None)
+
+    def test_orders_page_native(self):
+        client = FakeAsyncClient({"orders": [{"id": 12}, {"id": 11}, {"id": 10}]})
+        db_async.set_client(client)
+
+        orders, cursor = asyncio.run(db_async.get_orders_page(limit=2, before_id=13, statuses=["pending"]))
+
+        self.assertEqual((orders, cursor), ([{"id": 12}, {"id": 11}], 11))
+        self.assertIn(("lt", ("id", 13)), client.queries[0].calls)
+        self.assertIn(("limit", (3,)), client.queries[0].calls)
+
+    def test_status_update_publishes_event(self):
+        db_async.set_client(FakeAsyncClient({"orders": [{"id": 5, "status": "confirmed", "user_phone": "111"}]}))
+
+        with patch('services.events.publish') as publish:
+            result = asyncio.run(db_async.update_order_status(5, "confirmed"))
+
+        self.assertEqual(result[0]["id"], 5)
+        publish.assert_called_once_with("order_status", {"id": 5, "status": "confirmed", "user_phone": "111"})
+
+    def test_shares_db_query_builders(self):
+        client = FakeAsyncClient({"users": [{"phone": "111", "messages": [{"content": "b"}, {"content": "a"}]}]})
+        db_async.set_client(client)
+
+        user, history = asyncio.run(db_async.get_user_with_history("111", 2))
+
+        self.assertEqual(user, {"phone": "111"})
+        self.assertEqual([m["content"] for m in history], ["a", "b"])
+        # Same query the blocking client runs
+        expected = db.user_with_history_query(FakeAsyncClient(), "111", 2).calls
+        self.assertEqual(client.queries[0].calls, expected)
+
+    def test_falls_back_to_db_without_client(self):
+        with patch('db.get_inventory', return_value=[{"name": "Katla"}]), \
+             patch('db.get_opt_in_users', return_value=["111"]):
+            self.assertEqual(asyncio.run(db_async.get_inventory()), [{"name": "Katla"}])
+            # Functions without a native version are awaitable too
+            self.assertEqual(asyncio.run(db_async.get_opt_in_users()), ["111"])
+
+        with self.assertRaises(AttributeError):
+            db_async.not_a_db_function
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import asyncio
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.whatsapp import WebhookEvent
+from services.debounce import Debouncer, parse_windows
+
+def text(sender, body, msg_id=None):
+    return WebhookEvent({}, {}, "message", {"from": sender, "id": msg_id or body, "type": "text", "text": {"body": body}})
+
+def button(sender, button_id):
+    return WebhookEvent({}, {}, "message", {"from": sender, "id": button_id, "type": "interactive",
+                                            "interactive": {"type": "button_reply", "button_reply": {"id": button_id}}})
+
+class Recorder:
+    def __init__(self):
+        self.submitted = []
+        self.accept = True
+
+    def __call__(self, keyed_events):
+        if not self.accept:
+            return False
+        self.submitted.extend(keyed_events)
+        return True
+
+def bodies(submitted):
+    return [(key, event.item.get("text", {}).get("body") or event.item["id"]) for key, event in submitted]
+
+class TestDebounce(unittest.TestCase):
+    def test_parse_windows(self):
+        self.assertEqual(parse_windows("600,AWAITING_ADDRESS:0"), (0.6, {"AWAITING_ADDRESS": 0.0}))
+        self.assertEqual(parse_windows("0"), (0.0, {}))
+        self.assertEqual(parse_windows("abc,300"), (0.3, {}))
+
+    def test_burst_becomes_one_turn(self):
+        recorder = Recorder()
+
+        async def run():
+            debouncer = Debouncer(recorder, spec="50")
+            for body in ("rohu", "2 kg", "and katla 1kg"):
+                self.assertTrue(debouncer.submit_batch([("111", text("111", body))]))
+                await asyncio.sleep(0.01)
+            self.assertTrue(debouncer.submit_batch([("222", text("222", "hi"))]))
+            self.assertEqual(recorder.submitted, [])
+            await asyncio.sleep(0.1)
+            return debouncer.stats()
+
+        stats = asyncio.run(run())
+        self.assertEqual(sorted(bodies(recorder.submitted)), [("111", "rohu\n2 kg\nand katla 1kg"), ("222", "hi")])
+        merged = dict(recorder.submitted)["111"].item
+        self.assertEqual(merged["merged_ids"], ["rohu", "2 kg", "and katla 1kg"])
+        self.assertEqual(stats["saved"], 2)
+
+    def test_non_text_flushes_held_messages_first(self):
+        recorder = Recorder()
+
+        async def run():
+            debouncer = Debouncer(recorder, spec="1000")
+            debouncer.submit_batch([("111", text("111", "2 kg rohu"))])
+            debouncer.submit_batch([("111", text("111", "and katla")), ("111", button("111", "confirm_order")),
+                                    ("111", text("111", "thanks"))])
+            self.assertEqual(debouncer.stats()["waiting"], 1)  # "thanks" is held again
+            debouncer.flush_all()
+
+        asyncio.run(run())
+        self.assertEqual(bodies(recorder.submitted), [("111", "2 kg rohu\nand katla"), ("111", "confirm_order"),
+                                                      ("111", "thanks")])
+
+    def test_refused_batch_changes_nothing(self):
+        recorder = Recorder()
+
+        async def run():
+            debouncer = Debouncer(recorder, spec="1000")
+            debouncer.submit_batch([("111", text("111", "2 kg rohu"))])
+
+            # Queue full: neither the held text nor the button go ahead of each other
+            recorder.accept = False
+            self.assertFalse(debouncer.submit_batch([("111", text("111", "katla")), ("111", button("111", "confirm_order"))]))
+            self.assertEqual(recorder.submitted, [])
+
+            # Meta redelivers the same batch
+            recorder.accept = True
+            self.assertTrue(debouncer.submit_batch([("111", text("111", "katla")), ("111", button("111", "confirm_order"))]))
+            return debouncer.stats()
+
+        stats = asyncio.run(run())
+        self.assertEqual(bodies(recorder.submitted), [("111", "2 kg rohu\nkatla"), ("111", "confirm_order")])
+        self.assertEqual((stats["held"], stats["turns"], stats["waiting"]), (2, 1, 0))
+
+    def test_window_per_conversation_state(self):
+        recorder = Recorder()
+        states = {"111": "AWAITING_ADDRESS"}
+
+        async def run():
+            debouncer = Debouncer(recorder, spec="1000,AWAITING_ADDRESS:0", state_of=states.get)
+            debouncer.submit_batch([("111", text("111", "12 Gariahat Rd")), ("222", text("222", "rohu"))])
+            # The address goes straight through; the other user's text is held
+            self.assertEqual(bodies(recorder.submitted), [("111", "12 Gariahat Rd")])
+            debouncer.flush_all()
+
+        asyncio.run(run())
+        self.assertEqual(bodies(recorder.submitted), [("111", "12 Gariahat Rd"), ("222", "rohu")])
+
+    def test_max_wait_caps_delay(self):
+        recorder = Recorder()
+
+        async def run():
+            debouncer = Debouncer(recorder, spec="80", max_wait=0.1)
+            for i in range(6):
+                debouncer.submit_batch([("111", text("111", f"part {i}"))])
+                await asyncio.sleep(0.03)
+            await asyncio.sleep(0.15)
+
+        asyncio.run(run())
+        # Without the cap this would still be one open window
+        self.assertGreaterEqual(len(recorder.submitted), 2)
+
+    def test_disabled_by_default(self):
+        recorder = Recorder()
+
+        async def run():
+            return Debouncer(recorder, spec="0").submit_batch([("111", text("111", "rohu"))])
+
+        self.assertTrue(asyncio.run(run()))
+        self.assertEqual(bodies(recorder.submitted), [("111", "rohu")])
+
+if __name__ == '__main__':
+    unittest.main()
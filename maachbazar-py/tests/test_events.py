@@ -0,0 +1,95 @@
+import unittest
+import asyncio
+import tempfile
+import threading
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.events import EventHub, SQLiteEventHub
+
+class TestEventHub(unittest.TestCase):
+    def test_fan_out_to_every_subscriber(self):
+        async def scenario():
+            hub = EventHub()
+            first, second = hub.subscribe(), hub.subscribe()
+            # Writes happen on worker threads
+            thread = threading.Thread(target=hub.publish, args=("order_created", {"id": 1}))
+            thread.start()
+            thread.join()
+            return await asyncio.wait_for(first.queue.get(), 1), await asyncio.wait_for(second.queue.get(), 1)
+
+        a, b = asyncio.run(scenario())
+        self.assertEqual((a.id, a.type, a.data), (1, "order_created", {"id": 1}))
+        self.assertIs(a, b)
+
+    def test_replay_after_last_event_id(self):
+        async def scenario():
+            hub = EventHub(buffer_size=3)
+            for i in range(5):
+                hub.publish("order_status", {"id": i})
+            recent = hub.subscribe(last_event_id=3)
+            stale = hub.subscribe(last_event_id=1)
+            fresh = hub.subscribe()
+            return recent, stale, fresh
+
+        recent, stale, fresh = asyncio.run(scenario())
+        self.assertEqual([e.id for e in recent.replay], [4, 5])
+        self.assertFalse(recent.missed)
+        # Event 2 fell out of the buffer: the client must re-fetch
+        self.assertTrue(stale.missed)
+        self.assertEqual(fresh.replay, [])
+
+    def test_slow_subscriber_is_closed(self):
+        async def scenario():
+            hub = EventHub(queue_size=2)
+            slow = hub.subscribe()
+            for i in range(5):
+                hub.publish("order_created", {"id": i})
+            await asyncio.sleep(0)
+            items = []
+            while not slow.queue.empty():
+                items.append(slow.queue.get_nowait())
+            return slow, items
+
+        slow, items = asyncio.run(scenario())
+        self.assertTrue(slow.closed)
+        self.assertEqual([e.id for e in items[:-1]], [1, 2])
+        self.assertIsNone(items[-1])
+
+    def test_stop_ends_subscriptions(self):
+        async def scenario():
+            hub = EventHub()
+            subscription = hub.subscribe()
+            await hub.stop()
+            return await asyncio.wait_for(subscription.queue.get(), 1), hub.stats()
+
+        event, stats = asyncio.run(scenario())
+        self.assertIsNone(event)
+        self.assertEqual(stats["subscribers"], 0)
+
+class TestSQLiteEventHub(unittest.TestCase):
+    def test_events_cross_processes_with_shared_ids(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "events.db")
+            worker_a = SQLiteEventHub(path=path)
+            worker_b = SQLiteEventHub(path=path)
+
+            async def scenario():
+                subscription = worker_b.subscribe()
+                worker_a.publish("order_created", {"id": 7})
+                worker_b.publish("order_status", {"id": 7, "status": "confirmed"})
+                worker_b.poll()
+                worker_a.poll()
+                return [await asyncio.wait_for(subscription.queue.get(), 1) for _ in range(2)]
+
+            received = asyncio.run(scenario())
+            self.assertEqual([(e.id, e.type) for e in received], [(1, "order_created"), (2, "order_status")])
+            self.assertEqual(worker_a.stats()["last_id"], 2)
+            worker_a.close()
+            worker_b.close()
+
+if __name__ == '__main__':
+    unittest.main()
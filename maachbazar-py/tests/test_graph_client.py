@@ -0,0 +1,180 @@
+import unittest
+import asyncio
+import json
+import sys
+import os
+from unittest.mock import patch
+from http.client import RemoteDisconnected
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import graph_client
+from services.graph_client import GraphClient, AsyncGraphClient, GraphAPIError
+
+def graph_response(status_code, body, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode("utf-8")
+    response.headers.update(headers or {})
+    return response
+
+class FakeGraphAdapter(BaseAdapter):
+    """
+    Stands in for graph.facebook.com: replies with the queued responses in order
+    (or raises them, for exceptions).
+    """
+
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = list(responses)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+OK = {"messages": [{"id": "wamid.OK"}]}
+
+class TestGraphClient(unittest.TestCase):
+    def setUp(self):
+        # No real sleeping between retries
+        self.sleep_patch = patch('services.graph_client.time.sleep')
+        self.sleep = self.sleep_patch.start()
+
+    def tearDown(self):
+        self.sleep_patch.stop()
+
+    def make_client(self, responses, **kwargs):
+        adapter = FakeGraphAdapter(responses)
+        client = GraphClient(token="t", phone_number_id="123", base_url="http://fake-graph/v17.0", adapter=adapter, **kwargs)
+        return client, adapter
+
+    def test_post_message_returns_wamid(self):
+        client, adapter = self.make_client([graph_response(200, OK)])
+
+        self.assertEqual(client.post_message({"to": "1"}), "wamid.OK")
+        self.assertEqual(adapter.requests[0].url, "http://fake-graph/v17.0/123/messages")
+        self.assertEqual(adapter.requests[0].headers["Authorization"], "Bearer t")
+
+    def test_retries_rate_limit_honouring_retry_after(self):
+        client, adapter = self.make_client([
+            graph_response(429, {"error": "slow down"}, {"Retry-After": "2"}),
+            graph_response(429, {"error": "slow down"}),
+            graph_response(200, OK),
+        ])
+
+        self.assertEqual(client.post_message({"to": "1"}), "wamid.OK")
+        self.assertEqual(len(adapter.requests), 3)
+        self.assertEqual(self.sleep.call_args_list[0].args[0], 2.0)
+
+    def test_gives_up_after_max_retries(self):
+        client, adapter = self.make_client([graph_response(429, {})] * 3, max_retries=2)
+
+        with self.assertRaises(GraphAPIError) as ctx:
+            client.post_message({"to": "1"})
+        self.assertTrue(ctx.exception.retryable)
+        self.assertEqual(len(adapter.requests), 3)
+
+    def test_client_errors_are_not_retried(self):
+        client, adapter = self.make_client([graph_response(400, {"error": "bad template"})])
+
+        with self.assertRaises(GraphAPIError) as ctx:
+            client.post_message({"to": "1"})
+        self.assertFalse(ctx.exception.retryable)
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(len(adapter.requests), 1)
+
+    def test_maybe_delivered_failures_are_not_resent(self):
+        # Meta may have accepted the message before a 5xx or a read timeout
+        client, adapter = self.make_client([graph_response(503, {"error": "unavailable"})])
+        with self.assertRaises(GraphAPIError) as ctx:
+            client.post_message({"to": "1"})
+        self.assertFalse(ctx.exception.retryable)
+        self.assertEqual(len(adapter.requests), 1)
+
+        for failure in (requests.exceptions.ReadTimeout("slow"),
+                        # Stale keep-alive connection dropped after the body was sent
+                        requests.exceptions.ConnectionError(
+                            ProtocolError("Connection aborted.", RemoteDisconnected("closed")))):
+            client, adapter = self.make_client([failure, graph_response(200, OK)])
+            with self.assertRaises(GraphAPIError) as ctx:
+                client.post_message({"to": "1"})
+            self.assertFalse(ctx.exception.retryable)
+            self.assertEqual(len(adapter.requests), 1)
+
+    def test_unsent_failures_are_retried(self):
+        refused = NewConnectionError(None, "Connection refused")
+        client, adapter = self.make_client([
+            requests.exceptions.ConnectionError(MaxRetryError(None, "/messages", reason=refused)),
+            requests.exceptions.ConnectTimeout("connect timed out"),
+            graph_response(200, OK),
+        ])
+        self.assertEqual(client.post_message({"to": "1"}), "wamid.OK")
+        self.assertEqual(len(adapter.requests), 3)
+
+    def test_retry_delay_uses_usage_header(self):
+        header = json.dumps({"123": [{"estimated_time_to_regain_access": 0.25}]})
+        self.assertEqual(graph_client.retry_delay(0, {"X-Business-Use-Case-Usage": header}), 15.0)
+        self.assertLessEqual(graph_client.retry_delay(10), graph_client.BACKOFF_CAP)
+
+    def test_send_message_uses_shared_client(self):
+        from services import whatsapp
+        client, adapter = self.make_client([graph_response(200, OK)])
+        graph_client.set_client(client)
+        try:
+            with patch.object(whatsapp, 'WHATSAPP_TOKEN', 't'), patch.object(whatsapp, 'PHONE_NUMBER_ID', '123'):
+                self.assertEqual(whatsapp.send_message("1", "hello"), "wamid.OK")
+        finally:
+            graph_client.set_client(None)
+        self.assertEqual(json.loads(adapter.requests[0].body)["text"], {"body": "hello"})
+
+    def test_typing_indicator(self):
+        from services import whatsapp
+        client, adapter = self.make_client([graph_response(200, {"success": True})])
+        graph_client.set_client(client)
+        try:
+            with patch.object(whatsapp, 'WHATSAPP_TOKEN', 't'), patch.object(whatsapp, 'PHONE_NUMBER_ID', '123'):
+                self.assertTrue(whatsapp.send_typing_indicator("wamid.IN"))
+        finally:
+            graph_client.set_client(None)
+        body = json.loads(adapter.requests[0].body)
+        self.assertEqual((body["status"], body["message_id"]), ("read", "wamid.IN"))
+
+class TestAsyncGraphClient(unittest.TestCase):
+    def test_async_retry_then_success(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, json={"error": "slow down"}, headers={"Retry-After": "0"})
+            return httpx.Response(200, json=OK)
+
+        async def run():
+            client = AsyncGraphClient(token="t", phone_number_id="123", base_url="http://fake-graph/v17.0",
+                                      transport=httpx.MockTransport(handler))
+            try:
+                return await client.post_message({"to": "1"})
+            finally:
+                await client.close()
+
+        self.assertEqual(asyncio.run(run()), "wamid.OK")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(str(calls[0].url), "http://fake-graph/v17.0/123/messages")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import intents
+from services.inventory import InventorySnapshot
+
+SNAPSHOT = InventorySnapshot([
+    {"id": 1, "name": "Rohu", "price": 250, "is_available": True},
+    {"id": 2, "name": "Katla", "price": 300, "is_available": True},
+    {"id": 3, "name": "Ilish", "price": 1200, "is_available": False},
+], version=1)
+
+class TestIntentRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = intents.IntentRouter()
+
+    def classify(self, text):
+        return self.router.classify(text, SNAPSHOT)
+
+    def test_common_intents(self):
+        self.assertEqual(self.classify("Hi!"), ("greeting", None))
+        self.assertEqual(self.classify("নমস্কার"), ("greeting", None))
+        self.assertEqual(self.classify("price list"), ("price_list", None))
+        self.assertEqual(self.classify("aaj ki ache?"), ("price_list", None))
+        self.assertEqual(self.classify("আজকের দাম"), ("price_list", None))
+        self.assertEqual(self.classify("Thank you"), ("thanks", None))
+        self.assertEqual(self.classify("Bangla"), ("language", "Bangla"))
+
+    def test_fish_names_are_fuzzy_and_multilingual(self):
+        self.assertEqual(self.classify("rohu koto?"), ("fish_price", "Rohu"))
+        self.assertEqual(self.classify("rui er dam"), ("fish_price", "Rohu"))
+        self.assertEqual(self.classify("rohuu price"), ("fish_price", "Rohu"))
+        self.assertEqual(self.classify("কাতলা কত"), ("fish_price", "Katla"))
+        self.assertEqual(self.classify("hilsa rate"), ("fish_price", "Ilish"))
+
+    def test_aliases_follow_inventory_names(self):
+        snapshot = InventorySnapshot([
+            {"id": 1, "name": "Hilsa", "price": 1400, "is_available": True},
+            {"id": 2, "name": "Catla", "price": 320, "is_available": True},
+        ], version=2)
+        for text in ("hilsa rate", "ilish koto", "ইলিশ দাম"):
+            self.assertEqual(self.router.classify(text, snapshot), ("fish_price", "Hilsa"), text)
+        for text in ("catla price", "katla koto"):
+            self.assertEqual(self.router.classify(text, snapshot), ("fish_price", "Catla"), text)
+        self.assertEqual(self.router.route("katla", "English", snapshot).reply,
+                         "Catla is ₹320/kg today. How much would you like?")
+
+        # Not stocked under any name: the LLM answers instead of "not available"
+        self.assertEqual(self.router.classify("pabda price", snapshot), (None, None))
+        self.assertIsNone(self.router.route("rui er dam", "English", snapshot))
+
+    def test_ordering_goes_to_llm(self):
+        for text in ("confirm", "Yes", "2 kg rohu", "rohu lagbe", "১ কেজি রুই", "rohu and katla price",
+                     "can you deliver to my new flat near the lake tomorrow morning"):
+            self.assertEqual(self.classify(text), (None, None), text)
+
+    def test_route_renders_in_user_language(self):
+        route = self.router.route("rohu koto", "Hinglish", SNAPSHOT)
+        self.assertEqual(route.reply, "Aaj Rohu ₹250/kg hai. Kitna chahiye?")
+
+        route = self.router.route("price", "Bangla", SNAPSHOT)
+        self.assertIn("Rohu: ₹250/kg", route.reply)
+        self.assertTrue(route.reply.startswith("আজকের দাম"))
+
+        route = self.router.route("ilish", "English", SNAPSHOT)
+        self.assertEqual(route.intent, "fish_unavailable")
+
+        route = self.router.route("hindi", "English", SNAPSHOT)
+        self.assertEqual(route.language, "Hinglish")
+
+    def test_counters(self):
+        self.router.route("hi", "English", SNAPSHOT)
+        self.router.route("price", "English", SNAPSHOT)
+        self.assertIsNone(self.router.route("2 kg rohu please", "English", SNAPSHOT))
+
+        stats = self.router.stats()
+        self.assertEqual(stats["handled"], 2)
+        self.assertEqual(stats["escalated"], 1)
+        self.assertEqual(stats["intents"], {"greeting": 1, "price_list": 1})
+
+    def test_asks_for_confirmation(self):
+        self.assertTrue(intents.asks_for_confirmation("Total: ₹500. Do you want to confirm this order?"))
+        self.assertTrue(intents.asks_for_confirmation("Mot ₹500. Order confirm korben?"))
+        # Mentions confirming, but doesn't ask
+        self.assertFalse(intents.asks_for_confirmation("Your order is confirmed. Need anything else?"))
+        self.assertFalse(intents.asks_for_confirmation("Please confirm your address."))
+
+class TestBrainFastPath(unittest.TestCase):
+    def test_price_question_skips_llm(self):
+        import brain
+        from services.user_context import UserContext
+
+        ctx = UserContext("111", {"language": "English"})
+        with patch('services.inventory.get_snapshot', return_value=SNAPSHOT), \
+             patch('services.ai.generate_response') as llm:
+            reply = brain.generate_response("111", "price list", context=ctx)
+
+        llm.assert_not_called()
+        self.assertIn("Katla: ₹300/kg", reply)
+
+if __name__ == '__main__':
+    unittest.main()
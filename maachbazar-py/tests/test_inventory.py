@@ -0,0 +1,84 @@
+import unittest
+import asyncio
+import threading
+from unittest.mock import patch
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import inventory
+
+ITEMS = [
+    {"id": 1, "name": "Rohu", "price": 250, "is_available": True},
+    {"id": 2, "name": "Katla", "price": 300, "is_available": True},
+    {"id": 3, "name": "Hilsa", "price": 1200, "is_available": False},
+]
+
+class TestInventorySnapshot(unittest.TestCase):
+    def setUp(self):
+        inventory._snapshot = None
+
+    def test_derived_views(self):
+        snapshot = inventory.InventorySnapshot(ITEMS, version=1)
+
+        self.assertEqual([i["name"] for i in snapshot.available], ["Rohu", "Katla"])
+        self.assertEqual(snapshot.prices, {"Rohu": 250, "Katla": 300})
+        self.assertEqual(snapshot.price_list, "- Rohu: ₹250/kg\n- Katla: ₹300/kg\n")
+        self.assertEqual(snapshot.price_string, "Rohu: 250/kg, Katla: 300/kg")
+        self.assertEqual(snapshot.stock_list, "Rohu, Katla")
+
+    def test_empty_inventory(self):
+        snapshot = inventory.InventorySnapshot([], version=1)
+        self.assertEqual(snapshot.stock_list, "fresh fish")
+        self.assertIn("unavailable", snapshot.price_list)
+
+    def test_snapshot_is_cached(self):
+        with patch('db.get_inventory', return_value=list(ITEMS)) as fetch:
+            first = inventory.get_snapshot()
+            second = inventory.get_snapshot()
+
+        fetch.assert_called_once()
+        self.assertIs(first, second)
+
+    def test_invalidate_bumps_version_and_reloads(self):
+        with patch('db.get_inventory', return_value=list(ITEMS)) as fetch:
+            first = inventory.get_snapshot()
+            inventory.invalidate()
+            second = inventory.get_snapshot()
+
+        self.assertEqual(fetch.call_count, 2)
+        self.assertGreater(second.version, first.version)
+
+    def test_ttl_reload_bumps_version_only_on_change(self):
+        changed = [dict(ITEMS[0], price=260)] + ITEMS[1:]
+        with patch('db.get_inventory', side_effect=[list(ITEMS), list(ITEMS), changed]), \
+             patch.object(inventory, 'INVENTORY_TTL', -1):
+            first = inventory.get_snapshot()
+            same = inventory.get_snapshot()
+            changed_snapshot = inventory.get_snapshot()
+
+        self.assertEqual(first.version, same.version)
+        self.assertEqual(changed_snapshot.version, first.version + 1)
+        self.assertEqual(changed_snapshot.prices["Rohu"], 260)
+
+    def test_async_snapshot_reloads_off_the_event_loop(self):
+        threads = []
+
+        def fetch():
+            threads.append(threading.current_thread())
+            return list(ITEMS)
+
+        async def load_twice():
+            return await inventory.get_snapshot_async(), await inventory.get_snapshot_async()
+
+        with patch('db.get_inventory', side_effect=fetch):
+            first, second = asyncio.run(load_twice())
+
+        self.assertIs(first, second)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+if __name__ == '__main__':
+    unittest.main()
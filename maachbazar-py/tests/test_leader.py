@@ -0,0 +1,66 @@
+import unittest
+import asyncio
+import tempfile
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import leader
+
+class TestFileLock(unittest.TestCase):
+    def test_only_one_holder(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "scheduler.lock")
+            first = leader.FileLock(path)
+            second = leader.FileLock(path)
+
+            self.assertTrue(first.try_acquire())
+            self.assertFalse(second.try_acquire())
+
+            # Leader goes away -> follower can take over
+            first.release()
+            self.assertTrue(second.try_acquire())
+            second.release()
+
+class TestLeaderElector(unittest.TestCase):
+    def test_single_leader_and_failover(self):
+        elected = []
+
+        async def run():
+            workers = [
+                leader.LeaderElector(leader.LocalLock("test-failover"), on_elected=lambda i=i: elected.append(i), interval=0.01)
+                for i in range(4)
+            ]
+            for worker in workers:
+                await worker.start()
+
+            self.assertEqual([w.is_leader for w in workers], [True, False, False, False])
+
+            # Leader dies: exactly one follower takes over
+            await workers[0].stop()
+            await asyncio.sleep(0.05)
+            self.assertEqual(sum(w.is_leader for w in workers), 1)
+
+            for worker in workers:
+                await worker.stop()
+
+        asyncio.run(run())
+        self.assertEqual(len(elected), 2)
+        self.assertEqual(elected[0], 0)
+
+    def test_demoted_callback_on_stop(self):
+        events = []
+
+        async def run():
+            elector = leader.LeaderElector(leader.LocalLock("test-demote"), on_elected=lambda: events.append("up"),
+                                           on_demoted=lambda: events.append("down"))
+            await elector.start()
+            await elector.stop()
+
+        asyncio.run(run())
+        self.assertEqual(events, ["up", "down"])
+
+if __name__ == '__main__':
+    unittest.main()
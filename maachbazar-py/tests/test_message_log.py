@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from services.message_log import MessageLogWriter
+
+class FakeInsert:
+    """
+    Stand-in for db.insert_messages that hands out sequential IDs.
+    """
+
+    def __init__(self, fail_bulk=False):
+        self.calls = []
+        self.next_id = 1
+        self.fail_bulk = fail_bulk
+
+    def __call__(self, rows):
+        self.calls.append(list(rows))
+        if self.fail_bulk and len(rows) > 1:
+            raise Exception("bulk insert failed")
+        ids = list(range(self.next_id, self.next_id + len(rows)))
+        self.next_id += len(rows)
+        return ids
+
+class TestMessageLog(unittest.TestCase):
+    def setUp(self):
+        db.supabase = MagicMock()
+        self.insert = FakeInsert()
+        # Long interval: tests flush explicitly
+        self.writer = MessageLogWriter(batch_size=50, flush_interval=60, insert=self.insert)
+
+    def tearDown(self):
+        self.writer.close()
+
+    def test_rows_are_written_in_one_batch(self):
+        futures = [self.writer.log("111", "user", f"msg {i}") for i in range(5)]
+        self.assertFalse(any(f.done() for f in futures))
+
+        self.assertEqual(self.writer.flush(), 5)
+
+        self.assertEqual(len(self.insert.calls), 1)
+        self.assertEqual([f.result() for f in futures], [1, 2, 3, 4, 5])
+        row = self.insert.calls[0][0]
+        self.assertEqual(row["user_phone"], "111")
+        self.assertIn("created_at", row)
+
+    def test_batch_size_wakes_flusher(self):
+        writer = MessageLogWriter(batch_size=3, flush_interval=60, insert=self.insert)
+        futures = [writer.log("111", "user", f"msg {i}") for i in range(3)]
+        self.assertEqual(futures[-1].result(timeout=2), 3)
+        writer.close()
+        self.assertEqual(len(self.insert.calls), 1)
+
+    def test_resolve_pending_wamid_flushes(self):
+        self.writer.log("111", "assistant", "Confirm your order?", whatsapp_message_id="wamid.A")
+
+        with patch('db.get_message_id_by_whatsapp_id') as lookup:
+            self.assertEqual(self.writer.resolve_message_id("wamid.A"), 1)
+            # Once written, lookups go back to the database
+            lookup.return_value = 1
+            self.assertEqual(self.writer.resolve_message_id("wamid.A"), 1)
+
+        lookup.assert_called_once_with("wamid.A")
+
+    def test_flush_for_only_flushes_for_that_user(self):
+        self.writer.log("222", "user", "hi")
+        self.writer.flush_for("111")
+        self.assertEqual(self.insert.calls, [])
+
+        self.writer.log("111", "user", "2 kg rohu")
+        self.writer.flush_for("111")
+        self.assertEqual(len(self.insert.calls), 1)
+        self.assertEqual(self.writer.stats()["pending"], 0)
+
+    def test_failed_bulk_insert_retries_rows_individually(self):
+        insert = FakeInsert(fail_bulk=True)
+        writer = MessageLogWriter(batch_size=50, flush_interval=60, insert=insert)
+        futures = [writer.log("111", "user", f"msg {i}") for i in range(3)]
+        writer.flush()
+
+        self.assertEqual([f.result() for f in futures], [1, 2, 3])
+        self.assertEqual(len(insert.calls), 4)
+        writer.close()
+
+    def test_close_flushes_and_falls_back_to_sync(self):
+        future = self.writer.log("111", "user", "bye")
+        self.writer.close()
+        self.assertEqual(future.result(), 1)
+
+        with patch('db.log_message', return_value=42) as log:
+            self.assertEqual(self.writer.log("111", "user", "late").result(), 42)
+        log.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
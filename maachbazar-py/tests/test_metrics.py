@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import types
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import db
+import main
+from services import metrics as metrics_module
+from services.metrics import Metrics, Histogram, NO_SPAN
+
+class TestHistogram(unittest.TestCase):
+    def test_render_is_cumulative(self):
+        histogram = Histogram("test_seconds", "Test.", ("span",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, "db")
+        histogram.observe(0.5, "db")
+        histogram.observe(3, "db")
+
+        lines = histogram.render()
+        self.assertEqual(lines[:2], ["# HELP test_seconds Test.", "# TYPE test_seconds histogram"])
+        self.assertIn('test_seconds_bucket{span="db",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{span="db",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{span="db",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_sum{span="db"} 3.55', lines)
+        self.assertIn('test_seconds_count{span="db"} 3', lines)
+
+    def test_bucket_bound_is_inclusive(self):
+        histogram = Histogram("calls", "Calls.", buckets=(0, 1))
+        histogram.observe(0)
+        histogram.observe(1)
+        self.assertIn('calls_bucket{le="0"} 1', histogram.render())
+        self.assertIn('calls_bucket{le="1"} 2', histogram.render())
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics(enabled=True)
+
+    def test_span_records_errors_by_type(self):
+        with self.metrics.span("db", "get_inventory"):
+            pass
+        with self.assertRaises(ValueError):
+            with self.metrics.span("db", "get_inventory"):
+                raise ValueError("boom")
+
+        self.assertEqual(self.metrics.spans.count("db", "get_inventory"), 2)
+        self.assertEqual(self.metrics.errors.value("db", "get_inventory", "ValueError"), 1)
+        self.assertIn('maachbazar_span_errors_total{span="db",name="get_inventory",type="ValueError"} 1',
+                      self.metrics.render())
+
+    def test_calls_per_message(self):
+        @self.metrics.timed("db")
+        def fetch():
+            return 1
+
+        with self.metrics.message("text"):
+            fetch()
+            fetch()
+            with self.metrics.span("gemini", "generate_content"):
+                pass
+        fetch()  # outside any message: timed, not counted
+
+        self.assertEqual(self.metrics.spans.count("db", "fetch"), 3)
+        self.assertEqual(self.metrics.messages.value("text"), 1)
+        output = self.metrics.render()
+        self.assertIn('maachbazar_calls_per_message_bucket{span="db",le="1"} 0', output)
+        self.assertIn('maachbazar_calls_per_message_bucket{span="db",le="2"} 1', output)
+        self.assertIn('maachbazar_calls_per_message_sum{span="gemini"} 1', output)
+        self.assertIn('maachbazar_calls_per_message_sum{span="whatsapp_send"} 0', output)
+
+    def test_instrument_wraps_module_functions_only(self):
+        module = types.ModuleType("fake_db")
+        exec("import json\ndef get_user(phone): return phone\ndef message_row(x): return x\ndef _private(): pass",
+             module.__dict__)
+        original_row = module.message_row
+
+        self.metrics.instrument(module.__dict__, "db", exclude=("message_row",))
+
+        self.assertEqual(module.get_user("111"), "111")
+        self.assertEqual(self.metrics.spans.count("db", "get_user"), 1)
+        self.assertIs(module.message_row, original_row)
+        self.assertFalse(hasattr(module.json.dumps, "__wrapped__"))
+
+    def test_tokens(self):
+        self.metrics.add_tokens(600)
+        self.metrics.add_tokens(None)
+        self.assertIn("maachbazar_gemini_tokens_total 600", self.metrics.render())
+
+    def test_disabled_is_a_no_op(self):
+        disabled = Metrics(enabled=False)
+
+        def fetch():
+            return 1
+
+        self.assertIs(disabled.timed("db")(fetch), fetch)
+        self.assertIs(disabled.span("db", "fetch"), NO_SPAN)
+        self.assertIs(disabled.message("text"), NO_SPAN)
+        namespace = {"__name__": "fake", "fetch": fetch}
+        disabled.instrument(namespace, "db")
+        self.assertIs(namespace["fetch"], fetch)
+
+class TestInstrumentedPaths(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics(enabled=True)
+
+    @unittest.skipUnless(metrics_module.METRICS_ENABLED, "METRICS=off")
+    def test_db_calls_are_timed(self):
+        # db.py was instrumented at import with the module-level registry
+        self.assertTrue(hasattr(db.get_inventory, "__wrapped__"))
+        self.assertFalse(hasattr(db.message_row, "__wrapped__"))
+        before = metrics_module.metrics.spans.count("db", "get_inventory")
+        with patch.object(db, "supabase", MagicMock()):
+            db.get_inventory()
+        self.assertEqual(metrics_module.metrics.spans.count("db", "get_inventory"), before + 1)
+
+    def test_endpoint(self):
+        client = TestClient(main.app)
+        with patch.object(main, "metrics", self.metrics):
+            with self.metrics.span("verify_signature"):
+                pass
+            response = client.get("/metrics")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+            self.assertIn('maachbazar_span_seconds_count{span="verify_signature",name=""} 1', response.text)
+
+            self.metrics.enabled = False
+            self.assertEqual(client.get("/metrics").status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
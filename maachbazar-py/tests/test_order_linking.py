@@ -32,36 +32,38 @@ class TestOrderLinking(unittest.TestCase):
         self.assertFalse(exists)
 
     def test_create_order_with_message_id(self):
-        # Mock check_order_exists to return False
-        with patch('db.check_order_exists', return_value=False):
-            # Mock insert response
-            self.mock_supabase.table.return_value.insert.return_value.execute.return_value.data = [{'id': 101}]
-            
-            items = [{'fish_name': 'Rohu', 'quantity': 1, 'price_per_kg': 200}]
-            result = db.create_order("1234567890", items, "Test Address", message_id=555)
-            
-            self.assertEqual(result['status'], 'success')
-            self.assertEqual(result['order_id'], 101)
-            
-            # Verify message status update was called
-            # We expect multiple table calls: orders, order_items, messages
-            # Check specifically for messages update
-            # The calls are chained: table("messages").update(...).eq(...).execute()
-            
-            # We can check if table was called with "messages"
-            self.mock_supabase.table.assert_any_call("messages")
-            
-            # More specific check is hard with chained mocks without complex setup, 
-            # but we can verify the flow didn't error.
+        # place_order does the whole order in one call
+        self.mock_supabase.rpc.return_value.execute.return_value.data = {
+            "duplicate": False,
+            "order": {"id": 101, "total_price": 200, "message_id": 555, "order_items": []}
+        }
+
+        items = [{'fish_name': 'Rohu', 'quantity': 1, 'price_per_kg': 200}]
+        result = db.create_order("1234567890", items, "Test Address", message_id=555)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['order_id'], 101)
+        self.assertEqual(result['order']['message_id'], 555)
+
+        self.mock_supabase.rpc.assert_called_once_with("place_order", {
+            "p_user_phone": "1234567890",
+            "p_items": items,
+            "p_address": "Test Address",
+            "p_message_id": 555,
+        })
+        self.mock_supabase.table.assert_not_called()
 
     def test_create_order_duplicate_message_id(self):
-        # Mock check_order_exists to return True
-        with patch('db.check_order_exists', return_value=True):
-            items = [{'fish_name': 'Rohu', 'quantity': 1, 'price_per_kg': 200}]
-            result = db.create_order("1234567890", items, "Test Address", message_id=555)
-            
-            self.assertIn("error", result)
-            self.assertEqual(result['error'], "Order already placed for this message")
+        # The unique_message_order constraint turned the insert into a no-op
+        self.mock_supabase.rpc.return_value.execute.return_value.data = {
+            "duplicate": True,
+            "order": {"id": 101, "total_price": 200, "message_id": 555, "order_items": []}
+        }
+        items = [{'fish_name': 'Rohu', 'quantity': 1, 'price_per_kg': 200}]
+        result = db.create_order("1234567890", items, "Test Address", message_id=555)
+
+        self.assertIn("error", result)
+        self.assertEqual(result['error'], "Order already placed for this message")
 
 if __name__ == '__main__':
     unittest.main()
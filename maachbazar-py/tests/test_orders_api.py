@@ -0,0 +1,121 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import db
+import main
+
+class FakeQuery:
+    """
+    Records query-builder calls and returns canned rows.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return call
+
+    def execute(self):
+        return MagicMock(data=self.rows)
+
+ORDERS = [{"id": i, "status": "pending", "order_items": []} for i in range(10, 0, -1)]
+
+class TestOrdersPage(unittest.TestCase):
+    def setUp(self):
+        self.mock_supabase = MagicMock()
+        db.supabase = self.mock_supabase
+
+    def test_page_with_filters(self):
+        query = FakeQuery(ORDERS[:4])
+        self.mock_supabase.table.return_value = query
+
+        orders, cursor = db.get_orders_page(limit=3, before_id=11, statuses=["pending", "confirmed"],
+                                            phone="111", date_from="2026-10-01", since="2026-10-17T00:00:00")
+
+        self.assertEqual([o["id"] for o in orders], [10, 9, 8])
+        self.assertEqual(cursor, 8)
+        calls = [(name, args) for name, args, _ in query.calls]
+        self.assertIn(("lt", ("id", 11)), calls)
+        self.assertIn(("in_", ("status", ["pending", "confirmed"])), calls)
+        self.assertIn(("eq", ("user_phone", "111")), calls)
+        self.assertIn(("gte", ("created_at", "2026-10-01")), calls)
+        self.assertIn(("gt", ("updated_at", "2026-10-17T00:00:00")), calls)
+        self.assertIn(("limit", (4,)), calls)
+
+    def test_last_page_has_no_cursor(self):
+        self.mock_supabase.table.return_value = FakeQuery(ORDERS[:2])
+        orders, cursor = db.get_orders_page(limit=3)
+        self.assertEqual(len(orders), 2)
+        self.assertIsNone(cursor)
+
+class TestOrdersEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+
+    def test_etag_and_not_modified(self):
+        with patch('db.get_orders_fingerprint', return_value="10:2026-10-18T09:00:00"), \
+             patch('db.get_orders_page', return_value=(ORDERS[:2], 9)) as fetch:
+            response = self.client.get("/api/orders?limit=2&status=pending")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["X-Next-Cursor"], "9")
+            self.assertEqual(len(response.json()), 2)
+            etag = response.headers["ETag"]
+
+            cached = self.client.get("/api/orders?limit=2&status=pending", headers={"If-None-Match": etag})
+            self.assertEqual(cached.status_code, 304)
+            fetch.assert_called_once()
+
+            # A different query is a different resource
+            other = self.client.get("/api/orders?limit=2&status=confirmed", headers={"If-None-Match": etag})
+            self.assertEqual(other.status_code, 200)
+
+        with patch('db.get_orders_fingerprint', return_value="11:2026-10-18T09:05:00"), \
+             patch('db.get_orders_page', return_value=(ORDERS[:2], 9)):
+            changed = self.client.get("/api/orders?limit=2&status=pending", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+
+    def test_dates_are_inclusive(self):
+        with patch('db.get_orders_fingerprint', return_value=None), \
+             patch('db.get_orders_page', return_value=([], None)) as fetch:
+            response = self.client.get("/api/orders?date_from=2026-10-01&date_to=2026-10-18&cursor=50")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response.headers)
+        kwargs = fetch.call_args.kwargs
+        self.assertEqual(kwargs["date_from"], "2026-10-01")
+        self.assertEqual(kwargs["date_to"], "2026-10-19")
+        self.assertEqual(kwargs["before_id"], 50)
+        self.assertEqual(kwargs["limit"], main.ORDERS_PAGE_SIZE)
+
+    def test_no_parameters_returns_every_order(self):
+        # The dashboard loads the whole list, so nothing past the first page may go missing
+        orders = [{"id": i, "status": "pending", "order_items": []} for i in range(120, 0, -1)]
+        with patch('db.get_orders_fingerprint', return_value="120:2026-10-18T09:00:00"), \
+             patch('db.get_all_orders', return_value=orders), \
+             patch('db.get_orders_page') as page:
+            response = self.client.get("/api/orders")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 120)
+        self.assertIn("ETag", response.headers)
+        self.assertNotIn("X-Next-Cursor", response.headers)
+        page.assert_not_called()
+
+    def test_invalid_cursor(self):
+        with patch('db.get_orders_fingerprint', return_value=None):
+            response = self.client.get("/api/orders?cursor=abc")
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import threading
+import tempfile
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from services.sqlite_backend import SQLiteClient
+
+ITEMS = [
+    {'fish_name': 'Rohu', 'quantity': 1.5, 'price_per_kg': 250},
+    {'fish_name': 'Katla', 'quantity': 1, 'price_per_kg': 300},
+]
+
+class TestPlaceOrder(unittest.TestCase):
+    """
+    create_order against the SQLite stand-in for the place_order SQL function.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.client = SQLiteClient(os.path.join(self.tmp.name, "test.db"))
+        db.supabase = self.client
+        conn = self.client._conn
+        conn.execute("INSERT INTO users (phone, address, address_update_count) VALUES ('111', 'Old Address', 2)")
+        self.message_id = conn.execute(
+            "INSERT INTO messages (user_phone, role, content) VALUES ('111', 'assistant', 'Confirm?') RETURNING id"
+        ).fetchone()[0]
+
+    def tearDown(self):
+        self.client.close()
+        self.tmp.cleanup()
+
+    def test_places_full_order_in_one_transaction(self):
+        result = db.create_order("111", ITEMS, "12 Gariahat Rd", message_id=self.message_id)
+
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["total_price"], 675)
+        order = result["order"]
+        self.assertEqual(order["delivery_address"], "12 Gariahat Rd")
+        self.assertEqual([(i["fish_name"], i["subtotal"]) for i in order["order_items"]], [("Rohu", 375), ("Katla", 300)])
+
+        conn = self.client._conn
+        user = conn.execute("SELECT address, address_update_count FROM users WHERE phone = '111'").fetchone()
+        self.assertEqual(tuple(user), ("12 Gariahat Rd", 0))
+        placed = conn.execute("SELECT order_placed FROM messages WHERE id = ?", (self.message_id,)).fetchone()[0]
+        self.assertEqual(placed, 1)
+
+    def test_second_confirm_is_refused(self):
+        first = db.create_order("111", ITEMS, None, message_id=self.message_id)
+        second = db.create_order("111", ITEMS, None, message_id=self.message_id)
+
+        self.assertEqual(first["status"], "success")
+        self.assertEqual(second, {"error": "Order already placed for this message"})
+        # Without an address the profile keeps the old one
+        self.assertEqual(self.client._conn.execute("SELECT address FROM users").fetchone()[0], "Old Address")
+
+    def test_concurrent_confirms_create_one_order(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(db.create_order("111", ITEMS, None, message_id=self.message_id)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(1 for r in results if r.get("status") == "success"), 1)
+        self.assertEqual(self.client._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0], 1)
+        self.assertEqual(self.client._conn.execute("SELECT COUNT(*) FROM order_items").fetchone()[0], 2)
+
+    def test_failure_leaves_no_orphan_order(self):
+        # Fails while inserting items, after the order row is written
+        bad_items = ITEMS + [{'fish_name': ['Ilish'], 'quantity': 1, 'price_per_kg': 1200}]
+        result = db.create_order("111", bad_items, None, message_id=self.message_id)
+
+        self.assertIn("error", result)
+        self.assertEqual(self.client._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0], 0)
+
+    def test_orders_without_message_are_not_deduplicated(self):
+        db.create_order("111", ITEMS)
+        db.create_order("111", ITEMS)
+        self.assertEqual(self.client._conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,11 @@ import os
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import threading
+
 import db
+from services.sqlite_backend import SQLiteClient
+from services.rate_limit import SlidingWindowLimiter
 
 class TestRateLimit(unittest.TestCase):
     def setUp(self):
@@ -15,14 +19,17 @@ class TestRateLimit(unittest.TestCase):
         db.supabase = self.mock_supabase
 
     def test_increment_address_update_count(self):
-        # Mock get_address_update_count to return 1
-        with patch('db.get_address_update_count', return_value=1):
-            db.increment_address_update_count("1234567890")
-            
-            # Verify update called with 2
-            self.mock_supabase.table.assert_called_with("users")
-            self.mock_supabase.table().update.assert_called_with({"address_update_count": 2})
-            self.mock_supabase.table().update().eq.assert_called_with("phone", "1234567890")
+        # One atomic call that returns the new count
+        self.mock_supabase.rpc.return_value.execute.return_value.data = 2
+        count = db.increment_address_update_count("1234567890", limit=3)
+
+        self.assertEqual(count, 2)
+        self.mock_supabase.rpc.assert_called_once_with("increment_address_update_count", {"p_phone": "1234567890", "p_limit": 3})
+        self.mock_supabase.table.assert_not_called()
+
+    def test_increment_address_update_count_at_limit(self):
+        self.mock_supabase.rpc.return_value.execute.return_value.data = None
+        self.assertIsNone(db.increment_address_update_count("1234567890", limit=3))
 
     def test_reset_address_update_count(self):
         db.reset_address_update_count("1234567890")
@@ -37,5 +44,112 @@ class TestRateLimit(unittest.TestCase):
         count = db.get_address_update_count("1234567890")
         self.assertEqual(count, 2)
 
+class TestAtomicCounter(unittest.TestCase):
+    """
+    increment_address_update_count against the SQLite stand-in.
+    """
+
+    def setUp(self):
+        self.client = SQLiteClient()
+        db.supabase = self.client
+        self.client._conn.execute("INSERT INTO users (phone, address_update_count) VALUES ('111', 0)")
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_concurrent_increments_respect_limit(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(db.increment_address_update_count("111", limit=3)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(r for r in results if r is not None), [1, 2, 3])
+        self.assertEqual(results.count(None), 7)
+
+class TestSlidingWindowLimiter(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.limiter = SlidingWindowLimiter(limit=3, window=60, clock=lambda: self.now)
+
+    def test_limit_within_window(self):
+        self.assertEqual([self.limiter.hit("111") for _ in range(4)], [True, True, True, False])
+        self.assertEqual(self.limiter.remaining("111"), 0)
+        # Other users are unaffected
+        self.assertTrue(self.limiter.hit("222"))
+
+    def test_window_slides(self):
+        self.limiter.hit("111")
+        self.now += 30
+        self.limiter.hit("111")
+        self.limiter.hit("111")
+        self.assertFalse(self.limiter.hit("111"))
+
+        # The first hit leaves the window, freeing one slot
+        self.now += 31
+        self.assertTrue(self.limiter.hit("111"))
+        self.assertFalse(self.limiter.hit("111"))
+
+    def test_idle_keys_are_evicted(self):
+        limiter = SlidingWindowLimiter(limit=3, window=60, max_keys=2, clock=lambda: self.now)
+        for key in ("a", "b", "c"):
+            limiter.hit(key)
+        self.assertEqual(limiter.stats()["keys"], 2)
+
+        self.now += 61
+        limiter.hit("d")
+        self.assertEqual(limiter.stats()["keys"], 1)
+
+class TestHandleMessageLimits(unittest.TestCase):
+    def handle(self, ctx, text):
+        import main
+        from services import user_context
+        message = {"from": ctx.phone, "id": "wamid.IN", "type": "text", "text": {"body": text}}
+        with patch.object(user_context, 'load', return_value=ctx), \
+             patch.object(main, 'update_session'), \
+             patch('services.message_log.log'), \
+             patch('db.update_user_fields') as write, \
+             patch('services.whatsapp.send_message', return_value="wamid.OUT") as send, \
+             patch('whatsapp_utils.send_interactive_button', return_value="wamid.BTN") as buttons, \
+             patch('db.increment_address_update_count', side_effect=RuntimeError("rpc down")), \
+             patch('brain.generate_response', return_value="Rohu is ₹250/kg") as brain:
+            main.handle_message(message)
+        return write, send, buttons, brain
+
+    def address_context(self, count):
+        from services.user_context import UserContext
+        return UserContext("111", {"phone": "111", "conversation_state": "AWAITING_ADDRESS",
+                                   "address_update_count": count})
+
+    def test_address_fallback_keeps_the_limit(self):
+        write, send, buttons, _ = self.handle(self.address_context(3), "New Road 5")
+        self.assertIn("Maximum address changes", send.call_args.args[1])
+        buttons.assert_not_called()
+        self.assertNotIn("address", write.call_args.args[1])
+
+    def test_address_fallback_saves_the_count(self):
+        write, _, buttons, _ = self.handle(self.address_context(1), "New Road 5")
+        buttons.assert_called_once()
+        self.assertEqual(write.call_args.args[1]["address_update_count"], 2)
+        self.assertEqual(write.call_args.args[1]["address"], "New Road 5")
+
+    def test_turn_limit_replies_once(self):
+        import main
+        from services.user_context import UserContext
+        ctx = UserContext("111", {"phone": "111"})
+        with patch.object(main, 'turn_limiter', SlidingWindowLimiter(1, 60)), \
+             patch.object(main, 'turn_notice_limiter', SlidingWindowLimiter(1, 60)):
+            _, send, _, brain = self.handle(ctx, "hi")
+            self.assertEqual(send.call_args.args[1], "Rohu is ₹250/kg")
+            _, send, _, brain = self.handle(ctx, "hello?")
+            brain.assert_not_called()
+            self.assertEqual(send.call_args.args[1], main.TURN_LIMIT_REPLY)
+            _, send, _, _ = self.handle(ctx, "hello??")
+            send.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import ai
+from services.reply_stream import ReplyStream
+
+def text_chunk(text):
+    part = MagicMock(text=text)
+    part.function_call = None
+    chunk = MagicMock()
+    chunk.candidates[0].content.parts = [part]
+    chunk.usage_metadata.total_token_count = 0
+    return chunk
+
+def order_chunk():
+    part = MagicMock(text="")
+    part.function_call.name = "place_order"
+    part.function_call.args = {"items": [{"fish_name": "Rohu", "quantity": 1, "price_per_kg": 250}], "address": "Gariahat"}
+    chunk = MagicMock()
+    chunk.candidates[0].content.parts = [part]
+    return chunk
+
+class TestReplyStream(unittest.TestCase):
+    def test_first_sentences_sent_early(self):
+        sent = []
+        stream = ReplyStream(send=sent.append, min_chars=30)
+        for chunk in ("Rohu is ₹250/kg", " today. Katla is ₹3", "00/kg. Both are very fresh", " this morning."):
+            stream.feed(chunk)
+
+        # Short first sentence: waits for the next boundary, then sends once
+        self.assertEqual(sent, ["Rohu is ₹250/kg today. Katla is ₹300/kg."])
+        self.assertEqual(stream.unsent(stream.text), "Both are very fresh this morning.")
+
+    def test_decimal_point_is_not_a_sentence_end(self):
+        sent = []
+        stream = ReplyStream(send=sent.append, min_chars=5)
+        stream.feed("Your bill for 2.")
+        self.assertEqual(sent, [])
+        stream.feed("5 kg Rohu is ₹625. Anything else?")
+        self.assertEqual(sent, ["Your bill for 2.5 kg Rohu is ₹625."])
+
+    def test_questions_are_held_for_the_final_message(self):
+        sent = []
+        stream = ReplyStream(send=sent.append, min_chars=10)
+        stream.feed("Total: ₹500 for 2 kg Rohu? Do you want to confirm this order? ")
+        self.assertEqual(sent, [])
+        self.assertEqual(stream.unsent(stream.text), stream.text)
+
+    def test_nothing_left(self):
+        stream = ReplyStream(send=lambda text: None, min_chars=5)
+        stream.feed("We have fresh Rohu today.\n")
+        stream.feed("")
+        self.assertIsNone(stream.unsent("We have fresh Rohu today.\n"))
+
+class TestStreamingGeneration(unittest.TestCase):
+    def run_stream(self, chunks, stream):
+        model = MagicMock()
+        model.generate_content.return_value = iter(chunks)
+        with patch.object(ai, 'GEMINI_API_KEY', 'key'), \
+             patch.object(ai.model_registry, 'get', return_value=model), \
+             patch('db.create_order', return_value={"order_id": 7, "total_price": 250}) as create_order, \
+             patch('services.user_context.invalidate'):
+            reply = ai.generate_response("prompt", user_phone="111", stream=stream)
+        return reply, model, create_order
+
+    def test_typing_then_early_send(self):
+        calls = []
+        stream = ReplyStream(send=lambda text: calls.append(("send", text)),
+                             on_start=lambda: calls.append(("typing",)), min_chars=10)
+        reply, model, _ = self.run_stream([text_chunk("We have Rohu today. "), text_chunk("Would you like some?")], stream)
+
+        self.assertEqual(calls, [("typing",), ("send", "We have Rohu today.")])
+        self.assertEqual(reply, "We have Rohu today. Would you like some?")
+        self.assertTrue(model.generate_content.call_args.kwargs["stream"])
+
+    def test_order_call_stops_the_stream(self):
+        rest = MagicMock(side_effect=AssertionError("read past the function call"))
+
+        def chunks():
+            yield order_chunk()
+            rest()
+
+        reply, _, create_order = self.run_stream(chunks(), ReplyStream())
+        create_order.assert_called_once()
+        self.assertIn("Order ID: #7", reply)
+        rest.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
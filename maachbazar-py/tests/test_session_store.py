@@ -0,0 +1,73 @@
+import unittest
+import tempfile
+import time
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import session_store
+
+class SessionStoreCases:
+    """
+    Behaviour shared by every session store backend.
+    """
+
+    def make_store(self, **kwargs):
+        raise NotImplementedError
+
+    def test_touch_and_expiry(self):
+        store = self.make_store()
+        self.assertFalse(store.is_active("111"))
+
+        store.touch("111")
+        self.assertTrue(store.is_active("111"))
+
+        store["111"] = int(time.time()) - (session_store.SESSION_EXPIRY + 10)
+        self.assertFalse(store.is_active("111"))
+
+    def test_sweep_removes_only_expired(self):
+        store = self.make_store()
+        now = int(time.time())
+        store["old-1"] = now - session_store.SESSION_EXPIRY - 100
+        store["old-2"] = now - session_store.SESSION_EXPIRY - 50
+        store["fresh"] = now
+
+        self.assertEqual(store.sweep(now), 2)
+        self.assertEqual(len(store), 1)
+        self.assertIn("fresh", store)
+
+    def test_touch_sweeps_periodically(self):
+        store = self.make_store(sweep_interval=0)
+        store["old"] = int(time.time()) - session_store.SESSION_EXPIRY - 100
+        store.touch("new")
+        self.assertNotIn("old", store)
+
+class TestMemorySessionStore(SessionStoreCases, unittest.TestCase):
+    def make_store(self, **kwargs):
+        return session_store.MemorySessionStore(**kwargs)
+
+class TestSQLiteSessionStore(SessionStoreCases, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sessions.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_store(self, **kwargs):
+        return session_store.SQLiteSessionStore(self.path, **kwargs)
+
+    def test_shared_between_workers(self):
+        worker_a = self.make_store()
+        worker_b = self.make_store()
+
+        worker_a.touch("111")
+        self.assertTrue(worker_b.is_active("111"))
+
+        worker_a.close()
+        worker_b.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import tempfile
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from services.sqlite_backend import SQLiteClient, APIError
+
+class TestSQLiteBackend(unittest.TestCase):
+    """
+    db.py running unchanged on the SQLite backend.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.client = SQLiteClient(os.path.join(self.tmp.name, "test.db"))
+        self.saved = db.supabase
+        db.supabase = self.client
+
+    def tearDown(self):
+        db.supabase = self.saved
+        self.client.close()
+        self.tmp.cleanup()
+
+    def test_wal_mode(self):
+        self.assertEqual(self.client._conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_inventory(self):
+        db.add_fish("Rohu", 250)
+        db.add_fish("Ilish", 1200, is_available=False)
+        db.update_price("Rohu", 260)
+
+        items = db.get_inventory()
+        self.assertEqual([(i["name"], i["price"], i["is_available"]) for i in items],
+                         [("Rohu", 260, True), ("Ilish", 1200, False)])
+        self.assertIn("error", db.add_fish("Rohu", 1))
+
+    def test_user_with_history(self):
+        user, is_new = db.get_or_create_user("111")
+        self.assertTrue(is_new)
+        self.assertTrue(user["opt_in"])
+        self.assertFalse(db.get_or_create_user("111")[1])
+
+        db.insert_messages([db.message_row("111", "user", f"m{i}", created_at=f"2026-10-18T10:00:0{i}") for i in range(7)])
+        db.update_user_fields("111", {"address": "Gariahat", "language": "Bangla"})
+
+        user, history = db.get_user_with_history("111", limit=3)
+        self.assertEqual(user["address"], "Gariahat")
+        self.assertEqual([m["content"] for m in history], ["m4", "m5", "m6"])
+        self.assertEqual(set(history[0]), {"role", "content", "created_at"})
+        self.assertEqual(db.get_user_with_history("999"), (None, []))
+
+    def test_orders_page_and_status(self):
+        db.get_or_create_user("111")
+        db.get_or_create_user("222")
+        for phone in ("111", "222", "111"):
+            result = db.create_order(phone, [{"fish_name": "Rohu", "quantity": 1, "price_per_kg": 250}], "Gariahat")
+            self.assertEqual(result["status"], "success")
+
+        before = db.get_orders_fingerprint()
+        self.assertTrue(before.startswith("3:"))
+
+        orders, cursor = db.get_orders_page(limit=1, phone="111")
+        self.assertEqual(([o["id"] for o in orders], cursor), ([3], 3))
+        self.assertEqual(orders[0]["order_items"][0]["fish_name"], "Rohu")
+        orders, cursor = db.get_orders_page(limit=1, before_id=cursor, phone="111")
+        self.assertEqual(([o["id"] for o in orders], cursor), ([1], None))
+
+        updated = db.update_order_status(2, "confirmed")
+        self.assertEqual(updated[0]["status"], "confirmed")
+        self.assertEqual([o["id"] for o in db.get_orders_page(statuses=["confirmed", "rejected"])[0]], [2])
+        self.assertNotEqual(db.get_orders_fingerprint(), before)
+
+    def test_fingerprint_changes_on_every_write(self):
+        db.get_or_create_user("111")
+        for _ in range(2):
+            db.create_order("111", [{"fish_name": "Rohu", "quantity": 1, "price_per_kg": 250}], "Gariahat")
+        # A stamp the clock hasn't reached: later writes must still sort after it
+        self.client._conn.execute("UPDATE orders SET updated_at = '2999-01-01T00:00:00.000' WHERE id = 1")
+
+        seen = {db.get_orders_fingerprint()}
+        for status in ("confirmed", "delivered", "confirmed"):
+            db.update_order_status(2, status)
+            seen.add(db.get_orders_fingerprint())
+        self.assertEqual(len(seen), 4)
+        self.assertTrue(max(seen).startswith("2:2999-01-01T00:00:00.000"))
+
+    def test_broadcast_ledger_upserts(self):
+        job = db.get_or_create_broadcast_job("morning:2026-10-18", "morning")
+        self.assertEqual(db.get_or_create_broadcast_job("morning:2026-10-18", "morning")["id"], job["id"])
+
+        db.record_broadcast_recipient(job["id"], "111", "sending")
+        db.record_broadcast_recipient(job["id"], "111", "sent", whatsapp_message_id="wamid.1")
+        self.assertEqual(db.get_broadcast_ledger(job["id"], ["111", "222"]), {"111": "sent"})
+        self.assertEqual(len(db.get_unfinished_broadcast_jobs("morning")), 1)
+
+    def test_delivery_statuses(self):
+        db.get_or_create_user("111")
+        db.insert_messages([
+            db.message_row("111", "assistant", "Good morning", whatsapp_message_id="wamid.1", template_name="morning"),
+            db.message_row("111", "assistant", "Good morning", whatsapp_message_id="wamid.2", template_name="morning"),
+        ])
+        updated = db.apply_message_statuses([
+            {"whatsapp_message_id": "wamid.1", "status": "read", "updated_at": "2026-10-18T10:00:00"},
+            {"whatsapp_message_id": "wamid.2", "status": "delivered", "updated_at": "2026-10-18T10:00:00"},
+        ])
+        self.assertEqual(updated, 2)
+        # Never backwards
+        self.assertEqual(db.apply_message_statuses([{"whatsapp_message_id": "wamid.1", "status": "delivered"}]), 0)
+
+        stats = self.client.table("template_delivery_stats").select("*").execute().data
+        self.assertEqual((stats[0]["sent"], stats[0]["delivered"], stats[0]["read"]), (2, 2, 1))
+
+    def test_errors_raise_api_error(self):
+        with self.assertRaises(APIError):
+            self.client.table("no_such_table").select("*").execute()
+
+if __name__ == '__main__':
+    unittest.main()
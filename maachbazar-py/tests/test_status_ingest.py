@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from services.status_ingest import StatusAggregator
+
+def status(wamid, state, timestamp="1760760000", errors=None):
+    item = {"id": wamid, "status": state, "timestamp": timestamp, "recipient_id": "111"}
+    if errors:
+        item["errors"] = errors
+    return item
+
+class FakeApply:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, updates):
+        self.calls.append(list(updates))
+        if self.fail:
+            raise Exception("database unavailable")
+        return len(updates)
+
+class TestStatusIngest(unittest.TestCase):
+    def setUp(self):
+        db.supabase = MagicMock()
+        self.apply = FakeApply()
+        self.aggregator = StatusAggregator(batch_size=100, flush_interval=60, apply=self.apply)
+
+    def tearDown(self):
+        self.aggregator.close()
+
+    def test_keeps_latest_state_per_message(self):
+        self.aggregator.add(status("wamid.A", "sent"))
+        self.aggregator.add(status("wamid.A", "read"))
+        # Out of order: a late 'delivered' must not undo 'read'
+        self.aggregator.add(status("wamid.A", "delivered"))
+        self.aggregator.add(status("wamid.B", "sent"))
+
+        self.assertEqual(self.aggregator.flush(), 2)
+
+        self.assertEqual(len(self.apply.calls), 1)
+        updates = {u["whatsapp_message_id"]: u["status"] for u in self.apply.calls[0]}
+        self.assertEqual(updates, {"wamid.A": "read", "wamid.B": "sent"})
+        self.assertEqual(self.aggregator.stats()["coalesced"], 2)
+
+    def test_failed_status_keeps_error(self):
+        self.aggregator.add(status("wamid.A", "failed", errors=[{"code": 131026, "title": "Message undeliverable"}]))
+        self.aggregator.flush()
+
+        update = self.apply.calls[0][0]
+        self.assertEqual(update["error"], "131026: Message undeliverable")
+        self.assertTrue(update["updated_at"].startswith("2025-10-18"))
+
+    def test_ignores_unknown_statuses(self):
+        self.aggregator.add({"id": "wamid.A", "status": "deleted"})
+        self.aggregator.add({"status": "read"})
+        self.assertEqual(self.aggregator.flush(), 0)
+        self.assertEqual(self.apply.calls, [])
+
+    def test_large_flush_is_chunked(self):
+        aggregator = StatusAggregator(batch_size=10, flush_interval=60, apply=self.apply)
+        aggregator._ensure_thread = lambda: None  # flush by hand only
+        for i in range(25):
+            aggregator.add(status(f"wamid.{i}", "delivered"))
+
+        self.assertEqual(aggregator.flush(), 25)
+        self.assertEqual([len(c) for c in self.apply.calls], [10, 10, 5])
+
+    def test_failed_write_is_retried(self):
+        failing = FakeApply(fail=True)
+        aggregator = StatusAggregator(batch_size=100, flush_interval=60, apply=failing)
+        aggregator._ensure_thread = lambda: None
+        aggregator.add(status("wamid.A", "delivered"))
+
+        self.assertEqual(aggregator.flush(), 0)
+        self.assertEqual(aggregator.stats()["pending"], 1)
+
+        aggregator.apply = self.apply
+        self.assertEqual(aggregator.flush(), 1)
+
+    def test_pending_is_bounded(self):
+        aggregator = StatusAggregator(batch_size=100, flush_interval=60, max_pending=2, apply=self.apply)
+        aggregator._ensure_thread = lambda: None
+        for i in range(3):
+            aggregator.add(status(f"wamid.{i}", "sent"))
+        # Updates to messages already pending are still accepted
+        aggregator.add(status("wamid.0", "read"))
+
+        self.assertEqual(aggregator.stats()["dropped"], 1)
+        aggregator.flush()
+        self.assertEqual({u["whatsapp_message_id"]: u["status"] for u in self.apply.calls[0]},
+                         {"wamid.0": "read", "wamid.1": "sent"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from services import user_context
+from services import message_log
+
+USER_ROW = {"phone": "1234567890", "language": "Bangla", "address": "12 Gariahat Rd", "conversation_state": None, "address_update_count": 1}
+HISTORY = [{"role": "user", "content": "rohu koto?"}, {"role": "assistant", "content": "Rohu: ₹250/kg"}]
+
+class TestUserContext(unittest.TestCase):
+    def setUp(self):
+        self.mock_supabase = MagicMock()
+        db.supabase = self.mock_supabase
+        user_context.clear()
+
+    def test_get_user_with_history_single_query(self):
+        self.mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.limit.return_value.execute.return_value.data = [
+            dict(USER_ROW, messages=HISTORY[::-1])
+        ]
+
+        user, history = db.get_user_with_history("1234567890", limit=5)
+
+        self.mock_supabase.table.assert_called_once_with("users")
+        self.mock_supabase.table().select.assert_called_with("*, messages(role, content, created_at)")
+        self.mock_supabase.table().select().eq().order.assert_called_with("created_at", desc=True, foreign_table="messages")
+        self.assertNotIn("messages", user)
+        self.assertEqual(history, HISTORY)
+
+    def test_load_reads_state_fresh_every_turn(self):
+        # Another worker set AWAITING_ADDRESS between the two turns
+        awaiting = dict(USER_ROW, conversation_state="AWAITING_ADDRESS")
+        with patch('db.get_user_with_history', side_effect=[(dict(USER_ROW), list(HISTORY)), (awaiting, list(HISTORY))]):
+            first = user_context.load("1234567890")
+            second = user_context.load("1234567890")
+
+        self.assertEqual(first.language, "Bangla")
+        self.assertEqual(first.address, "12 Gariahat Rd")
+        self.assertFalse(first.is_new)
+        self.assertEqual(second.state, "AWAITING_ADDRESS")
+        self.assertIs(user_context.peek("1234567890"), second)
+
+    def test_load_sees_buffered_messages(self):
+        rows = []
+        writer = message_log.MessageLogWriter(flush_interval=60, insert=lambda batch: rows.extend(batch) or [1] * len(batch))
+
+        def fetch(phone, limit):
+            return dict(USER_ROW), [{"role": r["role"], "content": r["content"]} for r in rows if r["user_phone"] == phone]
+
+        with patch.object(message_log, 'writer', writer), patch('db.get_user_with_history', side_effect=fetch):
+            writer.log("1234567890", "user", "2 kg rohu")
+            writer.log("1234567890", "assistant", "Total ₹500. Confirm?")
+            ctx = user_context.load("1234567890")
+            writer.close()
+
+        self.assertEqual([m["content"] for m in ctx.history], ["2 kg rohu", "Total ₹500. Confirm?"])
+
+    def test_load_creates_new_user(self):
+        with patch('db.get_user_with_history', return_value=(None, [])), \
+             patch('db.get_or_create_user', return_value=({"phone": "999"}, True)):
+            ctx = user_context.load("999")
+
+        self.assertTrue(ctx.is_new)
+        self.assertEqual(ctx.language, "English")
+
+    def test_flush_writes_dirty_fields_once(self):
+        ctx = user_context.UserContext("1234567890", dict(USER_ROW))
+        ctx.set("address", "New Address")
+        ctx.set("address_update_count", 2)
+        ctx.set("conversation_state", None)
+
+        with patch('db.update_user_fields') as update:
+            ctx.flush()
+            ctx.flush()
+
+        update.assert_called_once_with("1234567890", {"address": "New Address", "address_update_count": 2, "conversation_state": None})
+        self.assertFalse(ctx.dirty)
+
+    def test_log_message_keeps_history_bounded(self):
+        ctx = user_context.UserContext("1234567890", dict(USER_ROW), list(HISTORY))
+        with patch('services.message_log.log') as log:
+            for i in range(10):
+                ctx.log_message("user", f"msg {i}")
+
+        self.assertEqual(log.call_count, 10)
+        self.assertEqual(len(ctx.history), user_context.HISTORY_LIMIT)
+        self.assertEqual(ctx.history[-1]["content"], "msg 9")
+
+    def test_invalidate(self):
+        with patch('db.get_user_with_history', return_value=(dict(USER_ROW), [])) as fetch:
+            user_context.load("1234567890")
+            user_context.invalidate("1234567890")
+            self.assertIsNone(user_context.peek("1234567890"))
+            user_context.load("1234567890")
+
+        self.assertEqual(fetch.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import whatsapp
+
+def text_message(sender, body, wamid):
+    return {"from": sender, "id": wamid, "type": "text", "text": {"body": body}}
+
+BATCH_PAYLOAD = {
+    "object": "whatsapp_business_account",
+    "entry": [
+        {
+            "id": "waba-1",
+            "changes": [
+                {"field": "messages", "value": {"messages": [
+                    text_message("111", "rohu 2kg", "wamid.1"),
+                    text_message("222", "hi", "wamid.2"),
+                ]}},
+                {"field": "messages", "value": {"statuses": [
+                    {"id": "wamid.out.1", "status": "delivered", "recipient_id": "333"},
+                ]}},
+            ],
+        },
+        {
+            "id": "waba-1",
+            "changes": [
+                {"field": "messages", "value": {"messages": [
+                    text_message("111", "confirm", "wamid.3"),
+                ]}},
+            ],
+        },
+    ],
+}
+
+class TestWebhookEvents(unittest.TestCase):
+    def test_iter_yields_every_event_in_order(self):
+        events = list(whatsapp.iter_webhook_events(BATCH_PAYLOAD))
+
+        self.assertEqual([e.kind for e in events], ["message", "message", "status", "message"])
+        self.assertEqual([e.user_id for e in events], ["111", "222", "333", "111"])
+        self.assertEqual(events[3].item["id"], "wamid.3")
+
+    def test_iter_handles_empty_payloads(self):
+        self.assertEqual(list(whatsapp.iter_webhook_events({})), [])
+        self.assertEqual(list(whatsapp.iter_webhook_events({"entry": [{"changes": [{}]}]})), [])
+
+    def test_process_webhook_payload_returns_all_texts(self):
+        result = whatsapp.process_webhook_payload(BATCH_PAYLOAD)
+        self.assertEqual(result, [("111", "rohu 2kg"), ("222", "hi"), ("111", "confirm")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import unittest
+import asyncio
+import threading
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.worker import WorkerPool
+
+class TestWorkerPool(unittest.TestCase):
+    def test_items_processed_off_loop(self):
+        processed = []
+        loop_threads = []
+
+        def handler(item):
+            processed.append((item, threading.current_thread().name))
+
+        async def run():
+            loop_threads.append(threading.current_thread().name)
+            pool = WorkerPool(handler, workers=2, queue_size=10)
+            await pool.start()
+            for i in range(5):
+                self.assertTrue(pool.submit(i))
+            await pool.stop()
+
+        asyncio.run(run())
+
+        self.assertEqual(sorted(item for item, _ in processed), [0, 1, 2, 3, 4])
+        # Handler must never run on the event loop thread
+        for _, thread_name in processed:
+            self.assertNotEqual(thread_name, loop_threads[0])
+
+    def test_submit_rejects_when_full(self):
+        release = threading.Event()
+
+        async def run():
+            pool = WorkerPool(lambda item: release.wait(5), workers=1, queue_size=1)
+            await pool.start()
+            self.assertTrue(pool.submit("a"))
+            await asyncio.sleep(0.05)  # let the worker pick up "a" and block
+            self.assertTrue(pool.submit("b"))
+            self.assertFalse(pool.submit("c"))
+            release.set()
+            await pool.stop()
+
+        asyncio.run(run())
+
+    def test_submit_without_start(self):
+        pool = WorkerPool(lambda item: None)
+        self.assertFalse(pool.submit("a"))
+
+    def test_same_key_processed_in_order(self):
+        processed = []
+
+        def handler(item):
+            key, seq = item
+            if seq == 0:
+                threading.Event().wait(0.02)  # first item is slow
+            processed.append(item)
+
+        async def run():
+            pool = WorkerPool(handler, workers=4, queue_size=100)
+            await pool.start()
+            for seq in range(5):
+                for key in ("111", "222", "333"):
+                    pool.submit((key, seq), key=key)
+            await pool.stop()
+
+        asyncio.run(run())
+
+        for key in ("111", "222", "333"):
+            self.assertEqual([seq for k, seq in processed if k == key], [0, 1, 2, 3, 4])
+
+    def test_submit_many_is_all_or_nothing(self):
+        release = threading.Event()
+
+        async def run():
+            pool = WorkerPool(lambda item: release.wait(5), workers=1, queue_size=2)
+            await pool.start()
+            self.assertTrue(pool.submit_many([("a", 1)]))
+            await asyncio.sleep(0.05)  # worker blocks on item 1
+            self.assertFalse(pool.submit_many([("a", 2), ("a", 3), ("a", 4)]))
+            self.assertEqual(pool.qsize(), 0)
+            self.assertTrue(pool.submit_many([("a", 2), ("a", 3)]))
+            release.set()
+            await pool.stop()
+
+        asyncio.run(run())
+
+    def test_handler_errors_do_not_kill_worker(self):
+        processed = []
+
+        def handler(item):
+            if item == "bad":
+                raise ValueError("boom")
+            processed.append(item)
+
+        async def run():
+            pool = WorkerPool(handler, workers=1, queue_size=10)
+            await pool.start()
+            pool.submit("bad")
+            pool.submit("good")
+            await pool.stop()
+
+        asyncio.run(run())
+        self.assertEqual(processed, ["good"])
+
+    def test_slow_key_does_not_block_others(self):
+        release = threading.Event()
+        processed = []
+
+        def handler(item):
+            key, seq = item
+            if key == "slow":
+                release.wait(5)
+            processed.append(item)
+
+        async def run():
+            pool = WorkerPool(handler, workers=2, queue_size=100)
+            await pool.start()
+            pool.submit(("slow", 0), key="slow")
+            pool.submit(("slow", 1), key="slow")
+            for seq in range(5):
+                pool.submit(("fast", seq), key="fast")
+            for _ in range(100):
+                if len(processed) == 5:
+                    break
+                await asyncio.sleep(0.01)
+            # Every fast item finished while the slow user was still blocked
+            self.assertEqual(processed, [("fast", seq) for seq in range(5)])
+            release.set()
+            await pool.stop()
+
+        asyncio.run(run())
+        self.assertEqual(processed[-2:], [("slow", 0), ("slow", 1)])
+
+    def test_per_key_depth_and_eviction(self):
+        release = threading.Event()
+
+        async def run():
+            pool = WorkerPool(lambda item: release.wait(5), workers=1, queue_size=100, key_depth=2)
+            await pool.start()
+            self.assertTrue(pool.submit_many([("a", 1), ("a", 2)]))
+            self.assertFalse(pool.submit("a", key="a"))
+            # Other users still get in
+            self.assertTrue(pool.submit("b", key="b"))
+            self.assertEqual(pool.stats()["keys"], 2)
+            release.set()
+            await pool.stop()
+            return pool.stats()
+
+        stats = asyncio.run(run())
+        self.assertEqual(stats["keys"], 0)
+        self.assertEqual(stats["processed"], 3)
+        self.assertEqual(stats["rejected"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
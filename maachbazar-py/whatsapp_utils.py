@@ -1,7 +1,7 @@
 import os
-import requests
 import logging
 import json
+from services.graph_client import get_client, GraphAPIError
 
 logger = logging.getLogger(__name__)
 
@@ -16,12 +16,6 @@ def send_language_menu(to_phone: str):
         logger.error("WHATSAPP_TOKEN or PHONE_NUMBER_ID not set")
         return
 
-    url = f"https://graph.facebook.com/v17.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    
     payload = {
         "messaging_product": "whatsapp",
         "to": to_phone,
@@ -67,14 +61,11 @@ def send_language_menu(to_phone: str):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+        wamid = get_client().post_message(payload)
         logger.info(f"Language menu sent to {to_phone}")
-        return response.json()['messages'][0]['id']
-    except requests.exceptions.RequestException as e:
+        return wamid
+    except GraphAPIError as e:
         logger.error(f"Failed to send language menu: {e}")
-        if e.response:
-            logger.error(f"Response: {e.response.text}")
         return None
 
 def send_interactive_button(to_phone: str, text_body: str, buttons: list):
@@ -86,12 +77,6 @@ def send_interactive_button(to_phone: str, text_body: str, buttons: list):
         logger.error("WHATSAPP_TOKEN or PHONE_NUMBER_ID not set")
         return
 
-    url = f"https://graph.facebook.com/v17.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    
     # Construct button rows
     button_rows = []
     for btn in buttons:
@@ -119,12 +104,9 @@ def send_interactive_button(to_phone: str, text_body: str, buttons: list):
     }
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+        wamid = get_client().post_message(payload)
         logger.info(f"Interactive button sent to {to_phone}: {text_body}")
-        return response.json()['messages'][0]['id']
-    except requests.exceptions.RequestException as e:
+        return wamid
+    except GraphAPIError as e:
         logger.error(f"Failed to send interactive button: {e}")
-        if e.response:
-            logger.error(f"Response: {e.response.text}")
         return None